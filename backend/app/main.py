@@ -4,6 +4,7 @@ A FastAPI-based backend for face recognition attendance tracking
 """
 
 from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from contextlib import asynccontextmanager
@@ -13,6 +14,7 @@ import logging
 from app.routers import auth, employees, attendance, embeddings, streaming
 from app.config import settings
 from db.db_config import create_tables
+from backend.core.metrics import CONTENT_TYPE, render_metrics
 
 # Setup logging
 logging.basicConfig(
@@ -105,3 +107,8 @@ async def health_check():
         "timestamp": time.time(),
         "environment": settings.ENVIRONMENT
     }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics of the face tracking pipeline running in this process"""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
@@ -0,0 +1,326 @@
+"""
+Process-per-camera mode for the face tracking system.
+Capture, enhancement, detection, tracking, quality scoring and recognition
+run in worker processes (one per camera, or per group of cameras), each with
+its own interpreter and models. Frames are exposed to the coordinator through
+multiprocessing.shared_memory rings and detection results come back over a
+small queue, while gallery matching, identity, tripwire and attendance state
+stay in the coordinator's FaceTrackingSystem. The coordinator sends the track
+identities it confirms back to the worker that owns the camera's tracker, so
+confirmed tracks skip recognition in process mode as they do in-process.
+"""
+
+import functools
+import multiprocessing as mp
+import queue
+import threading
+import time
+from dataclasses import dataclass, replace
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from backend.core import fts_system
+from backend.core.fts_system import (FRAME_INTERVAL, TRACK_BUFFER_SIZE, CameraConfig, FaceQualityMetrics,
+                                     FaceTrackingSystem, TrackIdentity)
+
+SHARED_FRAME_SLOTS = 4
+RESULT_QUEUE_SIZE = 256
+WORKER_JOIN_TIMEOUT = 5.0
+CONTROL_POLL_INTERVAL = 1.0
+_HEADER_FIELDS = 4  # latest_seq, height, width, channels
+_HEADER_BYTES = 64
+
+@dataclass
+class CameraResult:
+    camera_id: int
+    timestamp: float
+    bboxes: np.ndarray
+    det_scores: np.ndarray
+    embeddings: np.ndarray
+    track_ids: List[Optional[int]]
+    valid: np.ndarray
+    embedded: np.ndarray  # False for faces that failed quality or whose confirmed track skipped recognition
+    metrics: List[FaceQualityMetrics]
+
+class SharedFrameRing:
+    """Fixed-size frame slots of one camera in a single shared memory block.
+
+    The block starts with an int64 header (latest sequence number and frame
+    shape) followed by the slots. The writer fills slot seq % slots and only
+    then publishes seq, so a reader copying the latest slot can only be torn
+    by a writer that has lapped the whole ring in the meantime.
+    """
+
+    def __init__(self, name: Optional[str] = None, shape: Optional[Tuple[int, int, int]] = None,
+                 slots: int = SHARED_FRAME_SLOTS):
+        if name is None:
+            frame_bytes = int(np.prod(shape))
+            self.shm = shared_memory.SharedMemory(create=True, size=_HEADER_BYTES + slots * frame_bytes)
+            self.header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+            self.header[:] = (0,) + tuple(shape)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        self.shape = tuple(int(v) for v in self.header[1:])
+        self.slots = (self.shm.size - _HEADER_BYTES) // int(np.prod(self.shape))
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=_HEADER_BYTES)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def latest_seq(self) -> int:
+        return int(self.header[0])
+
+    def write(self, frame: np.ndarray) -> int:
+        seq = self.latest_seq + 1
+        slot = self.frames[seq % self.slots]
+        if frame.shape == self.shape:
+            np.copyto(slot, frame)
+        else:
+            cv2.resize(frame, (self.shape[1], self.shape[0]), dst=slot)
+        self.header[0] = seq
+        return seq
+
+    def read_latest(self, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Copy the latest frame into out (allocated if None); None before the first frame."""
+        seq = self.latest_seq
+        if seq == 0:
+            return None
+        if out is None or out.shape != self.shape:
+            out = np.empty(self.shape, dtype=np.uint8)
+        np.copyto(out, self.frames[seq % self.slots])
+        return out
+
+    def close(self):
+        # Drop the numpy views before closing, or the buffer export keeps the mapping alive.
+        self.header = None
+        self.frames = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+class CameraWorker(FaceTrackingSystem):
+    """Capture and detection half of FaceTrackingSystem for a group of cameras.
+
+    Runs inside a worker process: it loads its own models and keeps the
+    per-camera tracker state, but no database, gallery or attendance state.
+    confirmed_tracks mirrors the coordinator's confirmations for its cameras,
+    received over control_queue.
+    """
+
+    def __init__(self, camera_configs: List[CameraConfig], shared_frames: Dict[int, SharedFrameRing],
+                 result_queue, stop_event, control_queue=None, log=fts_system.log_message):
+        self._init_detection_state(log)
+        self.cameras = camera_configs
+        self.shared_frames = shared_frames
+        self.result_queue = result_queue
+        self.control_queue = control_queue
+        self.shutdown_flag = stop_event
+        self.dropped_results = 0
+        self._initialize_multi_gpu_insightface(camera_configs)
+        self._initialize_cameras(camera_configs)
+
+    def run(self):
+        threads = []
+        for camera_config in self.cameras:
+            for target, args in ((self._face_detection_thread, (camera_config.camera_id, camera_config.gpu_id)),
+                                 (self._capture_loop, (camera_config,))):
+                thread = threading.Thread(target=target, args=args, daemon=True)
+                thread.start()
+                threads.append(thread)
+        if self.control_queue is not None:
+            thread = threading.Thread(target=self._control_loop, daemon=True)
+            thread.start()
+            threads.append(thread)
+        self.shutdown_flag.wait()
+        for frame_slot in self.frame_slots.values():
+            frame_slot.close()
+        for scheduler in self.inference_schedulers.values():
+            scheduler.stop()
+        for thread in threads:
+            thread.join(timeout=2)
+
+    def _capture_loop(self, camera_config: CameraConfig):
+        self._start_capture(camera_config)
+        shared = self.shared_frames[camera_config.camera_id]
+        next_frame_time = time.time()
+        last_seq = 0
+        while not self.shutdown_flag.is_set():
+            if not self._frame_interval_elapsed(next_frame_time):
+                break
+            last_seq, frame_ref = self._next_frame(camera_config.camera_id, last_seq)
+            if frame_ref is None:
+                continue
+            next_frame_time = max(next_frame_time + FRAME_INTERVAL, time.time())
+            with frame_ref:
+                shared.write(frame_ref.array)
+
+    def _control_loop(self):
+        """Apply track confirmations and drops sent by the coordinator; expire idle mirrored tracks."""
+        while not self.shutdown_flag.is_set():
+            try:
+                kind, camera_id, track_id, state = self.control_queue.get(timeout=CONTROL_POLL_INTERVAL)
+            except queue.Empty:
+                kind = None
+            if kind == 'confirm':
+                state.last_seen_time = time.time()
+                self.confirmed_tracks[camera_id][track_id] = state
+            elif kind == 'drop':
+                self.confirmed_tracks[camera_id].pop(track_id, None)
+            cutoff = time.time() - TRACK_BUFFER_SIZE * FRAME_INTERVAL
+            for confirmed in self.confirmed_tracks.values():
+                for stale in [t for t, tracked in list(confirmed.items()) if tracked.last_seen_time < cutoff]:
+                    confirmed.pop(stale, None)
+
+    def _needs_recognition(self, camera_id: int, face) -> bool:
+        needed = super()._needs_recognition(camera_id, face)
+        # The coordinator advances its own copy per frame; the mirror is advanced here the same way.
+        track_id = face.get('track_id')
+        state = self.confirmed_tracks[camera_id].get(track_id) if track_id is not None else None
+        if state is not None:
+            state.last_seen_time = time.time()
+            state.frames_since_verify += 1
+        return needed
+
+    def _publish_faces(self, camera_id: int, faces, frame):
+        # Faces that failed the quality gate or belong to a confirmed track were not embedded; their rows stay zero.
+        dim = next((len(face.embedding) for face in faces if face.get('embedding') is not None), 0)
+        embeddings = np.zeros((len(faces), dim), dtype=np.float32)
+        for i, face in enumerate(faces):
+            if face.get('embedding') is not None:
+                embeddings[i] = face.embedding
+        result = CameraResult(
+            camera_id=camera_id,
+            timestamp=time.time(),
+            bboxes=np.array([face.bbox for face in faces], dtype=np.float32).reshape(-1, 4),
+            det_scores=np.array([face.det_score for face in faces], dtype=np.float32),
+            embeddings=embeddings,
+            track_ids=[face.get('track_id') for face in faces],
+            valid=np.array([face.quality_valid for face in faces], dtype=bool),
+            embedded=np.array([face.get('embedding') is not None for face in faces], dtype=bool),
+            metrics=[face.quality_metrics for face in faces])
+        try:
+            self.result_queue.put_nowait(('faces', result))
+        except queue.Full:
+            self.dropped_results += 1
+
+def _forward_log(result_queue, msg):
+    try:
+        result_queue.put_nowait(('log', msg))
+    except queue.Full:
+        pass
+
+def _config_snapshot() -> Dict:
+    """The coordinator's runtime configuration, which spawned workers would otherwise re-read from the module defaults."""
+    return {'enhanced_config': dict(fts_system.ENHANCED_CONFIG), 'cameras': list(fts_system.CAMERAS)}
+
+def _apply_config(config: Dict):
+    # Updated in place: fts_system reads both through its module globals.
+    fts_system.ENHANCED_CONFIG.clear()
+    fts_system.ENHANCED_CONFIG.update(config['enhanced_config'])
+    fts_system.CAMERAS[:] = config['cameras']
+
+def _camera_worker_main(camera_configs: List[CameraConfig], config: Dict, shared_names: Dict[int, str],
+                        result_queue, control_queue, stop_event):
+    _apply_config(config)
+    # Log lines go to the coordinator's log buffer.
+    log = functools.partial(_forward_log, result_queue)
+    shared_frames = {camera_id: SharedFrameRing(name) for camera_id, name in shared_names.items()}
+    try:
+        CameraWorker(camera_configs, shared_frames, result_queue, stop_event, control_queue, log=log).run()
+    except Exception as e:
+        log(f"[ERROR] Camera worker for {list(shared_names)} failed: {e}")
+    finally:
+        for shared in shared_frames.values():
+            shared.close()
+
+class CameraWorkerPool:
+    """Coordinator-side handle on the camera worker processes and their shared frames."""
+
+    def __init__(self, camera_configs: List[CameraConfig], cameras_per_process: int = 1):
+        self.camera_configs = camera_configs
+        self.cameras_per_process = max(1, cameras_per_process)
+        self.context = mp.get_context('spawn')
+        self.shared_frames: Dict[int, SharedFrameRing] = {}
+        self.control_queues = {}  # camera_id -> control queue of the worker that owns the camera
+        self.processes = []
+        self.result_queue = None
+        self.stop_event = None
+
+    def start(self):
+        self.result_queue = self.context.Queue(RESULT_QUEUE_SIZE)
+        self.stop_event = self.context.Event()
+        config = _config_snapshot()
+        for camera_config in self.camera_configs:
+            width, height = camera_config.resolution
+            self.shared_frames[camera_config.camera_id] = SharedFrameRing(shape=(height, width, 3))
+        for start in range(0, len(self.camera_configs), self.cameras_per_process):
+            group = self.camera_configs[start:start + self.cameras_per_process]
+            shared_names = {cam.camera_id: self.shared_frames[cam.camera_id].name for cam in group}
+            control_queue = self.context.Queue()
+            self.control_queues.update((cam.camera_id, control_queue) for cam in group)
+            process = self.context.Process(
+                target=_camera_worker_main,
+                args=(group, config, shared_names, self.result_queue, control_queue, self.stop_event),
+                name=f"camera-worker-{'-'.join(str(cam.camera_id) for cam in group)}",
+                daemon=True)
+            process.start()
+            self.processes.append(process)
+        fts_system.log_message(f"[INIT] Started {len(self.processes)} camera worker processes for {len(self.camera_configs)} cameras")
+
+    def get_result(self, timeout: float = 0.5) -> Optional[CameraResult]:
+        """Next detection result; worker log lines are forwarded to log_message on the way."""
+        try:
+            kind, payload = self.result_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if kind == 'log':
+            fts_system.log_message(payload)
+            return None
+        return payload
+
+    def confirm_track(self, camera_id: int, track_id: int, state: TrackIdentity):
+        """Let the camera's worker skip recognition for a track the coordinator has confirmed."""
+        # A copy: the queue pickles it later, on its feeder thread, while the coordinator keeps updating state.
+        self._send_control(camera_id, ('confirm', camera_id, track_id, replace(state)))
+
+    def drop_track(self, camera_id: int, track_id: int):
+        self._send_control(camera_id, ('drop', camera_id, track_id, None))
+
+    def _send_control(self, camera_id: int, message):
+        control_queue = self.control_queues.get(camera_id)
+        if control_queue is not None:
+            control_queue.put_nowait(message)
+
+    def latest_frame(self, camera_id: int, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        shared = self.shared_frames.get(camera_id)
+        return shared.read_latest(out) if shared is not None else None
+
+    def frame_shape(self, camera_id: int) -> Tuple[int, int, int]:
+        return self.shared_frames[camera_id].shape
+
+    def stats(self) -> Dict[str, Dict]:
+        return {process.name: {'pid': process.pid, 'alive': process.is_alive()} for process in self.processes}
+
+    def stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout=WORKER_JOIN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+        for shared in self.shared_frames.values():
+            shared.close()
+            shared.unlink()
+        self.shared_frames.clear()
+        for control_queue in set(self.control_queues.values()):
+            control_queue.close()
+            control_queue.cancel_join_thread()
+        self.control_queues.clear()
+        self.processes.clear()
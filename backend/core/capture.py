@@ -0,0 +1,184 @@
+"""
+Frame capture for the face tracking system.
+Each source gets a dedicated reader thread that decodes frames as fast as the
+source delivers them into the camera's frame ring and publishes them through
+its FrameSlot, which only ever holds the newest frame: a slow consumer skips
+straight to the latest frame instead of draining stale ones from the driver
+buffer. Sources can be device indices, RTSP/HTTP URLs or video files; a lost
+source is reopened with exponential backoff.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Union
+
+import cv2
+
+from backend.core.frame_buffer import FrameRing, FrameSlot
+from backend.core.stage_timings import StageTimings
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_INITIAL_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+RATE_WINDOW = 64  # frames per fps estimate
+
+def parse_source(source: Union[int, str]) -> Union[int, str]:
+    """Device index for integers and digit strings, otherwise the URL or path unchanged."""
+    if isinstance(source, str) and source.strip().isdigit():
+        return int(source)
+    return source
+
+def is_file_source(source: Union[int, str]) -> bool:
+    return isinstance(source, str) and os.path.isfile(source)
+
+class RateMeter:
+    """Events per second over the last RATE_WINDOW events."""
+
+    def __init__(self, window: int = RATE_WINDOW):
+        self.times = deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, events: int = 1):
+        with self.lock:
+            self.count += events
+            self.times.append((time.monotonic(), self.count))
+
+    def rate(self) -> float:
+        with self.lock:
+            if len(self.times) < 2:
+                return 0.0
+            (start, first), (end, last) = self.times[0], self.times[-1]
+            return (last - first) / (end - start) if end > start else 0.0
+
+class CameraCapture:
+    """Reader thread for one camera source with drop-oldest publishing and reconnect.
+
+    Live sources are read back to back so the driver never buffers stale
+    frames; video files are paced at their own frame rate and loop at the end.
+    Consumers report the sequence numbers they pick up with record_consumed(),
+    which is how frames dropped in favour of newer ones are counted.
+    """
+
+    def __init__(self, camera_id: int, source: Union[int, str], frame_ring: FrameRing, frame_slot: FrameSlot,
+                 stop_event, resolution: Optional[tuple] = None, fps: Optional[int] = None,
+                 timings: Optional[StageTimings] = None):
+        self.camera_id = camera_id
+        self.source = parse_source(source)
+        self.file_source = is_file_source(self.source)
+        self.frame_ring = frame_ring
+        self.frame_slot = frame_slot
+        self.stop_event = stop_event
+        self.resolution = resolution
+        self.fps = fps
+        self.timings = timings
+        self.decoded = RateMeter()
+        self.consumed = RateMeter()
+        self.dropped = 0
+        self.reconnects = 0
+        self.connected = False
+        self.thread = threading.Thread(target=self._run, name=f"capture-{camera_id}", daemon=True)
+
+    def start(self) -> "CameraCapture":
+        self.thread.start()
+        return self
+
+    def join(self, timeout: Optional[float] = None):
+        self.thread.join(timeout)
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        if not self.file_source:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if isinstance(self.source, int):
+            if self.fps:
+                cap.set(cv2.CAP_PROP_FPS, self.fps)
+            if self.resolution:
+                cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0])
+                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
+        return cap
+
+    def _run(self):
+        delay = RECONNECT_INITIAL_DELAY
+        while not self.stop_event.is_set():
+            cap = self._open()
+            if cap is None:
+                logger.warning(f"[CAPTURE] Cannot open camera {self.camera_id} ({self.source}); retrying in {delay:.1f}s")
+                if self.stop_event.wait(delay):
+                    break
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+            self.connected = True
+            try:
+                frames = self._read_until_failure(cap)
+            finally:
+                self.connected = False
+                cap.release()
+            if self.stop_event.is_set():
+                break
+            if self.file_source and frames > 0:
+                delay = RECONNECT_INITIAL_DELAY
+                continue  # end of file: start over
+            self.reconnects += 1
+            if frames > 0:
+                delay = RECONNECT_INITIAL_DELAY
+            logger.warning(f"[CAPTURE] Lost camera {self.camera_id} after {frames} frames; reconnecting in {delay:.1f}s")
+            if self.stop_event.wait(delay):
+                break
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def _read_until_failure(self, cap) -> int:
+        """Decode and publish frames until the source fails or stop is requested; returns frames read."""
+        interval = 0.0
+        if self.file_source:
+            file_fps = cap.get(cv2.CAP_PROP_FPS) or self.fps or 0
+            interval = 1.0 / file_fps if file_fps > 0 else 0.0
+        next_frame_time = time.monotonic()
+        frames = 0
+        while not self.stop_event.is_set():
+            if interval:
+                delay = next_frame_time - time.monotonic()
+                if delay > 0 and self.stop_event.wait(delay):
+                    break
+                next_frame_time = max(next_frame_time + interval, time.monotonic())
+            frame_ref, buffer = self.frame_ring.acquire()
+            read_start = time.perf_counter()
+            ret, image = cap.read(image=buffer)
+            if self.timings is not None:
+                self.timings.record('capture', time.perf_counter() - read_start)
+            if not ret:
+                frame_ref.release()
+                break
+            if image is not buffer:
+                self.frame_ring.adopt(frame_ref, image)  # first frame, or the source changed resolution
+            self.frame_slot.publish(frame_ref)
+            frame_ref.release()
+            self.decoded.record()
+            frames += 1
+        return frames
+
+    def record_consumed(self, frames_advanced: int):
+        """Called by the consumer with how far the slot sequence moved since its last frame."""
+        self.consumed.record()
+        dropped = max(0, frames_advanced - 1)
+        self.dropped += dropped
+        if dropped and self.timings is not None:
+            self.timings.count('frames_dropped', dropped)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'source': str(self.source),
+            'connected': self.connected,
+            'decode_fps': self.decoded.rate(),
+            'consumed_fps': self.consumed.rate(),
+            'decoded': self.decoded.count,
+            'consumed': self.consumed.count,
+            'dropped': self.dropped,
+            'reconnects': self.reconnects}
@@ -0,0 +1,99 @@
+"""
+In-memory employee metadata for the face tracking pipeline.
+Labels, attendance logging and the stats thread look employees up here on
+every recognized face, so lookups never touch the database or disk: the cache
+is filled by bulk refreshes from the database, and IDs that are missing or
+expired are only queued for the next refresh. IDs the database does not know
+are cached as negative entries, so an unknown identity costs one bulk query
+per negative TTL rather than one query per frame.
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+EMPLOYEE_CACHE_TTL = 900.0  # seconds a known employee's metadata is served before it is refreshed
+EMPLOYEE_CACHE_NEGATIVE_TTL = 60.0  # seconds an unknown ID is remembered as unknown
+
+class EmployeeMetadataCache:
+    """Employee ID -> metadata dict (employee_name, department, ...), with positive and negative TTL entries.
+
+    Expired positive entries keep being served until a refresh replaces them,
+    so a database outage degrades to stale names rather than raw IDs.
+    """
+
+    def __init__(self, ttl: float = EMPLOYEE_CACHE_TTL, negative_ttl: float = EMPLOYEE_CACHE_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries: Dict[str, Tuple[Optional[dict], float]] = {}  # employee_id -> (metadata or None, expires_at)
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, employee_id: str) -> Optional[dict]:
+        """Cached metadata, or None if the ID is unknown or not cached yet; never blocks on I/O."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(employee_id)
+            if entry is None or entry[1] < now:
+                self.misses += 1
+                self.pending.add(employee_id)
+            else:
+                self.hits += 1
+            return entry[0] if entry is not None else None
+
+    def name(self, employee_id: str) -> str:
+        metadata = self.get(employee_id)
+        return (metadata.get('employee_name') or employee_id) if metadata else employee_id
+
+    def put(self, employee_id: str, metadata: Optional[dict]):
+        """Cache one employee's metadata, or None to record the ID as unknown."""
+        ttl = self.ttl if metadata is not None else self.negative_ttl
+        with self.lock:
+            self.entries[employee_id] = (metadata, time.monotonic() + ttl)
+            self.pending.discard(employee_id)
+
+    def replace_all(self, metadata: Dict[str, dict], unknown: Iterable[str] = ()):
+        """Bulk refresh from the full employee table; cached employees missing from it and IDs in unknown become negative."""
+        now = time.monotonic()
+        expires_at = now + self.ttl
+        negative_expires_at = now + self.negative_ttl
+        with self.lock:
+            entries = {}
+            for employee_id, (cached, expiry) in self.entries.items():
+                if cached is not None:
+                    entries[employee_id] = (None, negative_expires_at)  # no longer in the database
+                elif expiry >= now:
+                    entries[employee_id] = (None, expiry)
+            for employee_id in unknown:
+                entries[employee_id] = (None, negative_expires_at)
+            for employee_id, employee in metadata.items():
+                entries[employee_id] = (employee, expires_at)
+            self.entries = entries
+            self.pending.clear()
+            self.refreshes += 1
+
+    def take_pending(self) -> List[str]:
+        """IDs looked up since the last refresh that were missing or expired."""
+        with self.lock:
+            pending = list(self.pending)
+            self.pending.clear()
+            return pending
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            known = sum(1 for metadata, _ in self.entries.values() if metadata is not None)
+            lookups = self.hits + self.misses
+            return {
+                'known': known,
+                'unknown': len(self.entries) - known,
+                'pending': len(self.pending),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'refreshes': self.refreshes}
@@ -3,11 +3,10 @@ import cv2
 import numpy as np
 import logging
 from datetime import datetime
-from typing import List, Union, Optional
+from typing import List, Tuple, Union, Optional
 from insightface.app import FaceAnalysis
 from backend.db.db_manager import DatabaseManager
 from backend.db.db_models import FaceEmbedding
-from fts_system import reload_embeddings_and_rebuild_index
 
 class FaceEnrollmentError(Exception):
     pass
@@ -50,6 +49,18 @@ class FaceEnroller:
                            min_faces: int = 3,
                            update_existing: bool = False,
                            rebuild_index: bool = True) -> bool:
+        stored_ids, stored_embeddings = self._store_image_embeddings(
+            employee_id, employee_name, image_paths, min_faces, update_existing)
+        if rebuild_index and not self._batch_mode and self.tracking_system:
+            self.tracking_system.add_embeddings(stored_ids, stored_embeddings, [employee_id] * len(stored_ids))
+        return True
+
+    def _store_image_embeddings(self, employee_id: str,
+                                employee_name: str,
+                                image_paths: Union[List[str], str],
+                                min_faces: int,
+                                update_existing: bool) -> Tuple[List[int], List[np.ndarray]]:
+        """Store one embedding per usable image in the database; returns the stored IDs and embeddings."""
         if not employee_id or not employee_name:
             self.logger.error("Employee ID and name cannot be empty")
             raise ValueError("Employee ID and name cannot be empty")
@@ -78,6 +89,8 @@ class FaceEnroller:
                 raise DatabaseOperationError(f"Failed to create employee {employee_id}")
             self.logger.info(f"Created new employee {employee_name} ({employee_id}) in database")
         valid_count = 0
+        stored_ids = []
+        stored_embeddings = []
         for img_path in image_paths:
             if not os.path.exists(img_path):
                 self.logger.warning(f"Image not found - {img_path}")
@@ -98,16 +111,18 @@ class FaceEnroller:
                 if not self._validate_quality_score(face.det_score):
                     self.logger.warning(f"Invalid quality score from {img_path}, using default")
                     face.det_score = 0.5
-                stored = self.db_manager.store_face_embedding(
+                embedding_id = self.db_manager.store_face_embedding(
                     employee_id,
                     face.embedding,
                     embedding_type='enroll' if not update_existing else 'update',
                     quality_score=face.det_score,
                     source_image_path=img_path
                 )
-                if not stored:
+                if not embedding_id:
                     self.logger.error(f"Error storing embedding for {employee_id} from {img_path}")
                     continue
+                stored_ids.append(embedding_id)
+                stored_embeddings.append(face.embedding)
                 valid_count += 1
                 self.logger.info(f"Processed {img_path} - Face detected and embedding stored in DB")
             except Exception as e:
@@ -116,9 +131,7 @@ class FaceEnroller:
         if valid_count >= min_faces:
             action = "Updated" if update_existing else "Enrolled"
             self.logger.info(f"{action} {employee_name} ({employee_id}) with {valid_count} images")
-            if rebuild_index and not self._batch_mode and self.tracking_system:
-                self.tracking_system.reload_embeddings_and_rebuild_index()
-            return True
+            return stored_ids, stored_embeddings
         else:
             self.logger.error(f"Only {valid_count} valid faces found (minimum {min_faces} required)")
             raise ValueError(f"Insufficient valid faces: {valid_count} < {min_faces}")
@@ -146,17 +159,17 @@ class FaceEnroller:
             if not self._validate_quality_score(face.det_score):
                 self.logger.warning(f"Invalid quality score from {image_path}, using default")
                 face.det_score = 0.5
-            stored = self.db_manager.store_face_embedding(
+            embedding_id = self.db_manager.store_face_embedding(
                 employee_id,
                 face.embedding,
                 embedding_type='update',
                 quality_score=face.det_score,
                 source_image_path=image_path
             )
-            if stored:
+            if embedding_id:
                 self.logger.info(f"Added new embedding for {employee_id} from {image_path}")
                 if rebuild_index and not self._batch_mode and self.tracking_system:
-                    self.tracking_system.reload_embeddings_and_rebuild_index()
+                    self.tracking_system.add_embeddings([embedding_id], [face.embedding], [employee_id])
                 return True
             else:
                 self.logger.error(f"Error storing embedding for {employee_id} from {image_path}")
@@ -172,16 +185,16 @@ class FaceEnroller:
         try:
             if not self.remove_all_embeddings(employee_id, rebuild_index=False):
                 return False
-            success = self.enroll_from_images(
+            stored_ids, stored_embeddings = self._store_image_embeddings(
                 employee_id,
                 self.db_manager.get_employee(employee_id).employee_name,
                 image_paths,
-                update_existing=True,
-                rebuild_index=False
+                min_faces=3,
+                update_existing=True
             )
-            if success and rebuild_index and self.tracking_system:
-                self.tracking_system.reload_embeddings_and_rebuild_index()
-            return success
+            if rebuild_index and self.tracking_system:
+                self.tracking_system.replace_employee_embeddings(employee_id, stored_ids, stored_embeddings)
+            return True
         finally:
             self.set_batch_mode(False)
 
@@ -191,7 +204,7 @@ class FaceEnroller:
             if success:
                 self.logger.info(f"Deleted embedding ID {embedding_id}")
                 if rebuild_index and not self._batch_mode and self.tracking_system:
-                    self.tracking_system.reload_embeddings_and_rebuild_index()
+                    self.tracking_system.remove_embeddings([embedding_id])
             else:
                 self.logger.error(f"Error deleting embedding ID {embedding_id}")
                 raise DatabaseOperationError(f"Failed to delete embedding ID {embedding_id}")
@@ -208,7 +221,7 @@ class FaceEnroller:
             if success:
                 self.logger.info(f"Deleted all embeddings for {employee_id}")
                 if rebuild_index and not self._batch_mode and self.tracking_system:
-                    self.tracking_system.reload_embeddings_and_rebuild_index()
+                    self.tracking_system.remove_employee_embeddings(employee_id)
                 return True
             else:
                 self.logger.error(f"Error deleting embeddings for {employee_id}")
@@ -225,7 +238,7 @@ class FaceEnroller:
             if success:
                 self.logger.info(f"Archived all embeddings for {employee_id}")
                 if rebuild_index and not self._batch_mode and self.tracking_system:
-                    self.tracking_system.reload_embeddings_and_rebuild_index()
+                    self.tracking_system.remove_employee_embeddings(employee_id)
                 return True
             else:
                 self.logger.error(f"Error archiving embeddings for {employee_id}")
@@ -242,7 +255,7 @@ class FaceEnroller:
             if success:
                 self.logger.info(f"Deleted employee {employee_id} from database")
                 if rebuild_index and not self._batch_mode and self.tracking_system:
-                    self.tracking_system.reload_embeddings_and_rebuild_index()
+                    self.tracking_system.remove_employee_embeddings(employee_id)
             else:
                 self.logger.error(f"Error deleting employee {employee_id} from database")
                 raise DatabaseOperationError(f"Failed to delete employee {employee_id}")
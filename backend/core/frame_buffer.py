@@ -0,0 +1,141 @@
+"""
+Frame handoff between capture and detection threads.
+Each camera decodes into a small ring of preallocated, reference-counted
+frame buffers and publishes them through a FrameSlot: publishing bumps a
+sequence number and wakes every waiter, so consumers block until a frame
+they have not seen yet is available and then read it through a read-only
+view of the ring buffer, without copying.
+"""
+
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_RING_SIZE = 4  # capture + published + detector + processing loop
+
+class FrameRef:
+    """Counted reference to one ring buffer; release() when done with array."""
+
+    def __init__(self, ring: "FrameRing", index: int):
+        self.ring = ring
+        self.index = index
+
+    @property
+    def array(self) -> np.ndarray:
+        """Read-only view of the frame."""
+        return self.ring.views[self.index]
+
+    def retain(self) -> "FrameRef":
+        self.ring._retain(self.index)
+        return self
+
+    def release(self):
+        self.ring._release(self.index)
+
+    def __enter__(self) -> "FrameRef":
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+class FrameRing:
+    """Preallocated frame buffers recycled once no reference to them remains.
+
+    Buffers are allocated lazily from the first frame's shape. If every buffer
+    is still referenced the ring grows by one rather than blocking capture.
+    """
+
+    def __init__(self, size: int = DEFAULT_RING_SIZE):
+        self.size = size
+        self.buffers: List[Optional[np.ndarray]] = [None] * size
+        self.views: List[Optional[np.ndarray]] = [None] * size
+        self.refcounts = [0] * size
+        self.lock = threading.Lock()
+        self.next_index = 0
+
+    def acquire(self) -> Tuple[FrameRef, Optional[np.ndarray]]:
+        """Reserve a free buffer for writing; returns its reference and the writable buffer (None until sized)."""
+        with self.lock:
+            for offset in range(len(self.buffers)):
+                index = (self.next_index + offset) % len(self.buffers)
+                if self.refcounts[index] == 0:
+                    break
+            else:
+                index = len(self.buffers)
+                self.buffers.append(None)
+                self.views.append(None)
+                self.refcounts.append(0)
+            self.refcounts[index] = 1
+            self.next_index = (index + 1) % len(self.buffers)
+            return FrameRef(self, index), self.buffers[index]
+
+    def adopt(self, ref: FrameRef, image: np.ndarray):
+        """Make image the buffer behind ref, e.g. when the decoder had to allocate a new size."""
+        view = image.view()
+        view.flags.writeable = False
+        with self.lock:
+            self.buffers[ref.index] = image
+            self.views[ref.index] = view
+
+    def _retain(self, index: int):
+        with self.lock:
+            self.refcounts[index] += 1
+
+    def _release(self, index: int):
+        with self.lock:
+            self.refcounts[index] -= 1
+
+    def in_use(self) -> int:
+        with self.lock:
+            return sum(1 for count in self.refcounts if count > 0)
+
+class FrameSlot:
+    """Latest-frame slot with a monotonically increasing sequence number.
+
+    The slot holds one reference to the published frame and drops it when the
+    next frame is published. Readers get their own reference, which they must
+    release.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.frame_ref: Optional[FrameRef] = None
+        self.seq = 0
+        self.closed = False
+
+    def publish(self, frame_ref: FrameRef) -> int:
+        frame_ref.retain()
+        with self.condition:
+            previous = self.frame_ref
+            self.frame_ref = frame_ref
+            self.seq += 1
+            seq = self.seq
+            self.condition.notify_all()
+        if previous is not None:
+            previous.release()
+        return seq
+
+    def latest(self) -> Tuple[int, Optional[FrameRef]]:
+        with self.condition:
+            if self.frame_ref is None:
+                return self.seq, None
+            return self.seq, self.frame_ref.retain()
+
+    def wait_for_newer(self, last_seq: int, timeout: Optional[float] = None) -> Tuple[int, Optional[FrameRef]]:
+        """Block until a frame newer than last_seq is published; returns (last_seq, None) on timeout or close."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.seq > last_seq or self.closed, timeout):
+                return last_seq, None
+            if self.seq <= last_seq:
+                return last_seq, None
+            return self.seq, self.frame_ref.retain()
+
+    def close(self):
+        """Wake all waiters for shutdown and drop the published frame."""
+        with self.condition:
+            self.closed = True
+            previous, self.frame_ref = self.frame_ref, None
+            self.condition.notify_all()
+        if previous is not None:
+            previous.release()
@@ -0,0 +1,126 @@
+"""
+Live view frames for the MJPEG stream.
+The processing loop publishes every frame to its camera's FrameStream as a
+reference to the raw ring buffer plus a compact overlay description (box,
+label, colour, quality), and nothing is drawn or encoded there. The first
+viewer to ask for a frame at a given JPEG quality renders the overlay onto a
+copy and encodes it; every other viewer of that camera and quality gets the
+same bytes. While nobody is subscribed the stream does not even keep the
+frame.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from backend.core.frame_buffer import FrameRef
+from backend.core.stage_timings import StageTimings
+
+class OverlayBox(NamedTuple):
+    bbox: Tuple[int, int, int, int]  # x1, y1, x2, y2
+    label: str
+    color: Tuple[int, int, int]  # BGR
+    quality: float
+
+class FrameStream:
+    """Latest frame and overlay of one camera, rendered and JPEG-encoded on demand for its subscribers.
+
+    render(canvas, boxes) draws the overlay onto a writable copy of the frame.
+    Encoded frames are cached per quality until the next frame is published.
+    """
+
+    def __init__(self, render: Callable[[np.ndarray, List[OverlayBox]], None], timings: Optional[StageTimings] = None):
+        self.render = render
+        self.timings = timings
+        self.condition = threading.Condition()
+        self.seq = 0
+        self.frame_ref: Optional[FrameRef] = None
+        self.boxes: List[OverlayBox] = []
+        self.subscribers = 0
+        self.closed = False
+        self.encode_lock = threading.Lock()
+        self.encoded: Dict[int, Tuple[int, bytes]] = {}  # quality -> (seq, jpeg)
+        self.canvas: Optional[np.ndarray] = None
+
+    @property
+    def has_subscribers(self) -> bool:
+        return self.subscribers > 0
+
+    @contextmanager
+    def subscribe(self):
+        with self.condition:
+            self.subscribers += 1
+        try:
+            yield self
+        finally:
+            with self.condition:
+                self.subscribers -= 1
+                last = self.subscribers == 0
+                previous = None
+                if last:
+                    previous, self.frame_ref = self.frame_ref, None
+            if previous is not None:
+                previous.release()
+            if last:
+                with self.encode_lock:
+                    self.encoded.clear()
+
+    def publish(self, boxes: List[OverlayBox], frame_ref: Optional[FrameRef] = None) -> int:
+        """Publish the overlay of the next frame; frame_ref is only retained while there are subscribers."""
+        if frame_ref is not None and self.has_subscribers:
+            frame_ref.retain()
+        else:
+            frame_ref = None
+        with self.condition:
+            previous, self.frame_ref = self.frame_ref, frame_ref
+            self.boxes = boxes
+            self.seq += 1
+            seq = self.seq
+            self.condition.notify_all()
+        if previous is not None:
+            previous.release()
+        return seq
+
+    def wait_for_jpeg(self, last_seq: int, quality: int, timeout: Optional[float] = None) -> Tuple[int, Optional[bytes]]:
+        """JPEG of the first frame newer than last_seq; returns (last_seq, None) on timeout or close."""
+        with self.condition:
+            if not self.condition.wait_for(
+                    lambda: self.closed or (self.seq > last_seq and self.frame_ref is not None), timeout):
+                return last_seq, None
+            if self.closed:
+                return last_seq, None
+            seq, frame_ref, boxes = self.seq, self.frame_ref.retain(), self.boxes
+        with frame_ref, self.encode_lock:
+            cached = self.encoded.get(quality)
+            if cached is not None and cached[0] >= seq:
+                return cached
+            if self.canvas is None or self.canvas.shape != frame_ref.array.shape:
+                self.canvas = np.empty_like(frame_ref.array)
+            self._timed('render', self._render, frame_ref.array, boxes)
+            ok, jpeg = self._timed('encode', cv2.imencode, '.jpg', self.canvas, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ok:
+                return seq, None
+            self.encoded[quality] = (seq, jpeg.tobytes())
+            return self.encoded[quality]
+
+    def _render(self, frame: np.ndarray, boxes: List[OverlayBox]):
+        np.copyto(self.canvas, frame)
+        self.render(self.canvas, boxes)
+
+    def _timed(self, stage: str, fn, *args):
+        if self.timings is None:
+            return fn(*args)
+        with self.timings.time(stage):
+            return fn(*args)
+
+    def close(self):
+        """Wake all viewers for shutdown and drop the frame."""
+        with self.condition:
+            self.closed = True
+            previous, self.frame_ref = self.frame_ref, None
+            self.condition.notify_all()
+        if previous is not None:
+            previous.release()
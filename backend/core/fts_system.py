@@ -9,9 +9,10 @@ import csv
 import pickle
 import sys
 from collections import defaultdict, deque
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple
 from insightface.app import FaceAnalysis
+from insightface.app.common import Face
 from bytetracker.byte_tracker import BYTETracker
 import requests
 import json
@@ -21,7 +22,20 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from backend.db.db_manager import DatabaseManager
 from backend.db.db_config import create_tables
-from backend.db.db_models import Employee, FaceEmbedding, AttendanceRecord
+from backend.db.db_models import Employee, FaceEmbedding
+from backend.core.capture import CameraCapture, is_file_source
+from backend.core.employee_cache import EmployeeMetadataCache
+from backend.core.enhancement import FrameEnhancer
+from backend.core.face_quality import score_faces
+from backend.core.frame_buffer import FrameRef, FrameRing, FrameSlot
+from backend.core.frame_stream import FrameStream, OverlayBox
+from backend.core.identity_state import IdentityStateStore
+from backend.core.inference import InferenceScheduler
+from backend.core.metrics import register_camera
+from backend.core.motion_gate import MotionGate
+from backend.core.stage_timings import StageTimings
+from backend.core.gallery import (GalleryIndex, GallerySnapshot, MatchCache, SNAPSHOT_COMPACTION_THRESHOLD,
+                                  load_gallery_snapshot, save_gallery_snapshot)
 from datetime import timedelta
 
 # Global variables for Django integration
@@ -67,6 +81,24 @@ class CameraConfig:
     tripwires: List[TripwireConfig]
     resolution: tuple
     fps: int
+    roi: Optional[Tuple[float, float, float, float]] = None  # normalized x1, y1, x2, y2; None = tripwire band
+    source: Optional[str] = None  # device index, RTSP/HTTP URL or video file path; None = camera_id
+
+    def detection_roi(self, margin: float) -> Tuple[float, float, float, float]:
+        """Region the detector runs on: the configured ROI, or a band around the tripwires padded by margin."""
+        if self.roi is not None:
+            return self.roi
+        if not self.tripwires:
+            return (0.0, 0.0, 1.0, 1.0)
+        x1, y1, x2, y2 = 1.0, 1.0, 0.0, 0.0
+        for tripwire in self.tripwires:
+            low = max(0.0, tripwire.position - tripwire.spacing / 2 - margin)
+            high = min(1.0, tripwire.position + tripwire.spacing / 2 + margin)
+            if tripwire.direction == 'vertical':
+                x1, x2, y1, y2 = min(x1, low), max(x2, high), 0.0, 1.0
+            else:
+                x1, x2, y1, y2 = 0.0, 1.0, min(y1, low), max(y2, high)
+        return (x1, y1, x2, y2)
 
 @dataclass
 class GlobalTrack:
@@ -76,6 +108,20 @@ class GlobalTrack:
     embedding_history: deque
     confidence_score: float = 0.0
     work_status: str = "working"
+    score_history: deque = field(default_factory=lambda: deque(maxlen=EMBEDDING_HISTORY_SIZE))
+
+    def record_score(self, similarity: float):
+        """Remember the gallery similarity of a stored embedding, measured when it was matched."""
+        self.score_history.append(similarity)
+
+@dataclass
+class TrackIdentity:
+    identity: str
+    score: float
+    anchor_embedding: np.ndarray
+    last_seen_time: float
+    frames_since_verify: int = 0
+    anchor_area: float = 0.0
 
 @dataclass
 class EmployeeMetadata:
@@ -93,14 +139,6 @@ class FaceQualityMetrics:
     size_score: float
     overall_quality: float
 
-@dataclass
-class TrackingState:
-    position_history: List[Tuple[int, int]]
-    velocity: Tuple[float, float]
-    predicted_position: Tuple[int, int]
-    confidence_history: List[float]
-    quality_history: List[FaceQualityMetrics]
-
 known_faces_dir = r"D:\Python Course\SEDL AI\insightface-env\known_faces"
 THRESHOLD = 0.6
 DET_THRESH = 0.5
@@ -111,8 +149,43 @@ FRAME_INTERVAL = 1 / 10
 GLOBAL_TRACK_TIMEOUT = 300
 EMBEDDING_HISTORY_SIZE = 5
 TRACK_BUFFER_SIZE = 30
+TRACK_IOU_THRESH = 0.3
 log_file_path = "attendance_log.csv"
-ENHANCED_CONFIG = {'face_quality_threshold': 0.65}
+ENHANCED_CONFIG = {
+    'face_quality_threshold': 0.75,  # 0.65 under the old landmark/embedding scorer, see face_quality
+    'faiss_index_type': 'auto',  # auto, flat, hnsw<M>, ivf<nlist>, fp16, sq8 or pq<M>
+    'hnsw_ef_search': 64,
+    'ivf_nprobe': 16,
+    'gallery_snapshot_dir': 'gallery_snapshot',  # None disables the on-disk snapshot
+    'gallery_snapshot_mmap': True,
+    'track_reverify_interval': 30,  # frames a confirmed track reuses its identity before re-searching
+    'track_drift_threshold': 0.75,  # re-search when cosine to the verified embedding drops below this
+    'track_scale_drift': 1.5,  # re-recognize a confirmed track once its face area changes by this factor
+    'match_cache_size': 4096,
+    'match_cache_ttl': 10.0,
+    'inference_batching': True,  # batch recognition across cameras; False embeds on each camera's own thread
+    'inference_max_batch': 8,  # frames per cross-camera recognition micro-batch on one device
+    'inference_max_wait_ms': 10,
+    'det_size': (416, 416),  # detector input; can be raised when detection runs on a tripwire ROI
+    'tripwire_roi_margin': 0.2,  # band each side of the tripwires detected on when a camera has no roi
+    'detection_max_width': 960,  # the ROI is downscaled to this width before enhancement and detection
+    'enhancement_mode': 'clahe_y',  # off, lut (gamma LUT), clahe_y (CLAHE on Y) or clahe (LAB CLAHE + blur)
+    'enhancement_luminance_threshold': 90,  # enhance only frames darker than this mean luma...
+    'enhancement_contrast_threshold': 30,  # ...or flatter than this luma standard deviation
+    'motion_gate_enabled': True,  # skip detection while the scene is static
+    'motion_pixel_threshold': 15,  # grey levels a thumbnail pixel must change by
+    'motion_activity_threshold': 0.002,  # fraction of changed thumbnail pixels that counts as motion
+    'motion_max_skip_seconds': 2.0,  # detect at least this often even without motion
+    'camera_worker_processes': False,  # capture and detection in worker processes, identity state here
+    'cameras_per_process': 1,  # cameras sharing one worker process and its models
+    'replay_summary_path': 'replay_summary.json',  # where replay() writes its throughput summary
+    'stream_jpeg_quality': 80,  # default JPEG quality of the live MJPEG stream
+    'employee_cache_ttl': 900.0,  # seconds before a cached employee name is refreshed from the database
+    'employee_cache_negative_ttl': 60.0,  # seconds an ID missing from the database stays cached as unknown
+    'employee_cache_refresh_interval': 5.0,  # how often cache misses are resolved with one bulk query
+    'identity_state_capacity': 10000,  # identities with tracking state kept; least recently seen evicted first
+    'identity_history_size': 30,  # positions, confidences and quality metrics kept per identity
+    'identity_sweep_interval': 60.0}  # seconds between sweeps evicting identities idle for GLOBAL_TRACK_TIMEOUT
 
 API_CONFIG = {
     'base_url': 'https://people.zoho.in/people/api',
@@ -144,28 +217,6 @@ CAMERAS = [
         resolution=(1280, 720),
         fps=15)]
 
-def load_employee_metadata(employee_id: str) -> Optional[EmployeeMetadata]:
-    emp_folder = os.path.join(known_faces_dir, employee_id)
-    metadata_path = os.path.join(emp_folder, "metadata.pkl")
-    if os.path.exists(metadata_path):
-        try:
-            with open(metadata_path, 'rb') as f:
-                data = pickle.load(f)
-                if isinstance(data, dict):
-                    return EmployeeMetadata(
-                        employee_id=data.get('employee_id', employee_id),
-                        employee_name=data.get('employee_name', employee_id),
-                        enrollment_date=data.get('enrollment_date', ''),
-                        embedding_count=data.get('embedding_count', 0),
-                        source_images=data.get('source_images', []))
-                elif isinstance(data, EmployeeMetadata):
-                    return data
-                else:
-                    return None
-        except:
-            return None
-    return None
-
 def save_employee_metadata(metadata: EmployeeMetadata):
     emp_folder = os.path.join(known_faces_dir, metadata.employee_id)
     os.makedirs(emp_folder, exist_ok=True)
@@ -173,6 +224,9 @@ def save_employee_metadata(metadata: EmployeeMetadata):
     with open(metadata_path, 'wb') as f:
         pickle.dump(metadata, f)
 
+def _bbox_area(bbox) -> float:
+    return float(max(0.0, bbox[2] - bbox[0]) * max(0.0, bbox[3] - bbox[1]))
+
 class KalmanTracker:
     def __init__(self):
         self.kalman = cv2.KalmanFilter(4, 2)
@@ -195,7 +249,7 @@ class KalmanTracker:
             self.initialized = True
         prediction = self.kalman.predict()
         self.kalman.correct(measurement)
-        return int(prediction[0]), int(prediction[1])
+        return int(prediction[0, 0]), int(prediction[1, 0])
 
 class APILogger:
     def __init__(self, config):
@@ -397,50 +451,36 @@ class APILogger:
 
 class FaceTrackingSystem:
     def __init__(self):
-        self.embeddings = []
-        self.labels = []
-        self.employee_metadata = {}
-        self.index = None
-        self.apps = {}
-        self.trackers = {}
+        self.gallery_snapshot = GallerySnapshot.from_gallery(GalleryIndex())
+        self.gallery_compaction_thread = None
+        self.saved_gallery_version = None
+        self.employee_cache = EmployeeMetadataCache(
+            ttl=ENHANCED_CONFIG.get('employee_cache_ttl', 900.0),
+            negative_ttl=ENHANCED_CONFIG.get('employee_cache_negative_ttl', 60.0))
+        self._init_detection_state()
         self.global_tracks = {}
-        self.track_identities = {}
-        self.track_lifetimes = {}
-        self.track_positions = {}
         self.last_embedding_update = {}
-        self.frame_locks = {}
-        self.latest_frames = {}
-        self.latest_faces = {}
-        self.face_detection_threads = {}
-        self.embedding_cache = {}
+        self.match_cache = MatchCache(
+            max_entries=ENHANCED_CONFIG.get('match_cache_size', 4096),
+            ttl=ENHANCED_CONFIG.get('match_cache_ttl', 10.0))
         self.next_global_track_id = 1
         self.last_faces_reload = time.time()
-        self.faces_reload_interval = 30
-        self.frame_skip_counter = {}
-        self.detection_interval = {}
-        self.identity_tracks = {}
-        self.identity_last_seen = {}
-        self.identity_cameras = {}
-        self.identity_positions = {}
-        self.identity_trip_logged = {}
-        self.identity_crossing_state = {}
-        self.identity_zone_state = {}
-        self.kalman_trackers = {}
-        self.tracking_states = {}
+        self.faces_reload_interval = 300
+        self.identity_states = IdentityStateStore(
+            timeout=GLOBAL_TRACK_TIMEOUT,
+            capacity=ENHANCED_CONFIG.get('identity_state_capacity', 10000),
+            history_size=ENHANCED_CONFIG.get('identity_history_size', 30),
+            kalman_factory=KalmanTracker)
+        self.last_identity_sweep = time.time()
         self.api_logger = APILogger(API_CONFIG)
         self.enable_csv_backup = True
         self.global_tracks_lock = threading.RLock()
         self.embedding_update_lock = threading.RLock()
-        self.identity_tracks_lock = threading.RLock()
-        self.embedding_cache_lock = threading.RLock()
-        self.faiss_index_lock = threading.RLock()
-        self.metadata_lock = threading.RLock()
+        self.gallery_write_lock = threading.RLock()  # writers only; searches read gallery_snapshot lock-free
         self.embedding_update_queue = queue.Queue()
         self.shutdown_flag = threading.Event()
         self.embedding_update_worker = None
         self.batch_update_threshold = 5
-        self.updates_since_last_rebuild = 0
-        self.max_updates_before_rebuild = 20
         self.db_manager = DatabaseManager()
         create_tables()
         self.embedding_update_worker = threading.Thread(target=self._embedding_update_worker, daemon=True)
@@ -448,16 +488,24 @@ class FaceTrackingSystem:
         if self.enable_csv_backup:
             self._prepare_csv()
         self.camera_threads = []
+        self.camera_pool = None
+        self.event_counts = defaultdict(int)
+        self.camera_configs = {cam.camera_id: cam for cam in CAMERAS}
         self._load_known_faces()
         self._load_employee_metadata()
-        self._initialize_faiss()
-        self._initialize_multi_gpu_insightface()
+        if not ENHANCED_CONFIG.get('camera_worker_processes', False):
+            # In worker-process mode the models are loaded by the camera workers instead.
+            self._initialize_multi_gpu_insightface()
         self._initialize_cameras()
         self._prepare_csv()
         
         # Start stats updater thread
         self.stats_thread = threading.Thread(target=self._update_stats, daemon=True)
         self.stats_thread.start()
+        self.gallery_reload_thread = threading.Thread(target=self._gallery_reload_worker, daemon=True)
+        self.gallery_reload_thread.start()
+        self.employee_cache_thread = threading.Thread(target=self._employee_cache_worker, daemon=True)
+        self.employee_cache_thread.start()
 
     def _update_stats(self):
         """Periodically update system statistics"""
@@ -476,54 +524,143 @@ class FaceTrackingSystem:
                 # Update with active users
                 for track in active_tracks:
                     emp_id = track.employee_id
-                    with self.metadata_lock:
-                        if emp_id in self.employee_metadata:
-                            dept = self.employee_metadata[emp_id].get('department', 'Unknown')
-                            present_users_by_department[dept].append(emp_id)
+                    metadata = self.employee_cache.get(emp_id)
+                    if metadata:
+                        dept = metadata.get('department', 'Unknown')
+                        present_users_by_department[dept].append(emp_id)
             
             # Update other stats
             system_stats["cam_count"] = len(CAMERAS)
             system_stats["faces_detected"] = len(active_tracks)
             system_stats["attendance_count"] = len(latest_attendance)
+            if time.time() - self.last_identity_sweep >= ENHANCED_CONFIG.get('identity_sweep_interval', 60.0):
+                self._sweep_identity_state(time.time())
             
             time.sleep(5)  # Update every 5 seconds
 
+    def _sweep_identity_state(self, now: float):
+        """Evict the tracking state (Kalman filter, histories, tripwire crossings) of identities not seen for GLOBAL_TRACK_TIMEOUT.
+
+        Work status, the match-score EWMA and the embedding-update cooldown in
+        global_tracks are kept: an employee returning after a long absence
+        resumes with them.
+        """
+        self.last_identity_sweep = now
+        expired = self.identity_states.sweep(now)
+        if expired:
+            footprint = self.identity_states.footprint()
+            log_message(f"[STATE] Evicted {len(expired)} idle identities; {footprint['identities']} tracked, "
+                        f"~{footprint['estimated_bytes'] / 1024:.0f} KB of tracking state")
+
     def _load_known_faces(self):
         try:
-            embeddings_list, labels_list = self.db_manager.get_all_active_embeddings()
-            if embeddings_list:
-                self.embeddings = np.array(embeddings_list).astype('float32')
-                self.labels = labels_list
-                faiss.normalize_L2(self.embeddings)
+            if self._load_gallery_snapshot():
+                return
+            embedding_ids, embeddings_list, labels_list = self.db_manager.get_active_embedding_records()
+            self._publish_gallery(self._build_gallery(embedding_ids, embeddings_list, labels_list))
             log_message(f"[INIT] Loaded {len(set(labels_list)) if labels_list else 0} employees with {len(embeddings_list)} embeddings from database")
         except Exception as e:
             log_message(f"[ERROR] Failed to load known faces from database: {e}")
-            self.embeddings = []
-            self.labels = []
+            self._publish_gallery(GalleryIndex())
+
+    def _load_gallery_snapshot(self) -> bool:
+        """Start from the on-disk gallery snapshot and apply only the DB rows changed since it was saved."""
+        snapshot_dir = ENHANCED_CONFIG.get('gallery_snapshot_dir')
+        if not snapshot_dir:
+            return False
+        try:
+            loaded = load_gallery_snapshot(
+                snapshot_dir,
+                mmap=ENHANCED_CONFIG.get('gallery_snapshot_mmap', True),
+                hnsw_ef_search=ENHANCED_CONFIG.get('hnsw_ef_search', 64),
+                ivf_nprobe=ENHANCED_CONFIG.get('ivf_nprobe', 16))
+        except Exception as e:
+            log_message(f"[WARNING] Could not load gallery snapshot from {snapshot_dir}: {e}")
+            return False
+        if loaded is None:
+            return False
+        gallery, manifest = loaded
+        with self.gallery_write_lock:
+            self._publish_gallery_snapshot(GallerySnapshot.from_gallery(gallery, manifest['gallery_version']))
+            self.saved_gallery_version = manifest['gallery_version']
+        added, removed = self._sync_gallery_with_database()
+        log_message(f"[INIT] Loaded gallery snapshot v{manifest['gallery_version']} with {len(gallery)} embeddings; "
+                    f"applied {added} new and {removed} removed rows from database")
+        return True
+
+    def _sync_gallery_with_database(self) -> Tuple[int, int]:
+        """Diff the live gallery ids against the active DB rows and apply the difference as deltas.
+
+        The diff covers every active (id, employee) key, because the active set
+        is not append-only: rows are deactivated in place and older 'update'
+        rows rotate out as newer ones arrive, neither with a timestamp. Only the
+        embedding blobs of new ids are fetched.
+        """
+        active = dict(self.db_manager.get_active_embedding_keys())
+        with self.gallery_write_lock:
+            live_ids = self.gallery_snapshot.embedding_ids()
+            if not active and live_ids:
+                log_message("[WARNING] Database returned no active embeddings; keeping the current gallery")
+                return 0, 0
+            removed = self.remove_embeddings([i for i in live_ids if i not in active])
+            new_ids = [i for i in active if i not in live_ids]
+            added = 0
+            if new_ids:
+                embedding_ids, embeddings_list, labels_list = self.db_manager.get_embeddings_by_ids(new_ids)
+                added = self.add_embeddings(embedding_ids, embeddings_list, labels_list)
+        return added, removed
+
+    def _save_gallery_snapshot(self):
+        snapshot_dir = ENHANCED_CONFIG.get('gallery_snapshot_dir')
+        snapshot = self.gallery_snapshot
+        if not snapshot_dir or snapshot.version == self.saved_gallery_version:
+            return
+        try:
+            gallery = snapshot.compact() if snapshot.pending_changes else snapshot.base
+            path = save_gallery_snapshot(snapshot_dir, gallery, snapshot.version)
+            self.saved_gallery_version = snapshot.version
+            log_message(f"[INDEX] Saved gallery snapshot v{snapshot.version} ({len(gallery)} embeddings) to {path}")
+        except Exception as e:
+            log_message(f"[WARNING] Could not save gallery snapshot to {snapshot_dir}: {e}")
+
+    def _fetch_employee_metadata(self) -> Dict[str, dict]:
+        return {
+            employee.id: {
+                'employee_name': employee.employee_name,
+                'department': employee.department,
+                'designation': employee.designation,
+                'email': employee.email,
+                'phone': employee.phone}
+            for employee in self.db_manager.get_all_employees()}
 
     def _load_employee_metadata(self):
         try:
-            employees = self.db_manager.get_all_employees()
-            for employee in employees:
-                self.employee_metadata[employee.id] = {
-                    'employee_name': employee.employee_name,
-                    'department': employee.department,
-                    'designation': employee.designation,
-                    'email': employee.email,
-                    'phone': employee.phone
-                }
-            log_message(f"[INIT] Loaded metadata for {len(employees)} employees from database")
+            employee_metadata = self._fetch_employee_metadata()
+            self.employee_cache.replace_all(employee_metadata)
+            log_message(f"[INIT] Loaded metadata for {len(employee_metadata)} employees from database")
         except Exception as e:
             log_message(f"[ERROR] Failed to load employee metadata from database: {e}")
 
+    def _employee_cache_worker(self):
+        """Resolve employee cache misses off the frame path, with one bulk query per refresh interval."""
+        interval = ENHANCED_CONFIG.get('employee_cache_refresh_interval', 5.0)
+        while not self.shutdown_flag.wait(interval):
+            pending = self.employee_cache.take_pending()
+            if not pending:
+                continue
+            try:
+                employee_metadata = self._fetch_employee_metadata()
+            except Exception as e:
+                log_message(f"[WARNING] Could not refresh employee metadata for {len(pending)} IDs: {e}")
+                continue
+            unknown = [employee_id for employee_id in pending if employee_id not in employee_metadata]
+            self.employee_cache.replace_all(employee_metadata, unknown)
+            if unknown:
+                log_message(f"[CACHE] {len(unknown)} IDs not found in the employee table: {', '.join(unknown[:5])}")
+
     def get_employee_name(self, employee_id: str) -> str:
-        with self.metadata_lock:
-            if employee_id in self.employee_metadata:
-                return self.employee_metadata[employee_id]['employee_name']
-            employee = self.db_manager.get_employee(employee_id)
-            if employee:
-                return employee.employee_name
-            return employee_id
+        """Display name from the employee cache; the ID itself until the cache knows the employee."""
+        return self.employee_cache.name(employee_id)
 
     def _check_employee_work_status(self, employee_id: str) -> bool:
         try:
@@ -645,13 +782,12 @@ class FaceTrackingSystem:
                 email=email,
                 phone=phone)
             if success:
-                with self.metadata_lock:
-                    self.employee_metadata[employee_id] = {
-                        'employee_name': employee_name,
-                        'department': department,
-                        'designation': designation,
-                        'email': email,
-                        'phone': phone}
+                self.employee_cache.put(employee_id, {
+                    'employee_name': employee_name,
+                    'department': department,
+                    'designation': designation,
+                    'email': email,
+                    'phone': phone})
                 log_message(f"[REGISTER] Successfully registered employee: {employee_name} ({employee_id})")
                 return True
             else:
@@ -668,22 +804,14 @@ class FaceTrackingSystem:
                 log_message("[WARNING] Embedding generation from image not implemented")
                 return False
             embedding = embedding / np.linalg.norm(embedding)
-            success = self.db_manager.store_face_embedding(
+            embedding_id = self.db_manager.store_face_embedding(
                 employee_id=employee_id,
                 embedding=embedding,
                 embedding_type='registration',
                 quality_score=1.0,
                 source_image_path=image_path)
-            if success:
-                with self.faiss_index_lock:
-                    if len(self.embeddings) > 0:
-                        self.embeddings = np.vstack([self.embeddings, embedding.reshape(1, -1)])
-                    else:
-                        self.embeddings = embedding.reshape(1, -1)
-                    self.labels.append(employee_id)
-                    faiss.normalize_L2(self.embeddings)
-                    self.index = faiss.IndexFlatIP(self.embeddings.shape[1])
-                    self.index.add(self.embeddings)
+            if embedding_id:
+                self.add_embeddings([embedding_id], [embedding], [employee_id])
                 log_message(f"[FACE ADD] Successfully added face for employee: {employee_id}")
                 return True
             else:
@@ -730,61 +858,179 @@ class FaceTrackingSystem:
                 'total_employees': self.db_manager.get_employee_count(),
                 'total_embeddings': self.db_manager.get_embedding_count(),
                 'total_attendance_records': self.db_manager.get_attendance_count(),
-                'active_employees': len(set(self.labels)) if self.labels else 0,
-                'loaded_embeddings': len(self.embeddings) if len(self.embeddings) > 0 else 0}
+                'active_employees': self.gallery_snapshot.employee_count,
+                'loaded_embeddings': len(self.gallery_snapshot),
+                'match_cache': self.match_cache.stats()}
             return stats
         except Exception as e:
             log_message(f"[ERROR] Failed to get database stats: {e}")
             return {}
 
-    def _initialize_faiss(self):
-        if len(self.embeddings) > 0:
-            self.index = faiss.IndexFlatIP(self.embeddings.shape[1])
-            self.index.add(self.embeddings)
-        else:
-            self.index = None
+    def _build_gallery(self, embedding_ids, embeddings, labels) -> GalleryIndex:
+        gallery = GalleryIndex.build(
+            embedding_ids,
+            embeddings,
+            labels,
+            spec=ENHANCED_CONFIG.get('faiss_index_type', 'auto'),
+            hnsw_ef_search=ENHANCED_CONFIG.get('hnsw_ef_search', 64),
+            ivf_nprobe=ENHANCED_CONFIG.get('ivf_nprobe', 16))
+        if gallery.index is not None:
+            log_message(f"[INDEX] Built {type(gallery.index).__name__} over {gallery.ntotal} embeddings")
+        return gallery
+
+    def _publish_gallery_snapshot(self, snapshot: GallerySnapshot):
+        """Swap in a new snapshot; must be called with gallery_write_lock held."""
+        self.gallery_snapshot = snapshot
+        if snapshot.pending_changes >= SNAPSHOT_COMPACTION_THRESHOLD:
+            if self.gallery_compaction_thread is None or not self.gallery_compaction_thread.is_alive():
+                self.gallery_compaction_thread = threading.Thread(target=self._compact_gallery, daemon=True)
+                self.gallery_compaction_thread.start()
+
+    def _publish_gallery(self, gallery: GalleryIndex):
+        with self.gallery_write_lock:
+            version = self.gallery_snapshot.version + 1
+            self._publish_gallery_snapshot(GallerySnapshot.from_gallery(gallery, version))
+
+    def _compact_gallery(self):
+        try:
+            # The O(gallery) rebuild runs outside the lock; writers keep publishing meanwhile.
+            snapshot = self.gallery_snapshot
+            gallery = snapshot.compact()
+            with self.gallery_write_lock:
+                current = self.gallery_snapshot
+                if current.base is not snapshot.base:
+                    return  # a full rebuild replaced the base meanwhile
+                # Same contents, same version: cached matches stay valid across compaction.
+                self._publish_gallery_snapshot(current.rebased(gallery, snapshot))
+            log_message(f"[INDEX] Compacted {snapshot.pending_changes} pending changes into a new base index ({gallery.ntotal} embeddings)")
+        except Exception as e:
+            log_message(f"[ERROR] Gallery compaction failed: {e}")
+
+    def add_embeddings(self, embedding_ids, embeddings, labels) -> int:
+        """Add newly stored face_embeddings rows to the live gallery without a rebuild."""
+        if len(embedding_ids) == 0:
+            return 0
+        with self.gallery_write_lock:
+            snapshot = self.gallery_snapshot.with_added(embedding_ids, embeddings, labels)
+            self._publish_gallery_snapshot(snapshot)
+        log_message(f"[INDEX] Added {len(embedding_ids)} embeddings ({snapshot.ntotal} total)")
+        return len(embedding_ids)
+
+    def remove_embeddings(self, embedding_ids) -> int:
+        """Drop face_embeddings rows from the live gallery by id."""
+        with self.gallery_write_lock:
+            previous = self.gallery_snapshot
+            snapshot = previous.with_removed(embedding_ids)
+            removed = len(previous) - len(snapshot)
+            if removed:
+                self._publish_gallery_snapshot(snapshot)
+        if removed:
+            log_message(f"[INDEX] Removed {removed} embeddings ({snapshot.ntotal} total)")
+        return removed
+
+    def remove_employee_embeddings(self, employee_id: str) -> int:
+        """Drop every gallery embedding that belongs to an employee."""
+        with self.gallery_write_lock:
+            return self.remove_embeddings(self.gallery_snapshot.label_ids(employee_id))
+
+    def replace_employee_embeddings(self, employee_id: str, embedding_ids, embeddings) -> int:
+        """Swap an employee's gallery embeddings for a new set in one published snapshot."""
+        with self.gallery_write_lock:
+            previous = self.gallery_snapshot
+            snapshot = previous.with_removed(previous.label_ids(employee_id), bump_version=False).with_added(
+                embedding_ids, embeddings, [employee_id] * len(embedding_ids))
+            self._publish_gallery_snapshot(snapshot)
+        log_message(f"[INDEX] Replaced embeddings of {employee_id} with {len(embedding_ids)} new ones ({snapshot.ntotal} total)")
+        return len(embedding_ids)
+
     def reload_embeddings_and_rebuild_index(self):
         """Reload embeddings from DB and rebuild FAISS index."""
-        with self.faiss_index_lock:
-            self.embeddings, self.labels = self.db_manager.get_all_active_embeddings()
-            if self.embeddings:
-                self.embeddings = np.array(self.embeddings).astype('float32')
-                faiss.normalize_L2(self.embeddings)
-                self.index = faiss.IndexFlatIP(self.embeddings.shape[1])
-                self.index.add(self.embeddings)
-            else:
-                self.embeddings = []
-                self.labels = []
-                self.index = None
-            print("[INDEX REBUILD] FAISS index rebuilt with current active embeddings.")
+        with self.gallery_write_lock:
+            embedding_ids, embeddings_list, labels_list = self.db_manager.get_active_embedding_records()
+            self._publish_gallery(self._build_gallery(embedding_ids, embeddings_list, labels_list))
+        print("[INDEX REBUILD] FAISS index rebuilt with current active embeddings.")
+
+    def _gallery_reload_worker(self):
+        self._save_gallery_snapshot()
+        while not self.shutdown_flag.wait(self.faces_reload_interval):
+            self._reload_known_faces_and_metadata()
+            self._save_gallery_snapshot()
+
+    def _init_detection_state(self, log=log_message):
+        """Per-camera capture, detection and tracking state; shared with the camera worker processes."""
+        self.log = log  # detection-side code logs through this, so worker processes can forward it
+        self.apps = {}
+        self.inference_schedulers = {}
+        self.trackers = {}
+        self.confirmed_tracks = {}
+        self.track_identities = {}
+        self.track_lifetimes = {}
+        self.track_positions = {}
+        self.frame_locks = {}
+        self.frame_rings = {}
+        self.frame_slots = {}
+        self.frame_streams = {}
+        self.latest_faces = {}
+        self.face_detection_threads = {}
+        self.frame_skip_counter = {}
+        self.motion_gates = {}
+        self.detection_rois = {}
+        self.frame_enhancers = {}
+        self.stage_timings = {}
+        self.detection_interval = {}
+        self.captures = {}
+        self.replay_clock = threading.local()  # .now = video time of the frame a replay thread is on
 
-    def _initialize_multi_gpu_insightface(self):
-        gpu_ids = list(set([cam.gpu_id for cam in CAMERAS]))
+    def _initialize_multi_gpu_insightface(self, cameras: Optional[List[CameraConfig]] = None):
+        cameras = CAMERAS if cameras is None else cameras
+        gpu_ids = list(set([cam.gpu_id for cam in cameras]))
         for gpu_id in gpu_ids:
             providers = ['CPUExecutionProvider']
             if torch.cuda.is_available() and gpu_id < torch.cuda.device_count():
                 providers = [('CUDAExecutionProvider', {'device_id': gpu_id}), 'CPUExecutionProvider']
             else:
-                log_message(f"[GPU WARNING] GPU ID {gpu_id} unavailable, using CPU")
+                self.log(f"[GPU WARNING] GPU ID {gpu_id} unavailable, using CPU")
             self.apps[gpu_id] = FaceAnalysis(name='antelopev2',
                 providers=providers,
                 allowed_modules=['detection', 'recognition'])
-            self.apps[gpu_id].prepare(ctx_id=gpu_id, det_size=(416, 416), det_thresh=DET_THRESH)
-
-    def _initialize_cameras(self):
-        for cam_config in CAMERAS:
+            self.apps[gpu_id].prepare(ctx_id=gpu_id, det_size=ENHANCED_CONFIG.get('det_size', (416, 416)), det_thresh=DET_THRESH)
+            self.inference_schedulers[gpu_id] = InferenceScheduler(
+                self.apps[gpu_id],
+                device_name=f"gpu{gpu_id}" if providers[0] != 'CPUExecutionProvider' else f"cpu{gpu_id}",
+                num_cameras=sum(1 for cam in cameras if cam.gpu_id == gpu_id),
+                max_batch=ENHANCED_CONFIG.get('inference_max_batch', 8),
+                max_wait=ENHANCED_CONFIG.get('inference_max_wait_ms', 10) / 1000.0)
+
+    def _initialize_cameras(self, cameras: Optional[List[CameraConfig]] = None):
+        for cam_config in (CAMERAS if cameras is None else cameras):
             cam_id = cam_config.camera_id
             self.trackers[cam_id] = BYTETracker(
                 frame_rate=cam_config.fps,
                 track_buffer=TRACK_BUFFER_SIZE,
                 match_thresh=MATCH_THRESH)
+            self.confirmed_tracks[cam_id] = {}
             self.frame_locks[cam_id] = threading.Lock()
-            self.latest_frames[cam_id] = None
+            self.frame_rings[cam_id] = FrameRing()
+            self.frame_slots[cam_id] = FrameSlot()
             self.latest_faces[cam_id] = []
             self.track_identities[cam_id] = {}
             self.track_lifetimes[cam_id] = {}
             self.track_positions[cam_id] = {}
             self.frame_skip_counter[cam_id] = 0
+            self.motion_gates[cam_id] = MotionGate(
+                pixel_threshold=ENHANCED_CONFIG.get('motion_pixel_threshold', 15),
+                activity_threshold=ENHANCED_CONFIG.get('motion_activity_threshold', 0.002),
+                max_skip_seconds=ENHANCED_CONFIG.get('motion_max_skip_seconds', 2.0))
+            self.detection_rois[cam_id] = cam_config.detection_roi(ENHANCED_CONFIG.get('tripwire_roi_margin', 0.2))
+            self.frame_enhancers[cam_id] = FrameEnhancer(
+                mode=ENHANCED_CONFIG.get('enhancement_mode', 'clahe_y'),
+                luminance_threshold=ENHANCED_CONFIG.get('enhancement_luminance_threshold', 90),
+                contrast_threshold=ENHANCED_CONFIG.get('enhancement_contrast_threshold', 30))
+            self.stage_timings[cam_id] = StageTimings()
+            register_camera(cam_id, self.stage_timings[cam_id])
+            self.frame_streams[cam_id] = FrameStream(
+                lambda canvas, boxes, cam_config=cam_config: self.render_overlay(canvas, boxes, cam_config),
+                self.stage_timings[cam_id])
             self.detection_interval[cam_id] = 3
             self.track_identities[cam_id] = {}
 
@@ -794,16 +1040,6 @@ class FaceTrackingSystem:
                 writer = csv.writer(csvfile)
                 writer.writerow(["Timestamp", "EmployeeID", "EmployeeName", "CameraID", "Event", "Status"])
 
-    def _enhance_frame_for_cctv(self, frame):
-        lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        l = clahe.apply(l)
-        enhanced_lab = cv2.merge([l, a, b])
-        enhanced_frame = cv2.cvtColor(enhanced_lab, cv2.COLOR_LAB2BGR)
-        enhanced_frame = cv2.GaussianBlur(enhanced_frame, (3, 3), 0.5)
-        return enhanced_frame
-
     def _adaptive_detection_interval(self, camera_id: int, num_faces: int):
         if num_faces == 0:
             self.detection_interval[camera_id] = min(5, self.detection_interval[camera_id] + 1)
@@ -813,97 +1049,242 @@ class FaceTrackingSystem:
             self.detection_interval[camera_id] = 3
 
     def _face_detection_thread(self, camera_id: int, gpu_id: int):
+        frame_slot = self.frame_slots[camera_id]
+        last_seq = 0
         while not self.shutdown_flag.is_set():
             try:
-                current_time = time.time()
-                if current_time - self.last_faces_reload > 300:
-                    if self._reload_known_faces_and_metadata():
-                        self.last_faces_reload = current_time
-                with self.frame_locks[camera_id]:
-                    if self.latest_frames[camera_id] is None:
-                        time.sleep(0.02)
-                        continue
-                    frame_copy = self.latest_frames[camera_id].copy()
-                self.frame_skip_counter[camera_id] += 1
-                if self.frame_skip_counter[camera_id] < self.detection_interval[camera_id]:
-                    time.sleep(0.01)
+                # Blocks until the capture thread publishes a frame this thread has not seen.
+                seq, frame_ref = frame_slot.wait_for_newer(last_seq, timeout=1.0)
+                if frame_ref is None:
                     continue
-                self.frame_skip_counter[camera_id] = 0
-                enhanced_frame = self._enhance_frame_for_cctv(frame_copy)
-                height, width = enhanced_frame.shape[:2]
-                scale_factor = 1.0
-                if width > 960:
-                    scale_factor = 960 / width
-                    new_width = int(width * scale_factor)
-                    new_height = int(height * scale_factor)
-                    enhanced_frame = cv2.resize(enhanced_frame, (new_width, new_height))
-                faces = self.apps[gpu_id].get(enhanced_frame)
-                if scale_factor != 1.0:
-                    for face in faces:
-                        face.bbox = face.bbox / scale_factor
-                with self.frame_locks[camera_id]:
-                    self.latest_faces[camera_id] = faces
-                    
-                    # Update latest_faces for Django
-                    latest_faces[camera_id] = [
-                        {
-                            "identity": face.get('identity', 'unknown'),
-                            "bbox": face.bbox.tolist(),
-                            "confidence": face.det_score
-                        }
-                        for face in faces
-                    ]
-                    
-                self._adaptive_detection_interval(camera_id, len(faces))
+                frames_advanced, last_seq = seq - last_seq, seq
+                with frame_ref:
+                    self._maybe_detect(camera_id, gpu_id, frame_ref.array, frames_advanced)
             except Exception as e:
                 if not self.shutdown_flag.is_set():
-                    log_message(f"[ERROR] Face detection thread {camera_id}: {e}")
+                    self.log(f"[ERROR] Face detection thread {camera_id}: {e}")
                 time.sleep(0.1)
 
+    def _maybe_detect(self, camera_id: int, gpu_id: int, frame: np.ndarray, frames_advanced: int = 1):
+        """Run detection on frame once detection_interval frames have passed; returns the faces or None."""
+        self.frame_skip_counter[camera_id] += frames_advanced
+        if self.frame_skip_counter[camera_id] < self.detection_interval[camera_id]:
+            return None
+        self.frame_skip_counter[camera_id] = 0
+        return self._detect_frame(camera_id, gpu_id, frame)
+
+    def _detect_frame(self, camera_id: int, gpu_id: int, frame: np.ndarray):
+        """Detect, track, quality-filter and recognize the faces of one frame and publish them.
+
+        Returns the faces, or None when the motion gate skipped the frame or
+        the inference request was superseded.
+        """
+        frame_height, frame_width = frame.shape[:2]
+        roi_x1, roi_y1, roi_x2, roi_y2 = self.detection_rois[camera_id]
+        x0, y0 = int(roi_x1 * frame_width), int(roi_y1 * frame_height)
+        roi_frame = frame[y0:int(roi_y2 * frame_height), x0:int(roi_x2 * frame_width)]
+        timings = self.stage_timings[camera_id]
+        motion_gate = self.motion_gates[camera_id]
+        if ENHANCED_CONFIG.get('motion_gate_enabled', True):
+            with timings.time('motion_gate'):
+                active = motion_gate.should_detect(roi_frame, getattr(self.replay_clock, 'now', None))
+            if not active:
+                return None
+        detection_start = time.perf_counter()
+        with timings.time('resize'):
+            height, width = roi_frame.shape[:2]
+            max_width = ENHANCED_CONFIG.get('detection_max_width', 960)
+            scale_factor = 1.0
+            detect_frame = roi_frame
+            if width > max_width:
+                scale_factor = max_width / width
+                detect_frame = cv2.resize(roi_frame, (max_width, int(height * scale_factor)),
+                                          interpolation=cv2.INTER_AREA)
+        enhance_start = time.perf_counter()
+        detect_frame, enhanced = self.frame_enhancers[camera_id].enhance(detect_frame)
+        timings.record('enhance_on' if enhanced else 'enhance_off', time.perf_counter() - enhance_start)
+        scheduler = self.inference_schedulers[gpu_id]
+        with timings.time('inference'):
+            faces = scheduler.detect(camera_id, detect_frame)
+        # Map detections from the resized ROI back to full-frame coordinates.
+        offset = np.array([x0, y0], dtype=np.float32)
+        for face in faces:
+            face.bbox = face.bbox / scale_factor + np.tile(offset, 2)
+            if face.get('kps') is not None:
+                face.kps = face.kps / scale_factor + offset
+        with timings.time('tracking'):
+            self._assign_track_ids(camera_id, faces)
+        with timings.time('quality'):
+            quality = self._quality_filter_batch(faces, frame)
+        to_recognize = []
+        for face, (is_valid, metrics) in zip(faces, quality):
+            face.quality_valid, face.quality_metrics = is_valid, metrics
+            if is_valid and self._needs_recognition(camera_id, face):
+                to_recognize.append(face)
+        if to_recognize:
+            # Aligned crops come from the full-resolution frame, one recognition batch per frame.
+            with timings.time('recognition'):
+                if not ENHANCED_CONFIG.get('inference_batching', True):
+                    scheduler.recognize_now(frame, to_recognize)
+                elif scheduler.recognize(camera_id, frame, to_recognize) is None:
+                    return None
+        timings.count('faces_detected', len(faces))
+        timings.count('faces_recognized', len(to_recognize))
+        with timings.time('publish'):
+            self._publish_faces(camera_id, faces, frame)
+        motion_gate.record_detection(time.perf_counter() - detection_start)
+        self._adaptive_detection_interval(camera_id, len(faces))
+        return faces
+
+    def _publish_faces(self, camera_id: int, faces, frame):
+        """Hand a detection result to the camera's processing loop; camera worker processes override this."""
+        with self.frame_locks[camera_id]:
+            self.latest_faces[camera_id] = faces
+            self._update_live_faces(camera_id, faces)
+
+    def _update_live_faces(self, camera_id: int, faces):
+        # Update latest_faces for Django
+        latest_faces[camera_id] = [
+            {
+                "identity": face.get('identity', 'unknown'),
+                "bbox": face.bbox.tolist(),
+                "confidence": face.det_score
+            }
+            for face in faces
+        ]
+
+    def _assign_track_ids(self, camera_id: int, faces):
+        """Run the camera's BYTETracker on the detections and tag each face with its track id."""
+        dets = np.zeros((len(faces), 6), dtype=np.float32)
+        for i, face in enumerate(faces):
+            dets[i, :4] = face.bbox
+            dets[i, 4] = face.det_score
+        try:
+            tracks = np.asarray(self.trackers[camera_id].update(torch.from_numpy(dets), None), dtype=np.float32)
+        except Exception as e:
+            self.log(f"[ERROR] Tracker update failed for camera {camera_id}: {e}")
+            return
+        if not len(faces) or not len(tracks):
+            return
+        # Tracker boxes are Kalman-smoothed, so associate them back to detections by IoU.
+        face_boxes = dets[:, None, :4]
+        track_boxes = tracks[None, :, :4]
+        inter_w = np.clip(np.minimum(face_boxes[..., 2], track_boxes[..., 2]) - np.maximum(face_boxes[..., 0], track_boxes[..., 0]), 0, None)
+        inter_h = np.clip(np.minimum(face_boxes[..., 3], track_boxes[..., 3]) - np.maximum(face_boxes[..., 1], track_boxes[..., 1]), 0, None)
+        inter = inter_w * inter_h
+        area_f = (face_boxes[..., 2] - face_boxes[..., 0]) * (face_boxes[..., 3] - face_boxes[..., 1])
+        area_t = (track_boxes[..., 2] - track_boxes[..., 0]) * (track_boxes[..., 3] - track_boxes[..., 1])
+        iou = inter / np.maximum(area_f + area_t - inter, 1e-6)
+        while True:
+            face_idx, track_idx = np.unravel_index(np.argmax(iou), iou.shape)
+            if iou[face_idx, track_idx] < TRACK_IOU_THRESH:
+                break
+            faces[face_idx].track_id = int(tracks[track_idx, 4])
+            iou[face_idx, :] = -1
+            iou[:, track_idx] = -1
+
+    def _reusable_track_identities(self, camera_id: int, track_ids: List[Optional[int]],
+                                   embeddings: List[Optional[np.ndarray]]) -> List[Optional[TrackIdentity]]:
+        """Return the confirmed identity for each track that is neither due for re-verification nor drifting."""
+        current_time = self._now()
+        confirmed = self.confirmed_tracks[camera_id]
+        expiry = TRACK_BUFFER_SIZE * FRAME_INTERVAL
+        for track_id in [t for t, state in confirmed.items() if current_time - state.last_seen_time > expiry]:
+            del confirmed[track_id]
+        reverify_interval = ENHANCED_CONFIG.get('track_reverify_interval', 30)
+        drift_threshold = ENHANCED_CONFIG.get('track_drift_threshold', 0.75)
+        reusable = []
+        for track_id, embedding in zip(track_ids, embeddings):
+            state = confirmed.get(track_id) if track_id is not None else None
+            if state is not None:
+                state.last_seen_time = current_time
+                state.frames_since_verify += 1
+                if embedding is None:
+                    # Recognition was skipped for this face because its track is confirmed.
+                    reusable.append(state)
+                    continue
+                norm = np.linalg.norm(embedding)
+                drift = float(np.dot(embedding, state.anchor_embedding) / norm) if norm > 0 else 0.0
+                if state.frames_since_verify >= reverify_interval or drift < drift_threshold:
+                    state = None
+            reusable.append(state)
+        return reusable
+
+    def _confirm_track_identity(self, camera_id: int, track_id: Optional[int], identity: str,
+                                score: float, embedding: np.ndarray, bbox: np.ndarray):
+        if track_id is None:
+            return
+        norm = np.linalg.norm(embedding)
+        anchor = embedding / norm if norm > 0 else embedding
+        state = TrackIdentity(identity=identity, score=score, anchor_embedding=anchor, last_seen_time=self._now(),
+                              anchor_area=_bbox_area(bbox))
+        self.confirmed_tracks[camera_id][track_id] = state
+        if self.camera_pool is not None:
+            self.camera_pool.confirm_track(camera_id, track_id, state)
+
+    def _drop_track_identity(self, camera_id: int, track_id: Optional[int]):
+        if self.confirmed_tracks[camera_id].pop(track_id, None) is not None and self.camera_pool is not None:
+            self.camera_pool.drop_track(camera_id, track_id)
+
+    def _needs_recognition(self, camera_id: int, face) -> bool:
+        """Whether a detected face must be embedded: new, unconfirmed, due for re-verification or drifting."""
+        track_id = face.get('track_id')
+        state = self.confirmed_tracks[camera_id].get(track_id) if track_id is not None else None
+        if state is None:
+            return True
+        # frames_since_verify is advanced by the processing loop, so this is one frame behind at most.
+        if state.frames_since_verify + 1 >= ENHANCED_CONFIG.get('track_reverify_interval', 30):
+            return True
+        # Without an embedding, drift is judged from the change in face size since confirmation.
+        scale_drift = ENHANCED_CONFIG.get('track_scale_drift', 1.5)
+        area = _bbox_area(face.bbox)
+        return not (state.anchor_area / scale_drift <= area <= state.anchor_area * scale_drift)
+
     def _compute_embedding_similarity(self, embedding: np.ndarray) -> Tuple[str, float]:
-        emb_hash = hash(embedding.tobytes()[:100])
-        with self.embedding_cache_lock:
-            if emb_hash in self.embedding_cache:
-                return self.embedding_cache[emb_hash]
-        with self.faiss_index_lock:
-            if self.index is None or not hasattr(self.index, 'ntotal') or self.index.ntotal == 0 or len(self.labels) == 0:
-                return "unknown", 0.0
-            emb_norm = np.linalg.norm(embedding)
-            if emb_norm > 0:
-                embedding = embedding / emb_norm
-            else:
-                return "unknown", 0.0
-            try:
-                k = min(3, len(self.labels))
-                D, I = self.index.search(embedding.reshape(1, -1), k)
-                if len(D[0]) > 0 and len(I[0]) > 0:
-                    best_scores = D[0]
-                    best_indices = I[0]
-                    weighted_scores = {}
-                    for score, idx in zip(best_scores, best_indices):
-                        if score > THRESHOLD and idx < len(self.labels):
-                            identity = self.labels[idx]
-                            if identity in weighted_scores:
-                                weighted_scores[identity] = max(weighted_scores[identity], score)
-                            else:
-                                weighted_scores[identity] = score
-                    if weighted_scores:
-                        best_identity = max(weighted_scores.items(), key=lambda x: x[1])
-                        result = (best_identity[0], float(best_identity[1]))
-                    else:
-                        result = ("unknown", 0.0)
-                else:
-                    result = ("unknown", 0.0)
-            except Exception as e:
-                log_message(f"[ERROR] FAISS search failed: {e}")
-                result = ("unknown", 0.0)
-        with self.embedding_cache_lock:
-            if len(self.embedding_cache) < 1000:
-                self.embedding_cache[emb_hash] = result
-        return result
+        identities, scores = self._match_embeddings_batch(embedding.reshape(1, -1))
+        return str(identities[0]), float(scores[0])
+
+    def _match_embeddings_batch(self, embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Match an (N, D) matrix of embeddings against the gallery with a single FAISS search."""
+        num_queries = len(embeddings)
+        identities = np.full(num_queries, "unknown", dtype=object)
+        scores = np.zeros(num_queries, dtype=np.float32)
+        if num_queries == 0:
+            return identities, scores
+        queries = np.array(embeddings, dtype=np.float32).reshape(num_queries, -1)
+        norms = np.linalg.norm(queries, axis=1)
+        nonzero = norms > 0
+        queries[nonzero] /= norms[nonzero, None]
+        snapshot = self.gallery_snapshot
+        if snapshot.ntotal == 0:
+            return identities, scores
+        rows = np.flatnonzero(nonzero)
+        keys, cached = self.match_cache.lookup(queries[rows], snapshot.version)
+        misses = [j for j, result in enumerate(cached) if result is None]
+        for j, result in enumerate(cached):
+            if result is not None:
+                identities[rows[j]], scores[rows[j]] = result
+        if not misses:
+            return identities, scores
+        miss_rows = rows[misses]
+        try:
+            D, labels = snapshot.search(queries[miss_rows], min(3, snapshot.ntotal))
+        except Exception as e:
+            log_message(f"[ERROR] FAISS search failed: {e}")
+            return identities, scores
+        valid = (D > THRESHOLD) & np.not_equal(labels, None)
+        masked = np.where(valid, D, -np.inf)
+        best_col = np.argmax(masked, axis=1)
+        search_rows = np.arange(len(miss_rows))
+        matched = valid[search_rows, best_col]
+        identities[miss_rows[matched]] = labels[search_rows, best_col][matched]
+        scores[miss_rows[matched]] = D[search_rows, best_col][matched]
+        self.match_cache.store([keys[j] for j in misses], queries[miss_rows],
+                               identities[miss_rows], scores[miss_rows], snapshot.version)
+        return identities, scores
 
     def _temporal_smoothing(self, identity: str, score: float, camera_id: int) -> Tuple[str, float]:
-        current_time = time.time()
+        current_time = self._now()
         track_key = f"{camera_id}_{identity}"
         if track_key not in self.track_identities:
             self.track_identities[camera_id][track_key] = {
@@ -929,83 +1310,43 @@ class FaceTrackingSystem:
                 return best_identity[0], min(best_identity[1], avg_score)
         return identity, score
 
-    def _quality_filter(self, face, frame_width: int, frame_height: int) -> Tuple[bool, FaceQualityMetrics]:
-        bbox = face.bbox.astype(int)
-        face_width = bbox[2] - bbox[0]
-        face_height = bbox[3] - bbox[1]
-        size_score = min(1.0, (face_width * face_height) / (100 * 100))
-        if face_width < 50 or face_height < 50:
-            size_score = 0.0
-        if face_width > frame_width * 0.8 or face_height > frame_height * 0.8:
-            size_score = 0.0
-        center_x = (bbox[0] + bbox[2]) / 2
-        center_y = (bbox[1] + bbox[3]) / 2
-        distance_from_center = np.sqrt((center_x - frame_width/2)**2 + (center_y - frame_height/2)**2)
-        max_distance = np.sqrt((frame_width/2)**2 + (frame_height/2)**2)
-        position_score = 1.0 - (distance_from_center / max_distance)
-        det_score = face.det_score if hasattr(face, 'det_score') else 0.5
-        brightness_score = self._compute_brightness_score(face, bbox)
-        sharpness_score = self._compute_sharpness_score(face, bbox)
-        angle_score = self._compute_face_angle_score(face)
-        overall_quality = (
-            0.3 * size_score +
-            0.2 * position_score +
-            0.2 * det_score +
-            0.1 * brightness_score +
-            0.1 * sharpness_score +
-            0.1 * angle_score)
-        quality_metrics = FaceQualityMetrics(
-            sharpness_score=sharpness_score,
-            brightness_score=brightness_score,
-            angle_score=angle_score,
-            size_score=size_score,
-            overall_quality=overall_quality)
-        is_valid = overall_quality >= ENHANCED_CONFIG['face_quality_threshold']
-        return is_valid, quality_metrics
+    def _quality_filter_batch(self, faces, frame) -> List[Tuple[bool, FaceQualityMetrics]]:
+        """Score all faces of a frame in one vectorized pass; returns (is_valid, metrics) per face."""
+        if not faces:
+            return []
+        bboxes = np.stack([face.bbox for face in faces])
+        det_scores = np.array([face.get('det_score', 0.5) for face in faces], dtype=np.float32)
+        poses = None
+        if any(face.get('pose') is not None for face in faces):
+            poses = np.array([face.pose if face.get('pose') is not None else (np.nan,) * 3 for face in faces],
+                             dtype=np.float32)
+        scores = score_faces(frame, bboxes, det_scores, poses)
+        is_valid = scores['overall'] >= ENHANCED_CONFIG['face_quality_threshold']
+        return [
+            (bool(is_valid[i]), FaceQualityMetrics(
+                sharpness_score=float(scores['sharpness'][i]),
+                brightness_score=float(scores['brightness'][i]),
+                angle_score=float(scores['angle'][i]),
+                size_score=float(scores['size'][i]),
+                overall_quality=float(scores['overall'][i])))
+            for i in range(len(faces))]
 
     def _adaptive_threshold(self, identity: str, base_score: float) -> float:
-        if identity in self.global_tracks:
-            track = self.global_tracks[identity]
-            recent_scores = list(track.embedding_history)[-10:] if hasattr(track, 'embedding_history') else []
-            if len(recent_scores) >= 5:
-                avg_recent_score = np.mean([self._compute_embedding_similarity(emb)[1] for emb in recent_scores])
-                if avg_recent_score > 0.8:
-                    return THRESHOLD * 0.9
-                elif avg_recent_score < 0.6:
-                    return THRESHOLD * 1.1
+        """Relax or tighten THRESHOLD by the average gallery similarity of the identity's recent embeddings.
+
+        The similarities are recorded when each embedding is matched rather than
+        re-searched here, so gallery updates made since then are not reflected.
+        """
+        track = self.global_tracks.get(identity)
+        recent_scores = list(track.score_history) if track is not None else []
+        if len(recent_scores) >= EMBEDDING_HISTORY_SIZE:
+            avg_recent_score = np.mean(recent_scores)
+            if avg_recent_score > 0.8:
+                return THRESHOLD * 0.9
+            elif avg_recent_score < 0.6:
+                return THRESHOLD * 1.1
         return THRESHOLD
 
-    def _compute_brightness_score(self, face, bbox) -> float:
-        try:
-            if hasattr(face, 'landmark_2d_106'):
-                landmarks = face.landmark_2d_106
-                if landmarks is not None and len(landmarks) > 0:
-                    avg_intensity = np.mean(landmarks) / 255.0
-                    return min(1.0, max(0.0, 1.0 - abs(avg_intensity - 0.5) * 2))
-            return 0.5
-        except:
-            return 0.5
-
-    def _compute_sharpness_score(self, face, bbox) -> float:
-        try:
-            if hasattr(face, 'embedding'):
-                embedding_var = np.var(face.embedding)
-                normalized_var = min(1.0, embedding_var / 0.1)
-                return normalized_var
-            return 0.5
-        except:
-            return 0.5
-
-    def _compute_face_angle_score(self, face) -> float:
-        try:
-            if hasattr(face, 'pose'):
-                yaw, pitch, roll = face.pose
-                angle_penalty = (abs(yaw) + abs(pitch) + abs(roll)) / 90.0
-                return max(0.0, 1.0 - angle_penalty)
-            return 0.8
-        except:
-            return 0.8
-
     def _embedding_update_worker(self):
         pending_updates = []
         while not self.shutdown_flag.is_set():
@@ -1031,93 +1372,42 @@ class FaceTrackingSystem:
 
     def _process_pending_updates(self, pending_updates):
         with self.embedding_update_lock:
+            new_ids = []
             new_embeddings = []
             new_labels = []
             for identity, embedding, timestamp in pending_updates:
-                success = self.db_manager.store_face_embedding(
+                embedding_id = self.db_manager.store_face_embedding(
                     employee_id=identity,
                     embedding=embedding,
                     embedding_type='update',
                     quality_score=0.0,
                     source_image_path=None
                 )
-                if success:
+                if embedding_id:
+                    new_ids.append(embedding_id)
                     new_embeddings.append(embedding)
                     new_labels.append(identity)
                     self.db_manager.cleanup_old_embeddings(identity, max_embeddings=15)
             if new_embeddings:
-                self.updates_since_last_rebuild += len(new_embeddings)
-                if self.updates_since_last_rebuild >= self.max_updates_before_rebuild:
-                    with self.faiss_index_lock:
-                        self.embeddings = np.vstack([self.embeddings] + new_embeddings)
-                        self.labels.extend(new_labels)
-                        faiss.normalize_L2(self.embeddings)
-                        self.index = faiss.IndexFlatIP(self.embeddings.shape[1])
-                        self.index.add(self.embeddings)
-                    self.updates_since_last_rebuild = 0
-                    with self.embedding_cache_lock:
-                        self.embedding_cache.clear()
-                else:
-                    with self.faiss_index_lock:
-                        self.embeddings = np.vstack([self.embeddings] + new_embeddings)
-                        self.labels.extend(new_labels)
-                        faiss.normalize_L2(self.embeddings)
-                        for i, emb in enumerate(new_embeddings):
-                            self.index.add(emb.reshape(1, -1))
+                self.add_embeddings(new_ids, new_embeddings, new_labels)
 
     def _reload_known_faces_and_metadata(self):
         try:
-            with self.faiss_index_lock:
-                old_employee_count = len(set(self.labels)) if self.labels else 0
-            embeddings_list, labels_list = self.db_manager.get_all_active_embeddings()
-            employees = self.db_manager.get_all_employees()
-            employee_metadata = {}
-            for employee in employees:
-                employee_metadata[employee.id] = {
-                    'employee_name': employee.employee_name,
-                    'department': employee.department,
-                    'designation': employee.designation,
-                    'email': employee.email,
-                    'phone': employee.phone}
-            with self.faiss_index_lock:
-                if embeddings_list:
-                    self.embeddings = np.array(embeddings_list).astype('float32')
-                    self.labels = labels_list
-                    faiss.normalize_L2(self.embeddings)
-                    self.index = faiss.IndexFlatIP(self.embeddings.shape[1])
-                    self.index.add(self.embeddings)
-                else:
-                    self.embeddings = []
-                    self.labels = []
-                    self.index = None
-                new_employee_count = len(set(labels_list)) if labels_list else 0
-            with self.metadata_lock:
-                self.employee_metadata = employee_metadata         
-            with self.embedding_cache_lock:
-                self.embedding_cache.clear()
+            employee_metadata = self._fetch_employee_metadata()
+            old_employee_count = self.gallery_snapshot.employee_count
+            self._sync_gallery_with_database()
+            new_employee_count = self.gallery_snapshot.employee_count
+            self.employee_cache.replace_all(employee_metadata)
             log_message(f"[RELOAD] Reloaded faces and metadata: {old_employee_count} -> {new_employee_count} employees")
             self.last_faces_reload = time.time()
         except Exception as e:
             log_message(f"[ERROR] Failed to reload known faces and metadata: {e}")
 
     def _get_consistent_track_id(self, identity: str, camera_id: int) -> str:
-        current_time = time.time()
+        current_time = self._now()
         if identity == "unknown":
             return f"unknown_{camera_id}_{int(current_time)}"
-        with self.identity_tracks_lock:
-            if identity in self.identity_tracks:
-                self.identity_last_seen[identity] = current_time
-                self.identity_cameras[identity] = camera_id
-                return self.identity_tracks[identity]
-            track_id = identity
-            self.identity_tracks[identity] = track_id
-            self.identity_last_seen[identity] = current_time
-            self.identity_cameras[identity] = camera_id
-            self.identity_positions[identity] = {}
-            self.identity_trip_logged[identity] = set()
-            self.identity_crossing_state[identity] = {}
-            self.identity_zone_state[identity] = {}
-            return track_id
+        return self.identity_states.touch(identity, camera_id, current_time).track_id
 
     def _update_work_status(self, identity: str, camera_id: int, direction: str):
         if identity not in self.global_tracks:
@@ -1149,23 +1439,30 @@ class FaceTrackingSystem:
             self._log_event(identity, camera_id, "WorkAreaExit", track.work_status)
 
     def _log_event(self, identity: str, camera_id: int, event: str):
-        event_type = "check_in" if event in ["entry", "WorkAreaEntry"] else "check_out"
-        if event_type == "check_out":
-            if not self._check_employee_work_status(identity):
-                log_message(f"[EVENT BLOCKED] {identity} not currently working - exit not logged")
-                return
-        employee_name = self.get_employee_name(identity)
-        self.api_logger.log_attendance_async(identity, event_type)
-        if self.enable_csv_backup:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self._write_csv_backup(
-                timestamp,
-                identity,
-                employee_name,
-                camera_id,
-                event_type,
-                "logged")
-        log_message(f"[EVENT] Camera {camera_id}: {identity} - {event_type}")
+        start = time.perf_counter()
+        try:
+            event_type = "check_in" if event in ["entry", "WorkAreaEntry"] else "check_out"
+            if event_type == "check_out":
+                if not self._check_employee_work_status(identity):
+                    log_message(f"[EVENT BLOCKED] {identity} not currently working - exit not logged")
+                    return
+            employee_name = self.get_employee_name(identity)
+            self.api_logger.log_attendance_async(identity, event_type)
+            if self.enable_csv_backup:
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                self._write_csv_backup(
+                    timestamp,
+                    identity,
+                    employee_name,
+                    camera_id,
+                    event_type,
+                    "logged")
+            self.event_counts[event_type] += 1
+            log_message(f"[EVENT] Camera {camera_id}: {identity} - {event_type}")
+        finally:
+            timings = self.stage_timings.get(camera_id)
+            if timings is not None:
+                timings.record('logging', time.perf_counter() - start)
 
     def _write_csv_backup(self, timestamp, identity, employee_name, camera_id, event, status):
         try:
@@ -1176,20 +1473,18 @@ class FaceTrackingSystem:
             log_message(f"[WARNING] CSV backup failed: {e}")
 
     def _check_tripwire_crossing(self, identity: str, center_x: int, center_y: int, camera_config: CameraConfig, frame_width: int, frame_height: int):
-        current_time = time.time()
+        current_time = self._now()
         camera_key = f"{camera_config.camera_id}"
-        if identity not in self.identity_crossing_state:
-            self.identity_crossing_state[identity] = {}
-        if camera_key not in self.identity_crossing_state[identity]:
-            self.identity_crossing_state[identity][camera_key] = {}
+        identity_state = self.identity_states.touch(identity, camera_config.camera_id, current_time)
+        crossing_states = identity_state.crossing.setdefault(camera_key, {})
         for tripwire in camera_config.tripwires:
             tripwire_key = f"{tripwire.name}"
-            if tripwire_key not in self.identity_crossing_state[identity][camera_key]:
-                self.identity_crossing_state[identity][camera_key][tripwire_key] = {
+            if tripwire_key not in crossing_states:
+                crossing_states[tripwire_key] = {
                     'state': 'none',
                     'last_position': center_x if tripwire.direction == 'vertical' else center_y,
                     'direction': None}
-            state_info = self.identity_crossing_state[identity][camera_key][tripwire_key]
+            state_info = crossing_states[tripwire_key]
             if tripwire.direction == 'vertical':
                 tripwire1_pos = int(frame_width * (tripwire.position - tripwire.spacing/2))
                 tripwire2_pos = int(frame_width * (tripwire.position + tripwire.spacing/2))
@@ -1234,6 +1529,16 @@ class FaceTrackingSystem:
                         state_info['direction'] = None
             state_info['last_position'] = current_pos
 
+    def render_overlay(self, frame, boxes: List[OverlayBox], camera_config: CameraConfig):
+        """Draw a frame's face boxes, quality and labels, and the camera's tripwires, onto frame."""
+        for box in boxes:
+            x1, y1, x2, y2 = box.bbox
+            cv2.rectangle(frame, (x1, y1), (x2, y2), box.color, 2)
+            cv2.putText(frame, f"Q:{box.quality:.2f}", (x1, y1 - 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+            cv2.putText(frame, box.label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, box.color, 2)
+        self.draw_tripwires(frame, camera_config)
+
     def draw_tripwires(self, frame, camera_config: CameraConfig):
         frame_height, frame_width = frame.shape[:2]
         for tripwire in camera_config.tripwires:
@@ -1250,118 +1555,334 @@ class FaceTrackingSystem:
                 cv2.line(frame, (0, tripwire2_y), (frame_width, tripwire2_y), (255, 0, 255), 2)
                 cv2.putText(frame, tripwire.name, (10, tripwire1_y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
 
+    def _start_capture(self, camera_config: CameraConfig) -> CameraCapture:
+        """Start the camera's reader thread, which publishes decoded frames to its frame slot."""
+        camera_id = camera_config.camera_id
+        source = camera_config.source if camera_config.source is not None else camera_id
+        capture = CameraCapture(camera_id, source, self.frame_rings[camera_id], self.frame_slots[camera_id],
+                                self.shutdown_flag, camera_config.resolution, camera_config.fps,
+                                timings=self.stage_timings[camera_id])
+        self.captures[camera_id] = capture
+        self.log(f"[INIT] Capturing camera {camera_id} from {capture.source}")
+        return capture.start()
+
+    def _next_frame(self, camera_id: int, last_seq: int) -> Tuple[int, Optional[FrameRef]]:
+        """Newest frame after last_seq, or (last_seq, None) after a second without one."""
+        seq, frame_ref = self.frame_slots[camera_id].wait_for_newer(last_seq, timeout=1.0)
+        if frame_ref is not None:
+            self.captures[camera_id].record_consumed(seq - last_seq)
+        return seq, frame_ref
+
+    def _frame_interval_elapsed(self, next_frame_time: float) -> bool:
+        """Wait for the next capture deadline; False once shutdown is requested."""
+        delay = next_frame_time - time.time()
+        return not (delay > 0 and self.shutdown_flag.wait(delay))
+
     def process_camera(self, camera_config: CameraConfig):
-        cap = cv2.VideoCapture(camera_config.camera_id)
-        if not cap.isOpened():
-            log_message(f"[ERROR] Cannot open camera {camera_config.camera_id}")
-            return
-        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        cap.set(cv2.CAP_PROP_FPS, camera_config.fps)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, camera_config.resolution[0])
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, camera_config.resolution[1])
+        self._start_capture(camera_config)
         detection_thread = threading.Thread(
             target=self._face_detection_thread,
             args=(camera_config.camera_id, camera_config.gpu_id),
             daemon=True)
         detection_thread.start()
         self.face_detection_threads[camera_config.camera_id] = detection_thread
-        prev_time = 0
-        frame_count = 0
+        frame_stream = self.frame_streams[camera_config.camera_id]
+        next_frame_time = time.time()
+        last_seq = 0
         while not self.shutdown_flag.is_set():
-            current_time = time.time()
-            if current_time - prev_time < FRAME_INTERVAL:
-                time.sleep(0.005)
+            if not self._frame_interval_elapsed(next_frame_time):
+                break
+            last_seq, frame_ref = self._next_frame(camera_config.camera_id, last_seq)
+            if frame_ref is None:
                 continue
-            prev_time = current_time
-            ret, frame = cap.read()
-            if not ret:
-                log_message(f"[WARNING] Failed to read frame from camera {camera_config.camera_id}")
-                time.sleep(0.1)
-                continue
-            frame_count += 1
-            frame_height, frame_width = frame.shape[:2]
-            with self.frame_locks[camera_config.camera_id]:
-                self.latest_frames[camera_config.camera_id] = frame.copy()
-                faces = self.latest_faces[camera_config.camera_id][:]
-            face_centers = {}
-            valid_faces = []
-            for face in faces:
-                is_valid, quality_metrics = self._quality_filter(face, frame_width, frame_height)
-                if not is_valid:
-                    continue  # Skip low-quality faces
-                valid_faces.append(face)
-            for i, face in enumerate(valid_faces):
-                bbox = face.bbox.astype(int)
-                embedding = face.embedding.astype('float32')
-                identity, score = self._compute_embedding_similarity(embedding)
-                if identity != "unknown":
-                    adaptive_thresh = self._adaptive_threshold(identity, score)
-                    if score >= adaptive_thresh:
-                        identity, score = self._temporal_smoothing(identity, score, camera_config.camera_id)
-                        center_x = int((bbox[0] + bbox[2]) / 2)
-                        center_y = int((bbox[1] + bbox[3]) / 2)
-                        if identity not in self.kalman_trackers:
-                            self.kalman_trackers[identity] = KalmanTracker()
-                        smoothed_position = self.kalman_trackers[identity].update(center_x, center_y)
-                        face_centers[identity] = smoothed_position
-                        with self.global_tracks_lock:
-                            if identity not in self.global_tracks:
-                                self.global_tracks[identity] = GlobalTrack(
-                                    employee_id=identity,
-                                    last_seen_time=current_time,
-                                    last_camera_id=camera_config.camera_id,
-                                    embedding_history=deque(maxlen=EMBEDDING_HISTORY_SIZE),
-                                    work_status="working")
-                            track = self.global_tracks[identity]
-                            track.last_seen_time = current_time
-                            track.last_camera_id = camera_config.camera_id
-                            track.confidence_score = score
-                            track.embedding_history.append(embedding)
-                            state = self.tracking_states.get(identity, TrackingState(
-                                position_history=[], velocity=(0, 0),
-                                predicted_position=(0, 0), confidence_history=[], quality_history=[]))
-                            state.position_history.append((center_x, center_y))
-                            state.confidence_history.append(score)
-                            state.quality_history.append(quality_metrics)
-                            if len(state.position_history) >= 2:
-                                dx = state.position_history[-1][0] - state.position_history[-2][0]
-                                dy = state.position_history[-1][1] - state.position_history[-2][1]
-                                state.velocity = (dx, dy)
-                            self.tracking_states[identity] = state
-                            self._check_tripwire_crossing(identity, center_x, center_y, camera_config, frame_width, frame_height)
-                        if score > 0.8:
-                            self._update_embeddings(identity, embedding)
-                    else:
-                        identity = "unknown"
-                consistent_track_id = self._get_consistent_track_id(identity, camera_config.camera_id)
-                color = (0, 255, 0) if identity != "unknown" else (0, 0, 255)
-                cv2.rectangle(frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), color, 2)
-                quality_text = f"Q:{quality_metrics.overall_quality:.2f}"
-                cv2.putText(frame, quality_text, (bbox[0], bbox[1] - 30), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
-                metadata = load_employee_metadata(identity) if identity != "unknown" else None
-                if metadata:
-                    if isinstance(metadata, dict):
-                        employee_name = metadata.get('employee_name', identity)
-                    else:
-                        employee_name = metadata.employee_name
-                    label = f"{employee_name} ({score:.2f})"
+            current_time = time.time()
+            next_frame_time = max(next_frame_time + FRAME_INTERVAL, current_time)
+            # The overlay is only described here; viewers of the stream render it onto a copy.
+            with frame_ref:
+                valid_faces, valid_metrics = self._valid_latest_faces(camera_config.camera_id)
+                boxes = self._handle_faces(camera_config, frame_ref.array.shape, valid_faces, valid_metrics,
+                                           current_time)
+                frame_stream.publish(boxes, frame_ref)
+
+    def _valid_latest_faces(self, camera_id: int) -> Tuple[list, List[FaceQualityMetrics]]:
+        """The camera's latest detected faces that passed the quality gate at detection time, with their metrics."""
+        with self.frame_locks[camera_id]:
+            faces = self.latest_faces[camera_id][:]
+        valid_faces = [face for face in faces if face.quality_valid]  # Skip low-quality faces
+        return valid_faces, [face.quality_metrics for face in valid_faces]
+
+    def _now(self) -> float:
+        """Wall-clock time, or the video time of the frame being replayed on this thread."""
+        now = getattr(self.replay_clock, 'now', None)
+        return time.time() if now is None else now
+
+    def _handle_faces(self, camera_config: CameraConfig, frame_shape, valid_faces, valid_metrics,
+                      current_time: float) -> List[OverlayBox]:
+        """Match quality-filtered faces of one frame, update identity and tripwire state, and describe its overlay."""
+        frame_height, frame_width = frame_shape[:2]
+        face_centers = {}
+        boxes = []
+        if not valid_faces:
+            return boxes
+        timings = self.stage_timings[camera_config.camera_id]
+        # Faces of confirmed tracks may arrive without an embedding when recognition was skipped.
+        frame_embeddings = [face.get('embedding') for face in valid_faces]
+        track_ids = [face.get('track_id') for face in valid_faces]
+        with timings.time('search'):
+            reused_tracks = self._reusable_track_identities(camera_config.camera_id, track_ids, frame_embeddings)
+            frame_identities = np.full(len(valid_faces), "unknown", dtype=object)
+            frame_scores = np.zeros(len(valid_faces), dtype=np.float32)
+            search_rows = [i for i, state in enumerate(reused_tracks) if state is None and frame_embeddings[i] is not None]
+            if search_rows:
+                frame_identities[search_rows], frame_scores[search_rows] = self._match_embeddings_batch(
+                    np.stack([frame_embeddings[i] for i in search_rows]).astype('float32'))
+        # Per-face stages are summed and recorded once per frame to keep the timing overhead flat.
+        smoothing_s = tripwire_s = annotation_s = 0.0
+        for i, face in enumerate(valid_faces):
+            bbox = face.bbox.astype(int)
+            embedding = frame_embeddings[i]
+            quality_metrics = valid_metrics[i]
+            identity, score = str(frame_identities[i]), float(frame_scores[i])
+            reused_track = reused_tracks[i]
+            if reused_track is not None:
+                identity, score = reused_track.identity, reused_track.score
+            elif identity != "unknown":
+                stage_start = time.perf_counter()
+                if score >= self._adaptive_threshold(identity, score):
+                    identity, score = self._temporal_smoothing(identity, score, camera_config.camera_id)
+                    self._confirm_track_identity(camera_config.camera_id, track_ids[i], identity, score,
+                                                 embedding, face.bbox)
                 else:
-                    label = f"{consistent_track_id} ({score:.2f})"
-                cv2.putText(frame, label, (bbox[0], bbox[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-            self.draw_tripwires(frame, camera_config)
-        cap.release()
+                    identity = "unknown"
+                smoothing_s += time.perf_counter() - stage_start
+            if identity == "unknown" and track_ids[i] is not None:
+                self._drop_track_identity(camera_config.camera_id, track_ids[i])
+            if identity != "unknown":
+                center_x = int((bbox[0] + bbox[2]) / 2)
+                center_y = int((bbox[1] + bbox[3]) / 2)
+                identity_state = self.identity_states.touch(identity, camera_config.camera_id, current_time)
+                smoothed_position = identity_state.kalman.update(center_x, center_y)
+                face_centers[identity] = smoothed_position
+                with self.global_tracks_lock:
+                    if identity not in self.global_tracks:
+                        self.global_tracks[identity] = GlobalTrack(
+                            employee_id=identity,
+                            last_seen_time=current_time,
+                            last_camera_id=camera_config.camera_id,
+                            embedding_history=deque(maxlen=EMBEDDING_HISTORY_SIZE),
+                            work_status="working")
+                    track = self.global_tracks[identity]
+                    track.last_seen_time = current_time
+                    track.last_camera_id = camera_config.camera_id
+                    track.confidence_score = score
+                    if reused_track is None:
+                        # Raw search similarity, before temporal smoothing; reused identities skip the search.
+                        track.record_score(float(frame_scores[i]))
+                    if embedding is not None:
+                        track.embedding_history.append(embedding)
+                    identity_state.tracking.record((center_x, center_y), score, quality_metrics)
+                    stage_start = time.perf_counter()
+                    self._check_tripwire_crossing(identity, center_x, center_y, camera_config, frame_width, frame_height)
+                    tripwire_s += time.perf_counter() - stage_start
+                if score > 0.8 and reused_track is None:
+                    self._update_embeddings(identity, embedding)
+            stage_start = time.perf_counter()
+            consistent_track_id = self._get_consistent_track_id(identity, camera_config.camera_id)
+            color = (0, 255, 0) if identity != "unknown" else (0, 0, 255)
+            metadata = self.employee_cache.get(identity) if identity != "unknown" else None
+            if metadata:
+                label = f"{metadata.get('employee_name') or identity} ({score:.2f})"
+            else:
+                label = f"{consistent_track_id} ({score:.2f})"
+            boxes.append(OverlayBox((int(bbox[0]), int(bbox[1]), int(bbox[2]), int(bbox[3])), label, color,
+                                    float(quality_metrics.overall_quality)))
+            annotation_s += time.perf_counter() - stage_start
+        timings.record('smoothing', smoothing_s)
+        timings.record('tripwire', tripwire_s)
+        timings.record('annotation', annotation_s)
+        return boxes
+
+    def _start_camera_workers(self):
+        from backend.core.camera_workers import CameraWorkerPool
+        self.camera_pool = CameraWorkerPool(CAMERAS, ENHANCED_CONFIG.get('cameras_per_process', 1))
+        self.camera_pool.start()
+        thread = threading.Thread(target=self._camera_result_worker, daemon=True)
+        thread.start()
+        self.camera_threads.append(thread)
+
+    def _camera_result_worker(self):
+        """Coordinator loop: apply detection results from the camera worker processes to the shared state."""
+        while not self.shutdown_flag.is_set():
+            result = self.camera_pool.get_result(timeout=0.5)
+            if result is None:
+                continue
+            try:
+                camera_id = result.camera_id
+                faces = [
+                    Face(bbox=result.bboxes[i], det_score=result.det_scores[i],
+                         embedding=result.embeddings[i] if result.embedded[i] else None, track_id=result.track_ids[i])
+                    for i in range(len(result.bboxes))]
+                with self.frame_locks[camera_id]:
+                    self.latest_faces[camera_id] = faces
+                    self._update_live_faces(camera_id, faces)
+                valid_faces = [face for face, is_valid in zip(faces, result.valid) if is_valid]
+                valid_metrics = [metrics for metrics, is_valid in zip(result.metrics, result.valid) if is_valid]
+                boxes = self._handle_faces(self.camera_configs[camera_id], self.camera_pool.frame_shape(camera_id),
+                                           valid_faces, valid_metrics, time.time())
+                self._publish_worker_frame(camera_id, boxes)
+            except Exception as e:
+                log_message(f"[ERROR] Failed to handle result from camera {result.camera_id}: {e}")
+
+    def _publish_worker_frame(self, camera_id: int, boxes: List[OverlayBox]):
+        """Publish a worker camera's overlay, copying its frame out of shared memory only while someone is watching."""
+        frame_stream = self.frame_streams[camera_id]
+        if not frame_stream.has_subscribers:
+            frame_stream.publish(boxes)
+            return
+        frame_ring = self.frame_rings[camera_id]
+        frame_ref, buffer = frame_ring.acquire()
+        with frame_ref:
+            image = self.camera_pool.latest_frame(camera_id, buffer)
+            if image is None:
+                frame_stream.publish(boxes)
+                return
+            if image is not buffer:
+                frame_ring.adopt(frame_ref, image)
+            frame_stream.publish(boxes, frame_ref)
+
+    def replay(self, video_files: Optional[Dict[int, str]] = None, rate: Optional[float] = None,
+               summary_path: Optional[str] = None) -> Dict:
+        """Run the pipeline over recorded video files instead of live cameras and write a throughput summary.
+
+        video_files maps camera_id to a file and defaults to every camera whose
+        source is a file. Each file is processed on its own thread, every frame
+        in order, as fast as possible or at rate frames/s. Detection runs inline
+        on the live detection cadence and identity and tripwire timing follow
+        video time, so a replay produces the same attendance events as live.
+        """
+        if video_files is None:
+            video_files = {cam.camera_id: cam.source for cam in CAMERAS
+                           if cam.source is not None and is_file_source(cam.source)}
+        if not video_files:
+            log_message("[REPLAY] No video files to replay")
+            return {}
+        if not self.apps:
+            self._initialize_multi_gpu_insightface()
+        results = {}
+        threads = []
+        start = time.perf_counter()
+        for camera_id, path in video_files.items():
+            thread = threading.Thread(target=self._replay_camera,
+                                      args=(self.camera_configs[camera_id], path, rate, results), daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        summary = self._replay_summary(results, time.perf_counter() - start)
+        summary_path = summary_path or ENHANCED_CONFIG.get('replay_summary_path', 'replay_summary.json')
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        log_message(f"[REPLAY] {summary['frames']} frames in {summary['elapsed_s']:.1f}s: "
+                    f"{summary['fps']:.1f} frames/s, {summary['faces_per_s']:.1f} faces/s; summary in {summary_path}")
+        return summary
+
+    def _replay_camera(self, camera_config: CameraConfig, path: str, rate: Optional[float], results: Dict):
+        camera_id = camera_config.camera_id
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            log_message(f"[ERROR] Cannot open replay file {path} for camera {camera_id}")
+            return
+        video_fps = cap.get(cv2.CAP_PROP_FPS) or camera_config.fps
+        frame_ring = self.frame_rings[camera_id]
+        frame_slot = self.frame_slots[camera_id]
+        frame_stream = self.frame_streams[camera_id]
+        video_start = time.time()
+        next_frame_time = time.time()
+        frames = 0
+        faces_handled = 0
+        latencies = []
+        try:
+            while not self.shutdown_flag.is_set():
+                if rate:
+                    if not self._frame_interval_elapsed(next_frame_time):
+                        break
+                    next_frame_time = max(next_frame_time + 1.0 / rate, time.time())
+                frame_ref, buffer = frame_ring.acquire()
+                with self.stage_timings[camera_id].time('capture'):
+                    ret, image = cap.read(image=buffer)
+                if not ret:
+                    frame_ref.release()
+                    break
+                if image is not buffer:
+                    frame_ring.adopt(frame_ref, image)
+                frame_slot.publish(frame_ref)
+                self.replay_clock.now = video_start + frames / video_fps
+                frame_start = time.perf_counter()
+                with frame_ref:
+                    self._maybe_detect(camera_id, camera_config.gpu_id, frame_ref.array)
+                    valid_faces, valid_metrics = self._valid_latest_faces(camera_id)
+                    boxes = self._handle_faces(camera_config, frame_ref.array.shape, valid_faces, valid_metrics,
+                                               self.replay_clock.now)
+                    frame_stream.publish(boxes, frame_ref)
+                latencies.append(time.perf_counter() - frame_start)
+                frames += 1
+                faces_handled += len(valid_faces)
+        except Exception as e:
+            log_message(f"[ERROR] Replay of {path} on camera {camera_id} failed at frame {frames}: {e}")
+        finally:
+            cap.release()
+            self.replay_clock.now = None
+        results[camera_id] = {
+            'file': path,
+            'frames': frames,
+            'faces': faces_handled,
+            'video_seconds': frames / video_fps,
+            'latencies': latencies}
+
+    def _replay_summary(self, results: Dict, elapsed: float) -> Dict:
+        def latency_ms(latencies):
+            latencies_ms = 1000 * np.array(latencies or [0.0])
+            return {
+                'p50': float(np.percentile(latencies_ms, 50)),
+                'p99': float(np.percentile(latencies_ms, 99)),
+                'max': float(latencies_ms.max())}
+
+        cameras = {}
+        for camera_id, result in results.items():
+            cameras[camera_id] = {
+                'file': result['file'],
+                'frames': result['frames'],
+                'faces': result['faces'],
+                'fps': result['frames'] / elapsed if elapsed > 0 else 0.0,
+                'realtime_factor': result['video_seconds'] / elapsed if elapsed > 0 else 0.0,
+                'frame_latency_ms': latency_ms(result['latencies']),
+                'stages': self.stage_timings[camera_id].stats(),
+                'counters': self.stage_timings[camera_id].counter_stats()}
+        frames = sum(result['frames'] for result in results.values())
+        faces = sum(result['faces'] for result in results.values())
+        return {
+            'elapsed_s': elapsed,
+            'frames': frames,
+            'faces': faces,
+            'fps': frames / elapsed if elapsed > 0 else 0.0,
+            'faces_per_s': faces / elapsed if elapsed > 0 else 0.0,
+            'frame_latency_ms': latency_ms([t for result in results.values() for t in result['latencies']]),
+            'events': dict(self.event_counts),
+            'cameras': cameras}
 
     def start_multi_camera_tracking(self):
         try:
-            for camera_config in CAMERAS:
-                thread = threading.Thread(
-                    target=self.process_camera,
-                    args=(camera_config,),
-                    daemon=True)
-                thread.start()
-                self.camera_threads.append(thread)
-                time.sleep(1)
+            if ENHANCED_CONFIG.get('camera_worker_processes', False):
+                self._start_camera_workers()
+            else:
+                for camera_config in CAMERAS:
+                    thread = threading.Thread(
+                        target=self.process_camera,
+                        args=(camera_config,),
+                        daemon=True)
+                    thread.start()
+                    self.camera_threads.append(thread)
+                    time.sleep(1)
             while not self.shutdown_flag.is_set():
                 time.sleep(1)
         except KeyboardInterrupt:
@@ -1377,10 +1898,52 @@ class FaceTrackingSystem:
             self.embedding_update_worker.join(timeout=5)
         self.shutdown_flag.set()
         self.api_logger.shutdown()
+        for frame_slot in self.frame_slots.values():
+            frame_slot.close()
+        for frame_stream in self.frame_streams.values():
+            frame_stream.close()
+        for scheduler in self.inference_schedulers.values():
+            scheduler.stop()
+        if self.camera_pool is not None:
+            self.camera_pool.stop()
+        for capture in self.captures.values():
+            capture.join(timeout=2)
         for thread in self.camera_threads:
             if thread.is_alive():
                 thread.join(timeout=2)
 
+    def get_capture_stats(self) -> Dict[int, Dict]:
+        """Per-camera decode vs consumed fps, frames dropped for newer ones and reconnect count."""
+        return {camera_id: capture.stats() for camera_id, capture in self.captures.items()}
+
+    def get_motion_gate_stats(self) -> Dict[int, Dict]:
+        """Per-camera motion gate skip ratio and estimated detection time saved."""
+        return {camera_id: gate.stats() for camera_id, gate in self.motion_gates.items()}
+
+    def get_stage_timings(self) -> Dict[int, Dict]:
+        """Per-camera detection pipeline stage timings, detected/recognized face counts and enhancement usage."""
+        return {
+            camera_id: {
+                'stages': timings.stats(),
+                'counters': timings.counter_stats(),
+                'enhancement': self.frame_enhancers[camera_id].stats()}
+            for camera_id, timings in self.stage_timings.items()}
+
+    def get_identity_state_stats(self) -> Dict[str, float]:
+        """Tracked identities, ring buffer fill and estimated memory footprint of the per-identity state."""
+        footprint = self.identity_states.footprint()
+        with self.global_tracks_lock:
+            footprint['global_tracks'] = len(self.global_tracks)
+        return footprint
+
+    def get_employee_cache_stats(self) -> Dict[str, float]:
+        """Employee metadata cache size, hit rate and pending misses."""
+        return self.employee_cache.stats()
+
+    def get_inference_stats(self) -> Dict[int, Dict]:
+        """Batching, queue-depth and per-camera fairness stats of each device's inference scheduler."""
+        return {gpu_id: scheduler.stats() for gpu_id, scheduler in self.inference_schedulers.items()}
+
     def get_identity_info(self, face):
         embedding = face.embedding.astype('float32')
         return self._compute_embedding_similarity(embedding)
@@ -1390,10 +1953,16 @@ class FaceTrackingSystem:
 
     def get_latest_frame(self, camera_id: int):
         """Get the latest frame from the specified camera"""
-        with self.frame_locks.get(camera_id, threading.Lock()):
-            if camera_id in self.latest_frames:
-                return self.latest_frames[camera_id]
+        if self.camera_pool is not None:
+            return self.camera_pool.latest_frame(camera_id)
+        frame_slot = self.frame_slots.get(camera_id)
+        if frame_slot is None:
             return None
+        frame_ref = frame_slot.latest()[1]
+        if frame_ref is None:
+            return None
+        with frame_ref:
+            return frame_ref.array.copy()
 
 class FaceTrackingPipeline:
     def __init__(self):
@@ -1421,6 +1990,13 @@ class FaceTrackingPipeline:
         else:
             log_message("[Pipeline] Pipeline is not running")
 
+    def replay(self, video_files=None, rate=None, summary_path=None):
+        """Run the pipeline over recorded video files and return the throughput summary"""
+        if self.pipeline_thread and self.pipeline_thread.is_alive():
+            log_message("[Pipeline] Stop the live pipeline before replaying")
+            return {}
+        return self.system.replay(video_files, rate, summary_path)
+
     def get_camera_frame(self, camera_id: int):
         """Get the latest frame from the specified camera"""
         return self.system.get_latest_frame(camera_id)
@@ -1490,14 +2066,19 @@ def get_attendance_data():
 def get_logs(n=100):
     """Get recent logs from buffer"""
     return log_buffer[-n:]
-def generate_mjpeg(camera_id: int):
-    """Yield MJPEG stream for FastAPI."""
+def generate_mjpeg(camera_id: int, quality: Optional[int] = None):
+    """Yield MJPEG stream for FastAPI; each annotated frame is encoded once per quality and shared by all viewers."""
+    quality = quality or ENHANCED_CONFIG.get('stream_jpeg_quality', 80)
     while is_tracking_running:
-        if system_instance:
-            frame = system_instance.get_latest_frame(camera_id)
-            if frame is not None:
-                ret, jpeg = cv2.imencode('.jpg', frame)
-                if ret:
+        frame_stream = system_instance.frame_streams.get(camera_id) if system_instance else None
+        if frame_stream is None:
+            time.sleep(0.05)
+            continue
+        last_seq = 0
+        with frame_stream.subscribe():
+            while is_tracking_running and not frame_stream.closed:
+                last_seq, jpeg = frame_stream.wait_for_jpeg(last_seq, quality, timeout=1.0)
+                if jpeg is not None:
                     yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
-        time.sleep(0.05)
\ No newline at end of file
+                           b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+        return
\ No newline at end of file
@@ -0,0 +1,678 @@
+"""
+FAISS gallery index construction for the face tracking system.
+Builds flat, HNSW, IVF or compressed (fp16 / int8 scalar quantizer, PQ)
+inner-product indexes from a config string, keeps the enrolled gallery
+keyed by face_embeddings.id for incremental updates, persists it as a
+versioned, mmap-able on-disk snapshot, caches recent match results, and reports the recall/latency and
+memory/accuracy cost of each backend against the exact flat index.
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+FLAT_INDEX_MAX_SIZE = 20000
+HNSW_INDEX_MAX_SIZE = 500000
+HNSW_DEFAULT_M = 32
+HNSW_EF_CONSTRUCTION = 80
+IVF_MIN_POINTS_PER_LIST = 39
+SQ8_MIN_TRAINING_POINTS = 1000
+PQ_NBITS = 8
+PQ_MIN_TRAINING_POINTS = (1 << PQ_NBITS) * 39
+SNAPSHOT_COMPACTION_THRESHOLD = 1024
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_KEEP_VERSIONS = 2
+MATCH_CACHE_MAX_ENTRIES = 4096
+MATCH_CACHE_TTL = 10.0
+MATCH_CACHE_LSH_BITS = 16
+MATCH_CACHE_MIN_SIMILARITY = 0.95
+
+_SPEC_PATTERN = re.compile(r"^(flat|hnsw|ivf|sq8|fp16|pq)(\d*)$")
+
+def select_index_spec(num_embeddings: int) -> str:
+    """Pick an index spec for a gallery of the given size."""
+    if num_embeddings <= FLAT_INDEX_MAX_SIZE:
+        return "flat"
+    if num_embeddings <= HNSW_INDEX_MAX_SIZE:
+        return f"hnsw{HNSW_DEFAULT_M}"
+    return f"ivf{int(4 * np.sqrt(num_embeddings))}"
+
+def parse_index_spec(spec: str) -> Tuple[str, int]:
+    """Split a spec such as 'hnsw32', 'ivf1024' or 'pq64' into (kind, parameter)."""
+    match = _SPEC_PATTERN.match(spec.strip().lower())
+    if not match:
+        raise ValueError(f"Unknown FAISS index spec: {spec!r} "
+                         "(expected auto, flat, hnsw<M>, ivf<nlist>, fp16, sq8 or pq<M>)")
+    kind, param = match.groups()
+    return kind, int(param) if param else 0
+
+def build_index(embeddings: np.ndarray, spec: str = "auto", hnsw_ef_search: int = 64,
+                ivf_nprobe: int = 16, ids: Optional[np.ndarray] = None) -> faiss.Index:
+    """Build an inner-product index over L2-normalized float32 embeddings.
+
+    When ids are given the index is keyed by them (IndexIDMap2, or the IVF
+    index's own id lists) so vectors can later be added and removed by id.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    num_embeddings, dim = embeddings.shape
+    if spec == "auto":
+        spec = select_index_spec(num_embeddings)
+    kind, param = parse_index_spec(spec)
+    if kind == "ivf":
+        nlist = param or int(4 * np.sqrt(num_embeddings))
+        nlist = min(nlist, num_embeddings // IVF_MIN_POINTS_PER_LIST)
+        if nlist < 1:
+            kind = "flat"
+    if kind == "pq":
+        pq_m = param or 64
+        if dim % pq_m:
+            raise ValueError(f"PQ sub-quantizer count {pq_m} must divide the embedding dimension {dim}")
+        if num_embeddings < PQ_MIN_TRAINING_POINTS:
+            kind = "sq8"
+    if kind == "sq8" and num_embeddings < SQ8_MIN_TRAINING_POINTS:
+        kind = "fp16"
+    if kind == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, param or HNSW_DEFAULT_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = hnsw_ef_search
+    elif kind in ("sq8", "fp16"):
+        qtype = faiss.ScalarQuantizer.QT_8bit if kind == "sq8" else faiss.ScalarQuantizer.QT_fp16
+        index = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+    elif kind == "pq":
+        index = faiss.IndexPQ(dim, pq_m, PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+    else:
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+        index.nprobe = min(ivf_nprobe, nlist)
+    if ids is None:
+        if num_embeddings:
+            index.add(embeddings)
+        return index
+    if isinstance(index, faiss.IndexIVF):
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    else:
+        index = faiss.IndexIDMap2(index)
+    if num_embeddings:
+        index.add_with_ids(embeddings, np.ascontiguousarray(ids, dtype=np.int64))
+    return index
+
+def normalize_embeddings(embeddings) -> np.ndarray:
+    """Return a float32 (N, D) copy of the embeddings with unit L2 norm rows."""
+    embeddings = np.array(embeddings, dtype=np.float32, ndmin=2)
+    faiss.normalize_L2(embeddings)
+    return embeddings
+
+class GalleryIndex:
+    """Gallery of enrolled embeddings keyed by face_embeddings.id.
+
+    Embeddings can be added and removed by id, so enrolling or deleting a
+    face costs O(changed vectors) instead of a rebuild of the whole gallery.
+    The vectors themselves live only inside the FAISS index.
+    """
+
+    def __init__(self, dim: int = 512, spec: str = "auto", hnsw_ef_search: int = 64, ivf_nprobe: int = 16):
+        self.dim = dim
+        self.spec = spec
+        self.hnsw_ef_search = hnsw_ef_search
+        self.ivf_nprobe = ivf_nprobe
+        self.index = None
+        self.mmapped = False
+        self.labels_by_id: Dict[int, str] = {}
+        self.ids_by_label: Dict[str, set] = {}
+
+    @classmethod
+    def build(cls, ids, embeddings, labels, spec: str = "auto",
+              hnsw_ef_search: int = 64, ivf_nprobe: int = 16) -> "GalleryIndex":
+        embeddings = normalize_embeddings(embeddings) if len(ids) else np.zeros((0, 512), dtype=np.float32)
+        gallery = cls(embeddings.shape[1], spec, hnsw_ef_search, ivf_nprobe)
+        if len(ids):
+            gallery.index = build_index(embeddings, spec, hnsw_ef_search, ivf_nprobe,
+                                        ids=np.asarray(ids, dtype=np.int64))
+            gallery._register(ids, labels)
+        return gallery
+
+    def __len__(self) -> int:
+        return len(self.labels_by_id)
+
+    def copy(self) -> "GalleryIndex":
+        """Deep copy, including the FAISS index, for off-line modification."""
+        gallery = GalleryIndex(self.dim, self.spec, self.hnsw_ef_search, self.ivf_nprobe)
+        if self.mmapped:
+            # Memory-mapped indexes cannot be cloned directly; round-trip through a private buffer.
+            gallery.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+        elif self.index is not None:
+            gallery.index = faiss.clone_index(self.index)
+        gallery.labels_by_id = dict(self.labels_by_id)
+        gallery.ids_by_label = {label: set(ids) for label, ids in self.ids_by_label.items()}
+        return gallery
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
+    @property
+    def employee_count(self) -> int:
+        return len(self.ids_by_label)
+
+    def _check_writable(self):
+        if self.mmapped:
+            raise RuntimeError("Memory-mapped gallery is read-only; modify a copy() instead")
+
+    def _register(self, ids, labels):
+        for embedding_id, label in zip(ids, labels):
+            embedding_id = int(embedding_id)
+            self.labels_by_id[embedding_id] = label
+            self.ids_by_label.setdefault(label, set()).add(embedding_id)
+
+    def _unregister(self, ids):
+        for embedding_id in ids:
+            label = self.labels_by_id.pop(int(embedding_id), None)
+            if label is not None:
+                label_ids = self.ids_by_label.get(label)
+                label_ids.discard(int(embedding_id))
+                if not label_ids:
+                    del self.ids_by_label[label]
+
+    def add(self, ids, embeddings, labels) -> int:
+        """Add (or replace) embeddings under the given ids."""
+        if len(ids) == 0:
+            return 0
+        self._check_writable()
+        ids = np.asarray(ids, dtype=np.int64)
+        embeddings = normalize_embeddings(embeddings)
+        if self.index is None:
+            self.index = build_index(embeddings, self.spec, self.hnsw_ef_search, self.ivf_nprobe, ids=ids)
+        else:
+            existing = [embedding_id for embedding_id in ids.tolist() if embedding_id in self.labels_by_id]
+            if existing:
+                self.remove(existing)
+            self.index.add_with_ids(embeddings, ids)
+        self._register(ids.tolist(), labels)
+        return len(ids)
+
+    def remove(self, ids) -> int:
+        """Remove embeddings by id; ids not in the gallery are ignored."""
+        ids = [int(embedding_id) for embedding_id in ids if int(embedding_id) in self.labels_by_id]
+        if not ids or self.index is None:
+            return 0
+        self._check_writable()
+        id_array = np.asarray(ids, dtype=np.int64)
+        try:
+            self.index.remove_ids(id_array)
+        except RuntimeError:
+            # Graph indexes (HNSW) cannot delete in place: rebuild from the survivors.
+            removed = set(ids)
+            keep = np.asarray([i for i in self.labels_by_id if i not in removed], dtype=np.int64)
+            vectors = self.index.reconstruct_batch(keep) if len(keep) else np.zeros((0, self.dim), dtype=np.float32)
+            self.index = build_index(vectors, self.spec, self.hnsw_ef_search, self.ivf_nprobe, ids=keep)
+        self._unregister(ids)
+        return len(ids)
+
+    def remove_label(self, label: str) -> int:
+        """Remove every embedding that belongs to one employee."""
+        return self.remove(list(self.ids_by_label.get(label, ())))
+
+    def search(self, queries: np.ndarray, k: int,
+               params: Optional[faiss.SearchParameters] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Search normalized queries; returns (scores, embedding ids) with -1 for empty slots."""
+        return self.index.search(np.ascontiguousarray(queries, dtype=np.float32), k, params=params)
+
+    def excluding_parameters(self, excluded_ids) -> Optional[faiss.SearchParameters]:
+        """Search parameters that make FAISS skip excluded_ids, or None if the index has no selector support (PQ)."""
+        index = self.index if isinstance(self.index, faiss.IndexIVF) else faiss.downcast_index(self.index.index)
+        selector = faiss.IDSelectorNot(faiss.IDSelectorBatch(np.fromiter(excluded_ids, dtype=np.int64)))
+        if isinstance(index, faiss.IndexPQ):
+            return None
+        if isinstance(index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+        if isinstance(index, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+        return faiss.SearchParameters(sel=selector)
+
+    def labels_for(self, ids: np.ndarray) -> np.ndarray:
+        """Map an array of embedding ids to employee ids (None where there is no match)."""
+        lookup = self.labels_by_id.get
+        return np.array([lookup(embedding_id) for embedding_id in ids.ravel().tolist()],
+                        dtype=object).reshape(ids.shape)
+
+@dataclass(frozen=True)
+class GallerySnapshot:
+    """Immutable, searchable view of the gallery.
+
+    A snapshot is a frozen base GalleryIndex plus a small overlay of vectors
+    added and ids removed since the base was built. Writers derive a new
+    snapshot and publish it with a single reference assignment, so readers
+    search whatever snapshot they picked up without taking a lock; an old
+    snapshot (and its index) is freed once the last reader drops it.
+    """
+    base: GalleryIndex
+    version: int = 0
+    delta_ids: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    delta_vectors: np.ndarray = field(default_factory=lambda: np.zeros((0, 512), dtype=np.float32))
+    delta_labels: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=object))
+    removed_ids: FrozenSet[int] = frozenset()
+
+    @classmethod
+    def from_gallery(cls, gallery: GalleryIndex, version: int = 0) -> "GallerySnapshot":
+        return cls(base=gallery, version=version,
+                   delta_vectors=np.zeros((0, gallery.dim), dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self.base) - len(self.removed_ids) + len(self.delta_ids)
+
+    @property
+    def ntotal(self) -> int:
+        return len(self)
+
+    @property
+    def pending_changes(self) -> int:
+        """Overlay size; once large the snapshot should be compacted into a new base."""
+        return len(self.delta_ids) + len(self.removed_ids)
+
+    @property
+    def employee_count(self) -> int:
+        labels = {label for label, ids in self.base.ids_by_label.items() if not ids <= self.removed_ids}
+        labels.update(self.delta_labels.tolist())
+        return len(labels)
+
+    def embedding_ids(self) -> set:
+        ids = set(self.base.labels_by_id)
+        ids.difference_update(self.removed_ids)
+        ids.update(self.delta_ids.tolist())
+        return ids
+
+    def label_ids(self, label: str) -> List[int]:
+        base_ids = [i for i in self.base.ids_by_label.get(label, ()) if i not in self.removed_ids]
+        return base_ids + self.delta_ids[self.delta_labels == label].tolist()
+
+    def with_added(self, ids, embeddings, labels) -> "GallerySnapshot":
+        """New snapshot with embeddings added (or replaced) under the given ids."""
+        ids = np.asarray(ids, dtype=np.int64)
+        snapshot = self.with_removed(ids.tolist(), bump_version=False)
+        return GallerySnapshot(
+            base=self.base,
+            version=self.version + 1,
+            delta_ids=np.concatenate([snapshot.delta_ids, ids]),
+            delta_vectors=np.vstack([snapshot.delta_vectors, normalize_embeddings(embeddings)]),
+            delta_labels=np.concatenate([snapshot.delta_labels, np.asarray(labels, dtype=object)]),
+            removed_ids=snapshot.removed_ids)
+
+    def with_removed(self, ids, bump_version: bool = True) -> "GallerySnapshot":
+        """New snapshot without the given ids; unknown ids are ignored."""
+        ids = {int(embedding_id) for embedding_id in ids}
+        in_base = {i for i in ids if i in self.base.labels_by_id}
+        keep = ~np.isin(self.delta_ids, list(ids))
+        return GallerySnapshot(
+            base=self.base,
+            version=self.version + 1 if bump_version else self.version,
+            delta_ids=self.delta_ids[keep],
+            delta_vectors=self.delta_vectors[keep],
+            delta_labels=self.delta_labels[keep],
+            removed_ids=self.removed_ids | frozenset(in_base))
+
+    def compact(self) -> GalleryIndex:
+        """Fold the overlay into a fresh copy of the base index. O(gallery); run off the hot path."""
+        gallery = self.base.copy()
+        gallery.remove(list(self.removed_ids))
+        gallery.add(self.delta_ids, self.delta_vectors, self.delta_labels.tolist())
+        return gallery
+
+    def rebased(self, compacted: GalleryIndex, captured: "GallerySnapshot") -> "GallerySnapshot":
+        """This snapshot re-expressed on compacted = captured.compact(), where captured is an earlier snapshot it derives from.
+
+        Only the changes published since captured stay in the overlay: base ids
+        removed since then, captured delta entries that were removed or
+        replaced, and delta entries added since then.
+        """
+        rows = {embedding_id: row for row, embedding_id in enumerate(self.delta_ids.tolist())}
+        unchanged, stale = set(), set()
+        for row, embedding_id in enumerate(captured.delta_ids.tolist()):
+            current = rows.get(embedding_id)
+            if (current is not None and self.delta_labels[current] == captured.delta_labels[row]
+                    and np.array_equal(self.delta_vectors[current], captured.delta_vectors[row])):
+                unchanged.add(embedding_id)
+            else:
+                stale.add(embedding_id)
+        keep = ~np.isin(self.delta_ids, list(unchanged))
+        removed = (self.removed_ids - captured.removed_ids) | stale
+        return GallerySnapshot(
+            base=compacted,
+            version=self.version,
+            delta_ids=self.delta_ids[keep],
+            delta_vectors=self.delta_vectors[keep],
+            delta_labels=self.delta_labels[keep],
+            removed_ids=frozenset(i for i in removed if i in compacted.labels_by_id))
+
+    @cached_property
+    def _base_search_parameters(self) -> Optional[faiss.SearchParameters]:
+        return self.base.excluding_parameters(self.removed_ids) if self.removed_ids else None
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Search normalized queries; returns (scores, employee ids) with None for empty slots."""
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        num_queries = len(queries)
+        score_blocks = []
+        label_blocks = []
+        if self.base.ntotal:
+            params = self._base_search_parameters
+            # Removed ids are filtered inside FAISS; PQ has no selector support, so over-fetch and mask instead.
+            filter_after = bool(self.removed_ids) and params is None
+            base_k = min(k + len(self.removed_ids) if filter_after else k, self.base.ntotal)
+            D, I = self.base.search(queries, base_k, params)
+            labels = self.base.labels_for(I)
+            if filter_after:
+                removed = np.isin(I, list(self.removed_ids))
+                D = np.where(removed, -np.inf, D)
+                labels[removed] = None
+            score_blocks.append(D)
+            label_blocks.append(labels)
+        if len(self.delta_ids):
+            score_blocks.append(queries @ self.delta_vectors.T)
+            label_blocks.append(np.broadcast_to(self.delta_labels, (num_queries, len(self.delta_ids))))
+        if not score_blocks:
+            return np.full((num_queries, k), -np.inf, dtype=np.float32), np.full((num_queries, k), None, dtype=object)
+        D = np.hstack(score_blocks)
+        labels = np.hstack(label_blocks)
+        k = min(k, D.shape[1])
+        top = np.argsort(-D, axis=1, kind='stable')[:, :k]
+        rows = np.arange(num_queries)[:, None]
+        return D[rows, top], labels[rows, top]
+
+class MatchCache:
+    """Bounded LRU/TTL cache of gallery match results keyed by an LSH signature.
+
+    The key is the sign pattern of the normalized embedding against a fixed set
+    of random hyperplanes, so the same face on nearby frames lands in the same
+    bucket. A hit also requires the cached embedding to be within
+    min_similarity of the query, and each entry is tagged with the gallery
+    version it was computed against: entries from an older version are dropped
+    on lookup instead of clearing the whole cache on every publish.
+    """
+
+    def __init__(self, max_entries: int = MATCH_CACHE_MAX_ENTRIES, ttl: float = MATCH_CACHE_TTL,
+                 num_bits: int = MATCH_CACHE_LSH_BITS, min_similarity: float = MATCH_CACHE_MIN_SIMILARITY,
+                 seed: int = 0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.num_bits = num_bits
+        self.min_similarity = min_similarity
+        self.seed = seed
+        self.hyperplanes = None
+        self.entries = OrderedDict()  # key -> (version, expires_at, embedding, identity, score)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _keys(self, embeddings: np.ndarray) -> List[bytes]:
+        if self.hyperplanes is None or self.hyperplanes.shape[1] != embeddings.shape[1]:
+            rng = np.random.default_rng(self.seed)
+            self.hyperplanes = rng.standard_normal((self.num_bits, embeddings.shape[1]), dtype=np.float32)
+        bits = np.packbits(embeddings @ self.hyperplanes.T > 0, axis=1)
+        return [row.tobytes() for row in bits]
+
+    def lookup(self, embeddings: np.ndarray, version: int) -> Tuple[List[bytes], List[Optional[Tuple[str, float]]]]:
+        """Look up normalized (N, D) embeddings; returns their keys and (identity, score) or None per row."""
+        keys = self._keys(embeddings)
+        results = []
+        now = time.monotonic()
+        with self.lock:
+            for key, embedding in zip(keys, embeddings):
+                entry = self.entries.get(key)
+                if entry is not None and (entry[0] != version or entry[1] < now):
+                    del self.entries[key]
+                    entry = None
+                if entry is not None and float(np.dot(entry[2], embedding)) >= self.min_similarity:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    results.append((entry[3], entry[4]))
+                else:
+                    self.misses += 1
+                    results.append(None)
+        return keys, results
+
+    def store(self, keys: List[bytes], embeddings: np.ndarray, identities, scores, version: int):
+        expires_at = time.monotonic() + self.ttl
+        with self.lock:
+            for key, embedding, identity, score in zip(keys, embeddings, identities, scores):
+                self.entries[key] = (version, expires_at, embedding.copy(), identity, float(score))
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self.entries),
+                'hit_rate': self.hits / lookups if lookups else 0.0}
+
+def save_gallery_snapshot(snapshot_dir: str, gallery: GalleryIndex, version: int) -> str:
+    """Write the gallery as snapshot_dir/v<version>-<ms>/ and point snapshot_dir/CURRENT at it.
+
+    The snapshot holds the serialized FAISS index, the embedding ids and
+    label codes as .npy arrays, and a manifest with the label vocabulary.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    # A fresh directory per save: other processes may still have the previous one mapped.
+    name = f"v{version}-{int(time.time() * 1000)}"
+    tmp_dir = os.path.join(snapshot_dir, f".{name}.tmp{os.getpid()}")
+    final_dir = os.path.join(snapshot_dir, name)
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    ids = np.fromiter(gallery.labels_by_id.keys(), dtype=np.int64, count=len(gallery))
+    vocabulary = sorted(gallery.ids_by_label)
+    codes_by_label = {label: code for code, label in enumerate(vocabulary)}
+    codes = np.fromiter((codes_by_label[label] for label in gallery.labels_by_id.values()),
+                        dtype=np.int32, count=len(gallery))
+    np.save(os.path.join(tmp_dir, "ids.npy"), ids)
+    np.save(os.path.join(tmp_dir, "label_codes.npy"), codes)
+    if gallery.index is not None:
+        faiss.write_index(gallery.index, os.path.join(tmp_dir, "index.faiss"))
+    manifest = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'gallery_version': version,
+        'dim': gallery.dim,
+        'spec': gallery.spec,
+        'index_type': type(gallery.index).__name__ if gallery.index is not None else None,
+        'labels': vocabulary,
+        'created_at': time.time()}
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_dir, final_dir)
+    current_tmp = os.path.join(snapshot_dir, f".CURRENT.tmp{os.getpid()}")
+    with open(current_tmp, "w") as f:
+        f.write(name)
+    os.replace(current_tmp, os.path.join(snapshot_dir, "CURRENT"))
+    saved = sorted((d for d in os.listdir(snapshot_dir) if re.match(r"^v\d+-\d+$", d)),
+                   key=lambda d: int(d.rsplit("-", 1)[1]))
+    for old in saved[:-SNAPSHOT_KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(snapshot_dir, old), ignore_errors=True)
+    return final_dir
+
+def load_gallery_snapshot(snapshot_dir: str, mmap: bool = True,
+                          hnsw_ef_search: int = 64, ivf_nprobe: int = 16) -> Optional[Tuple[GalleryIndex, Dict]]:
+    """Load the snapshot CURRENT points at; returns (gallery, manifest) or None if there is none.
+
+    With mmap the FAISS index codes are mapped read-only from the file, so
+    several processes on one host share one copy of the vectors in the page
+    cache. The id -> employee maps are small next to the vectors and are
+    built per process, since every add and remove updates them.
+    """
+    try:
+        with open(os.path.join(snapshot_dir, "CURRENT")) as f:
+            path = os.path.join(snapshot_dir, f.read().strip())
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        return None
+    ids = np.load(os.path.join(path, "ids.npy"))
+    codes = np.load(os.path.join(path, "label_codes.npy"))
+    gallery = GalleryIndex(manifest['dim'], manifest['spec'], hnsw_ef_search, ivf_nprobe)
+    index_path = os.path.join(path, "index.faiss")
+    if os.path.exists(index_path):
+        # IVF inverted lists are not flat codes and cannot use the mmap reader.
+        use_mmap = mmap and manifest.get('index_type') != 'IndexIVFFlat'
+        gallery.index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP_IFC if use_mmap else 0)
+        gallery.mmapped = use_mmap
+        if isinstance(gallery.index, faiss.IndexIVF):
+            gallery.index.nprobe = min(ivf_nprobe, gallery.index.nlist)
+        elif isinstance(gallery.index, faiss.IndexIDMap2):
+            inner = faiss.downcast_index(gallery.index.index)
+            if isinstance(inner, faiss.IndexHNSW):
+                inner.hnsw.efSearch = hnsw_ef_search
+    vocabulary = manifest['labels']
+    gallery._register(ids.tolist(), [vocabulary[code] for code in codes.tolist()])
+    return gallery, manifest
+
+def index_memory_bytes(index: faiss.Index) -> int:
+    """Size of the serialized index, a close proxy for its resident memory."""
+    return int(faiss.serialize_index(index).nbytes)
+
+def synthetic_gallery(num_identities: int, per_identity: int, num_queries: int, dim: int = 512,
+                      noise: float = 0.8, seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Generate clustered unit-norm embeddings plus noisy probe queries with their true labels."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_identities, dim)).astype(np.float32)
+    faiss.normalize_L2(centers)
+    scale = np.float32(noise / np.sqrt(dim))
+    gallery_labels = np.repeat(np.arange(num_identities), per_identity)
+    gallery = centers[gallery_labels] + scale * rng.standard_normal((len(gallery_labels), dim), dtype=np.float32)
+    faiss.normalize_L2(gallery)
+    query_labels = rng.integers(0, num_identities, num_queries)
+    queries = centers[query_labels] + scale * rng.standard_normal((num_queries, dim), dtype=np.float32)
+    faiss.normalize_L2(queries)
+    return gallery, gallery_labels, queries, query_labels
+
+def _timed_search(index: faiss.Index, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray, float]:
+    start = time.perf_counter()
+    D, I = index.search(queries, k)
+    return D, I, (time.perf_counter() - start) * 1000.0 / max(1, len(queries))
+
+def evaluate_index(gallery: np.ndarray, queries: np.ndarray, spec: str, k: int = 3,
+                   hnsw_ef_search: int = 64, ivf_nprobe: int = 16,
+                   reference: Optional[Tuple[np.ndarray, float]] = None) -> Dict:
+    """Compare an index spec against exact flat search on the same gallery and queries."""
+    if reference is None:
+        flat = build_index(gallery, "flat")
+        _, flat_I, flat_ms = _timed_search(flat, queries, k)
+    else:
+        flat_I, flat_ms = reference
+    start = time.perf_counter()
+    index = build_index(gallery, spec, hnsw_ef_search=hnsw_ef_search, ivf_nprobe=ivf_nprobe)
+    build_s = time.perf_counter() - start
+    _, I, search_ms = _timed_search(index, queries, k)
+    recall_at_1 = float(np.mean(I[:, 0] == flat_I[:, 0]))
+    overlap = [len(set(row) & set(ref)) / k for row, ref in zip(I.tolist(), flat_I.tolist())]
+    return {
+        'spec': spec,
+        'gallery_size': len(gallery),
+        'build_s': build_s,
+        'search_ms_per_query': search_ms,
+        'flat_search_ms_per_query': flat_ms,
+        'speedup': flat_ms / search_ms if search_ms > 0 else float('inf'),
+        'recall_at_1': recall_at_1,
+        f'recall_at_{k}': float(np.mean(overlap))}
+
+def recall_latency_report(gallery_sizes: List[int], specs: List[str], num_queries: int = 1000,
+                          per_identity: int = 5, k: int = 3, hnsw_ef_search: int = 64,
+                          ivf_nprobe: int = 16, seed: int = 0) -> List[Dict]:
+    """Evaluate every spec on synthetic galleries of the given sizes."""
+    results = []
+    for size in gallery_sizes:
+        gallery, _, queries, _ = synthetic_gallery(max(1, size // per_identity), per_identity, num_queries, seed=seed)
+        flat = build_index(gallery, "flat")
+        _, flat_I, flat_ms = _timed_search(flat, queries, k)
+        for spec in specs:
+            resolved = select_index_spec(len(gallery)) if spec == "auto" else spec
+            result = evaluate_index(gallery, queries, resolved, k=k, hnsw_ef_search=hnsw_ef_search,
+                                    ivf_nprobe=ivf_nprobe, reference=(flat_I, flat_ms))
+            result['requested_spec'] = spec
+            results.append(result)
+    return results
+
+def compression_report(specs: List[str], gallery_size: int = 100000, num_queries: int = 2000,
+                       per_identity: int = 5, noise: float = 1.8, seed: int = 0) -> List[Dict]:
+    """Memory per 100k embeddings and top-1 identity accuracy of each storage spec on a synthetic gallery.
+
+    The default noise puts genuine-pair similarity near 0.25, hard enough for
+    quantization error to show up in the top-1 accuracy.
+    """
+    gallery, gallery_labels, queries, query_labels = synthetic_gallery(
+        max(1, gallery_size // per_identity), per_identity, num_queries, noise=noise, seed=seed)
+    ids = np.arange(len(gallery), dtype=np.int64)
+    results = []
+    for spec in specs:
+        index = build_index(gallery, spec, ids=ids)
+        _, I = index.search(queries, 1)
+        top1 = gallery_labels[I[:, 0]]
+        results.append({
+            'spec': spec,
+            'gallery_size': len(gallery),
+            'mb_per_100k': index_memory_bytes(index) / 1e6 * 100000 / len(gallery),
+            'top1_accuracy': float(np.mean(top1 == query_labels))})
+    baseline = results[0]['top1_accuracy'] if results else 0.0
+    for result in results:
+        result['top1_delta'] = result['top1_accuracy'] - baseline
+    return results
+
+def format_compression_report(results: List[Dict]) -> str:
+    header = f"{'spec':>8} {'MB/100k':>9} {'top-1':>7} {'delta':>8}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(f"{r['spec']:>8} {r['mb_per_100k']:>9.1f} {r['top1_accuracy']:>7.4f} {r['top1_delta']:>+8.4f}")
+    return "\n".join(lines)
+
+def format_report(results: List[Dict], k: int = 3) -> str:
+    header = f"{'gallery':>9} {'spec':>10} {'build s':>8} {'ms/query':>9} {'flat ms':>8} {'speedup':>8} {'R@1':>6} {f'R@{k}':>6}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(
+            f"{r['gallery_size']:>9} {r['spec']:>10} {r['build_s']:>8.2f} {r['search_ms_per_query']:>9.4f} "
+            f"{r['flat_search_ms_per_query']:>8.4f} {r['speedup']:>8.1f} {r['recall_at_1']:>6.3f} {r[f'recall_at_{k}']:>6.3f}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall/latency of approximate gallery indexes against IndexFlatIP")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000])
+    parser.add_argument("--specs", nargs="+", default=["auto", "hnsw32", "ivf1024"])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--compression", action="store_true",
+                        help="report memory per 100k embeddings and top-1 accuracy of flat/fp16/sq8/pq storage instead")
+    args = parser.parse_args()
+    if args.compression:
+        specs = args.specs if args.specs != parser.get_default("specs") else ["flat", "fp16", "sq8", "pq64"]
+        gallery_size = args.sizes[0] if args.sizes != parser.get_default("sizes") else 100000
+        print(format_compression_report(compression_report(specs, gallery_size=gallery_size, num_queries=args.queries)))
+        raise SystemExit(0)
+    report = recall_latency_report(args.sizes, args.specs, num_queries=args.queries, k=args.k,
+                                   hnsw_ef_search=args.ef_search, ivf_nprobe=args.nprobe)
+    print(format_report(report, k=args.k))
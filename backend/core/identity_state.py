@@ -0,0 +1,151 @@
+"""
+Per-identity tracking state for the face tracking system.
+Everything the pipeline remembers about a recognized employee between frames
+(consistent track ID, Kalman filter, position/confidence/quality history and
+tripwire crossing state) lives in one IdentityState per identity. Histories
+are fixed-capacity ring buffers, the store holds at most `capacity`
+identities (least recently seen evicted first), and sweep() drops identities
+not seen for `timeout` seconds, so memory stays flat on a 24/7 deployment
+instead of growing with every employee who ever walked past a camera.
+"""
+
+import sys
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+IDENTITY_HISTORY_SIZE = 30  # positions, confidences and quality metrics kept per identity
+IDENTITY_STATE_CAPACITY = 10000
+FOOTPRINT_SAMPLE_SIZE = 256  # identities measured per footprint estimate
+
+@dataclass
+class TrackingState:
+    position_history: Deque[Tuple[int, int]]
+    velocity: Tuple[float, float]
+    predicted_position: Tuple[int, int]
+    confidence_history: Deque[float]
+    quality_history: Deque[Any]
+
+    @classmethod
+    def empty(cls, history_size: int = IDENTITY_HISTORY_SIZE) -> "TrackingState":
+        return cls(position_history=deque(maxlen=history_size), velocity=(0, 0), predicted_position=(0, 0),
+                   confidence_history=deque(maxlen=history_size), quality_history=deque(maxlen=history_size))
+
+    def record(self, position: Tuple[int, int], confidence: float, quality):
+        self.position_history.append(position)
+        self.confidence_history.append(confidence)
+        self.quality_history.append(quality)
+        if len(self.position_history) >= 2:
+            (x0, y0), (x1, y1) = self.position_history[-2], self.position_history[-1]
+            self.velocity = (x1 - x0, y1 - y0)
+
+@dataclass
+class IdentityState:
+    identity: str
+    track_id: str
+    camera_id: int
+    last_seen: float
+    tracking: TrackingState
+    kalman: Any = None
+    crossing: Dict[str, Dict[str, dict]] = field(default_factory=dict)  # camera -> tripwire -> crossing state
+
+def deep_sizeof(obj, seen: Optional[set] = None) -> int:
+    """Approximate bytes held by obj and everything it references (native OpenCV objects count as their wrapper)."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool, np.ndarray)) or obj is None:
+        return size  # getsizeof already includes an owning array's data
+    if isinstance(obj, dict):
+        return size + sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset, deque)):
+        return size + sum(deep_sizeof(item, seen) for item in obj)
+    if hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+class IdentityStateStore:
+    """Bounded, TTL-evicted map of identity -> IdentityState.
+
+    touch() is the only way in: it returns the identity's state, creating it
+    (and its Kalman filter, via kalman_factory) on first sight, and marks it
+    as seen. States handed out stay valid for the caller even if they are
+    evicted meanwhile; the next touch() simply starts a fresh one.
+    """
+
+    def __init__(self, timeout: float, capacity: int = IDENTITY_STATE_CAPACITY,
+                 history_size: int = IDENTITY_HISTORY_SIZE, kalman_factory: Optional[Callable[[], Any]] = None):
+        self.timeout = timeout
+        self.capacity = capacity
+        self.history_size = history_size
+        self.kalman_factory = kalman_factory
+        self.states: "OrderedDict[str, IdentityState]" = OrderedDict()  # least recently seen first
+        self.lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def __contains__(self, identity: str) -> bool:
+        return identity in self.states
+
+    def get(self, identity: str) -> Optional[IdentityState]:
+        return self.states.get(identity)
+
+    def touch(self, identity: str, camera_id: int, now: float) -> IdentityState:
+        with self.lock:
+            state = self.states.get(identity)
+            if state is None:
+                state = IdentityState(
+                    identity=identity, track_id=identity, camera_id=camera_id, last_seen=now,
+                    tracking=TrackingState.empty(self.history_size),
+                    kalman=self.kalman_factory() if self.kalman_factory is not None else None)
+                self.states[identity] = state
+                while len(self.states) > self.capacity:
+                    self.states.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self.states.move_to_end(identity)
+            state.last_seen = max(state.last_seen, now)
+            state.camera_id = camera_id
+            return state
+
+    def sweep(self, now: float) -> List[str]:
+        """Drop identities not seen for timeout seconds; returns their IDs."""
+        cutoff = now - self.timeout
+        with self.lock:
+            expired = [identity for identity, state in self.states.items() if state.last_seen < cutoff]
+            for identity in expired:
+                del self.states[identity]
+            self.expired += len(expired)
+        return expired
+
+    def footprint(self, sample_size: int = FOOTPRINT_SAMPLE_SIZE) -> Dict[str, float]:
+        """Identity and history counts plus an estimate of the bytes held, measured on a sample of identities."""
+        with self.lock:
+            states = list(self.states.values())
+        history = sum(len(state.tracking.position_history) for state in states)
+        crossings = sum(len(tripwires) for state in states for tripwires in list(state.crossing.values()))
+        sample = states[::max(1, len(states) // sample_size)][:sample_size] if states else []
+        measured = []
+        for state in sample:
+            try:
+                measured.append(deep_sizeof(state))
+            except RuntimeError:  # a camera thread appended to a history mid-walk
+                continue
+        estimated = int(sum(measured) / len(measured) * len(states)) if measured else 0
+        return {
+            'identities': len(states),
+            'capacity': self.capacity,
+            'history_entries': history,
+            'history_capacity': len(states) * self.history_size,
+            'crossing_states': crossings,
+            'estimated_bytes': estimated,
+            'expired': self.expired,
+            'evicted': self.evicted}
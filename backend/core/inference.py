@@ -0,0 +1,217 @@
+"""
+Per-device inference scheduling for the face tracking system.
+insightface's SCRFD detector takes one image per call, so detection runs on
+each camera's own thread, in parallel, exactly as app.get() did. Recognition
+is what batches: every camera bound to a device submits the faces it wants
+embedded to one scheduler, which gathers the pending requests of all those
+cameras into a micro-batch (flushed when full, when every bound camera is
+waiting, or at a max-wait deadline), embeds all their aligned crops in one
+get_feat call, and keeps per-camera queueing and fairness stats.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from insightface.app.common import Face
+from insightface.utils import face_align
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = 8
+DEFAULT_MAX_WAIT = 0.010
+RECOGNITION_MAX_BATCH = 64
+
+@dataclass
+class InferenceRequest:
+    camera_id: int
+    frame: np.ndarray
+    submitted_at: float
+    input_faces: List[Face]
+    faces: Optional[List[Face]] = None
+    done: threading.Event = field(default_factory=threading.Event)
+
+@dataclass
+class CameraQueueStats:
+    submitted: int = 0
+    processed: int = 0
+    superseded: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+class InferenceScheduler:
+    """Detection and cross-camera recognition micro-batching for one device's FaceAnalysis models.
+
+    Each camera has at most one pending frame: a newer submission supersedes
+    the older one (its caller gets None), so a slow device drops stale frames
+    instead of queueing them. Pending frames are served in arrival order, which
+    bounds every camera's wait to one batch behind the others.
+    """
+
+    def __init__(self, app, device_name: str, num_cameras: int = 1,
+                 max_batch: int = DEFAULT_MAX_BATCH, max_wait: float = DEFAULT_MAX_WAIT):
+        self.det_model = app.det_model
+        self.rec_model = app.models.get('recognition')
+        self.device_name = device_name
+        self.num_cameras = max(1, num_cameras)
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.pending = OrderedDict()  # camera_id -> InferenceRequest, oldest first
+        self.condition = threading.Condition()
+        self.camera_stats: Dict[int, CameraQueueStats] = {}
+        self.batches = 0
+        self.batched_frames = 0
+        self.batched_faces = 0
+        self.busy_time = 0.0
+        self.rec_batching = True
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"inference-{device_name}", daemon=True)
+        self.thread.start()
+
+    def infer(self, camera_id: int, frame: np.ndarray, timeout: Optional[float] = None) -> Optional[List[Face]]:
+        """Detect and recognize faces in frame; returns None if the recognition request was superseded or stopped."""
+        return self.recognize(camera_id, frame, self.detect(camera_id, frame), timeout)
+
+    def detect(self, camera_id: int, frame: np.ndarray) -> List[Face]:
+        """Detection only, on the calling thread: faces carry bbox, kps and det_score but no embedding."""
+        bboxes, kpss = self.det_model.detect(frame, max_num=0, metric='default')
+        return [Face(bbox=bboxes[i, 0:4], kps=kpss[i] if kpss is not None else None, det_score=bboxes[i, 4])
+                for i in range(bboxes.shape[0])]
+
+    def recognize(self, camera_id: int, frame: np.ndarray, faces: List[Face],
+                  timeout: Optional[float] = None) -> Optional[List[Face]]:
+        """Fill face.embedding for faces detected on frame (kps in frame coordinates), batched with other cameras."""
+        request = InferenceRequest(camera_id=camera_id, frame=frame, submitted_at=time.monotonic(), input_faces=faces)
+        return self._submit(request, timeout)
+
+    def recognize_now(self, frame: np.ndarray, faces: List[Face]) -> List[Face]:
+        """Fill face.embedding on the calling thread, without waiting for other cameras."""
+        crops, crop_faces = self._crops(frame, faces)
+        self._embed(crops, crop_faces)
+        return faces
+
+    def _submit(self, request: InferenceRequest, timeout: Optional[float]) -> Optional[List[Face]]:
+        camera_id = request.camera_id
+        with self.condition:
+            if not self.running:
+                return None
+            stats = self.camera_stats.setdefault(camera_id, CameraQueueStats())
+            previous = self.pending.pop(camera_id, None)
+            if previous is not None:
+                stats.superseded += 1
+                previous.done.set()
+            stats.submitted += 1
+            self.pending[camera_id] = request
+            self.condition.notify()
+        request.done.wait(timeout)
+        return request.faces
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            for request in self.pending.values():
+                request.done.set()
+            self.pending.clear()
+            self.condition.notify_all()
+        self.thread.join(timeout=2)
+
+    def _next_batch(self) -> List[InferenceRequest]:
+        with self.condition:
+            while self.running and not self.pending:
+                self.condition.wait()
+            if not self.running:
+                return []
+            deadline = next(iter(self.pending.values())).submitted_at + self.max_wait
+            while self.running and len(self.pending) < min(self.max_batch, self.num_cameras):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            return [self.pending.popitem(last=False)[1] for _ in range(min(self.max_batch, len(self.pending)))]
+
+    def _run(self):
+        while self.running:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            started = time.monotonic()
+            try:
+                results = self._run_batch(batch)
+            except Exception as e:
+                logger.error(f"[INFERENCE] Batch of {len(batch)} frames failed on {self.device_name}: {e}")
+                results = [[] for _ in batch]
+            finished = time.monotonic()
+            with self.condition:
+                self.batches += 1
+                self.batched_frames += len(batch)
+                self.batched_faces += sum(len(faces) for faces in results)
+                self.busy_time += finished - started
+                for request, faces in zip(batch, results):
+                    stats = self.camera_stats[request.camera_id]
+                    wait = started - request.submitted_at
+                    stats.processed += 1
+                    stats.total_wait += wait
+                    stats.max_wait = max(stats.max_wait, wait)
+            for request, faces in zip(batch, results):
+                request.faces = faces
+                request.done.set()
+
+    def _run_batch(self, batch: List[InferenceRequest]) -> List[List[Face]]:
+        crops = []
+        crop_faces = []
+        for request in batch:
+            request_crops, request_faces = self._crops(request.frame, request.input_faces)
+            crops.extend(request_crops)
+            crop_faces.extend(request_faces)
+        # One recognition call for every aligned crop of the batch, across cameras.
+        self._embed(crops, crop_faces)
+        return [request.input_faces for request in batch]
+
+    def _crops(self, frame: np.ndarray, faces: List[Face]) -> Tuple[List[np.ndarray], List[Face]]:
+        if self.rec_model is None:
+            return [], []
+        faces = [face for face in faces if face.kps is not None]
+        crops = [face_align.norm_crop(frame, landmark=face.kps, image_size=self.rec_model.input_size[0])
+                 for face in faces]
+        return crops, faces
+
+    def _embed(self, crops: List[np.ndarray], faces: List[Face]):
+        """Fill face.embedding for aligned crops, batching across frames when the model allows it."""
+        if self.rec_batching and len(crops) > 1:
+            try:
+                for start in range(0, len(crops), RECOGNITION_MAX_BATCH):
+                    feats = self.rec_model.get_feat(crops[start:start + RECOGNITION_MAX_BATCH])
+                    for face, feat in zip(faces[start:start + RECOGNITION_MAX_BATCH], feats):
+                        face.embedding = feat.flatten()
+                return
+            except Exception as e:
+                # Some exported recognition models have a fixed batch of 1.
+                logger.warning(f"[INFERENCE] Batched recognition unavailable on {self.device_name}, using batch size 1: {e}")
+                self.rec_batching = False
+        for crop, face in zip(crops, faces):
+            face.embedding = self.rec_model.get_feat(crop).flatten()
+
+    def stats(self) -> Dict:
+        with self.condition:
+            cameras = {}
+            for camera_id, stats in self.camera_stats.items():
+                cameras[camera_id] = {
+                    'submitted': stats.submitted,
+                    'processed': stats.processed,
+                    'superseded': stats.superseded,
+                    'queue_depth': int(camera_id in self.pending),
+                    'avg_wait_ms': 1000 * stats.total_wait / stats.processed if stats.processed else 0.0,
+                    'max_wait_ms': 1000 * stats.max_wait,
+                    'share': stats.processed / self.batched_frames if self.batched_frames else 0.0}
+            return {
+                'device': self.device_name,
+                'queue_depth': len(self.pending),
+                'batches': self.batches,
+                'avg_batch_frames': self.batched_frames / self.batches if self.batches else 0.0,
+                'avg_batch_faces': self.batched_faces / self.batches if self.batches else 0.0,
+                'busy_seconds': self.busy_time,
+                'cameras': cameras}
@@ -0,0 +1,60 @@
+"""
+Prometheus exposition of the face tracking pipeline's stage timings.
+Cameras register their StageTimings here when the pipeline starts, and
+render_metrics() writes every stage histogram and event counter in the
+Prometheus text format (version 0.0.4), labeled by camera, for the /metrics
+route. Rendering reads snapshots taken under each StageTimings lock, so
+scraping never blocks the camera threads for longer than a copy.
+"""
+
+import threading
+from typing import Dict, List
+
+from backend.core.stage_timings import LATENCY_BUCKETS, StageTimings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+STAGE_METRIC = "fts_stage_duration_seconds"
+EVENT_METRIC = "fts_pipeline_events_total"
+
+_registry: Dict[str, StageTimings] = {}
+_registry_lock = threading.Lock()
+
+def register_camera(camera_id, timings: StageTimings):
+    """Export timings under camera=camera_id; registering the same camera again replaces it."""
+    with _registry_lock:
+        _registry[str(camera_id)] = timings
+
+def unregister_camera(camera_id):
+    with _registry_lock:
+        _registry.pop(str(camera_id), None)
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+def render_metrics() -> str:
+    with _registry_lock:
+        cameras = sorted(_registry.items())
+    lines: List[str] = [
+        f"# HELP {STAGE_METRIC} Wall-clock duration of face tracking pipeline stages.",
+        f"# TYPE {STAGE_METRIC} histogram"]
+    counters = []
+    for camera, timings in cameras:
+        camera_label = _escape(camera)
+        for stage, (buckets, count, total) in sorted(timings.histograms().items()):
+            labels = f'camera="{camera_label}",stage="{_escape(stage)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                cumulative += bucket_count
+                lines.append(f'{STAGE_METRIC}_bucket{{{labels},le="{_format_bound(bound)}"}} {cumulative}')
+            lines.append(f'{STAGE_METRIC}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{STAGE_METRIC}_sum{{{labels}}} {total!r}')
+            lines.append(f'{STAGE_METRIC}_count{{{labels}}} {count}')
+        for event, value in sorted(timings.counter_stats().items()):
+            counters.append(f'{EVENT_METRIC}{{camera="{camera_label}",event="{_escape(event)}"}} {value}')
+    lines.append(f"# HELP {EVENT_METRIC} Faces detected and recognized, frames dropped and other pipeline events.")
+    lines.append(f"# TYPE {EVENT_METRIC} counter")
+    lines.extend(counters)
+    return "\n".join(lines) + "\n"
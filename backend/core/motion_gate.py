@@ -0,0 +1,81 @@
+"""
+Motion gating for face detection.
+Compares a tiny grayscale thumbnail of each candidate frame against the
+previous one and reports whether enough of the scene changed to be worth
+running the detector, so static, empty scenes skip detection entirely.
+"""
+
+import time
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+MOTION_THUMBNAIL_WIDTH = 64
+DEFAULT_PIXEL_THRESHOLD = 15
+DEFAULT_ACTIVITY_THRESHOLD = 0.002
+DEFAULT_MAX_SKIP_SECONDS = 2.0
+DETECTION_COST_ALPHA = 0.1
+
+class MotionGate:
+    """Frame-differencing gate on a downscaled grayscale thumbnail.
+
+    A frame is active when more than activity_threshold of the thumbnail
+    pixels changed by more than pixel_threshold grey levels. At least one
+    frame per max_skip_seconds is let through, so faces that stand still are
+    still re-detected.
+    """
+
+    def __init__(self, pixel_threshold: int = DEFAULT_PIXEL_THRESHOLD,
+                 activity_threshold: float = DEFAULT_ACTIVITY_THRESHOLD,
+                 max_skip_seconds: float = DEFAULT_MAX_SKIP_SECONDS):
+        self.pixel_threshold = pixel_threshold
+        self.activity_threshold = activity_threshold
+        self.max_skip_seconds = max_skip_seconds
+        self.previous: Optional[np.ndarray] = None
+        self.last_pass_time = 0.0
+        self.checked = 0
+        self.skipped = 0
+        self.detection_cost = 0.0
+        self.last_activity = 0.0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        step = max(1, width // (2 * MOTION_THUMBNAIL_WIDTH))
+        size = (MOTION_THUMBNAIL_WIDTH, max(1, height * MOTION_THUMBNAIL_WIDTH // width))
+        small = cv2.resize(frame[::step, ::step], size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def should_detect(self, frame: np.ndarray, now: Optional[float] = None) -> bool:
+        """now overrides the monotonic clock, e.g. with video time when replaying recordings."""
+        thumbnail = self._thumbnail(frame)
+        now = time.monotonic() if now is None else now
+        self.checked += 1
+        if self.previous is None or self.previous.shape != thumbnail.shape:
+            active = True
+        else:
+            changed = cv2.absdiff(thumbnail, self.previous) > self.pixel_threshold
+            self.last_activity = float(np.count_nonzero(changed)) / changed.size
+            active = self.last_activity > self.activity_threshold
+        self.previous = thumbnail
+        if active or now - self.last_pass_time >= self.max_skip_seconds:
+            self.last_pass_time = now
+            return True
+        self.skipped += 1
+        return False
+
+    def record_detection(self, seconds: float):
+        """Track the running cost of one detection, used to estimate the time saved by skipping."""
+        if self.detection_cost == 0.0:
+            self.detection_cost = seconds
+        else:
+            self.detection_cost += DETECTION_COST_ALPHA * (seconds - self.detection_cost)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'checked': self.checked,
+            'skipped': self.skipped,
+            'skip_ratio': self.skipped / self.checked if self.checked else 0.0,
+            'last_activity': self.last_activity,
+            'avg_detection_ms': 1000 * self.detection_cost,
+            'saved_seconds': self.skipped * self.detection_cost}
@@ -0,0 +1,64 @@
+"""
+Per-stage wall-clock timing for the camera pipelines.
+Each stage keeps a count, total, maximum and a fixed-bucket latency
+histogram, cheap enough to record on every frame and exported in Prometheus
+form by backend.core.metrics.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)  # seconds
+
+class StageTimings:
+    """Thread-safe count, total, max and latency histogram per named pipeline stage, plus plain event counters."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages: Dict[str, list] = {}  # stage -> [count, total_seconds, max_seconds, bucket_counts]
+        self.counters: Dict[str, int] = {}
+
+    def record(self, stage: str, seconds: float):
+        bucket = bisect_left(LATENCY_BUCKETS, seconds)  # len(LATENCY_BUCKETS) is the +Inf bucket
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = [0, 0.0, 0.0, [0] * (len(LATENCY_BUCKETS) + 1)]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3][bucket] += 1
+
+    def count(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            return {
+                stage: {
+                    'count': count,
+                    'avg_ms': 1000 * total / count,
+                    'max_ms': 1000 * peak,
+                    'total_s': total}
+                for stage, (count, total, peak, _) in self.stages.items()}
+
+    def histograms(self) -> Dict[str, Tuple[List[int], int, float]]:
+        """Per stage: (counts per LATENCY_BUCKETS bucket plus +Inf, not cumulative; count; total seconds)."""
+        with self.lock:
+            return {stage: (list(buckets), count, total) for stage, (count, total, _, buckets) in self.stages.items()}
+
+    def counter_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.counters)
@@ -89,13 +89,13 @@ class DatabaseManager:
             session.add(new_embedding)
             session.commit()
             print(f"[DB] Stored embedding for {employee_id}")
-            return True
+            return new_embedding.id
 
         except Exception as e:
             if session:
                 session.rollback()
             print(f"[DB] Error storing embedding for {employee_id}: {e}")
-            return False
+            return None
 
         finally:
             if session:
@@ -128,9 +128,14 @@ class DatabaseManager:
 
 
     def get_all_active_embeddings(self) -> Tuple[List[np.ndarray], List[str]]:
+        _, embeddings, labels = self.get_active_embedding_records()
+        return embeddings, labels
+
+    def get_active_embedding_records(self) -> Tuple[List[int], List[np.ndarray], List[str]]:
         session = None
         try:
             session = self.Session()
+            embedding_ids = []
             embeddings = []
             labels = []
 
@@ -140,6 +145,7 @@ class DatabaseManager:
 
             for emb_record in enroll_embeddings:
                 embedding_data = pickle.loads(emb_record.embedding_data)
+                embedding_ids.append(emb_record.id)
                 embeddings.append(embedding_data)
                 labels.append(emb_record.employee_id)
 
@@ -147,21 +153,60 @@ class DatabaseManager:
                 and_(FaceEmbedding.is_active == True, FaceEmbedding.embedding_type == 'update')
             ).order_by(desc(FaceEmbedding.created_at)).all()
 
-            employee_update_count = {}
-            for emb_record in update_embeddings:
-                emp_id = emb_record.employee_id
-                if emp_id not in employee_update_count:
-                    employee_update_count[emp_id] = 0
-                if employee_update_count[emp_id] < 3:
-                    embedding_data = pickle.loads(emb_record.embedding_data)
-                    embeddings.append(embedding_data)
-                    labels.append(emb_record.employee_id)
-                    employee_update_count[emp_id] += 1
+            for emb_record in self._latest_updates_per_employee(update_embeddings):
+                embedding_data = pickle.loads(emb_record.embedding_data)
+                embedding_ids.append(emb_record.id)
+                embeddings.append(embedding_data)
+                labels.append(emb_record.employee_id)
 
-            return embeddings, labels
+            return embedding_ids, embeddings, labels
         except Exception as e:
             self.logger.error(f"Error getting all active embeddings: {e}")
-            return [], []
+            return [], [], []
+        finally:
+            if session:
+                session.close()
+
+    def _latest_updates_per_employee(self, update_rows, limit: int = 3):
+        employee_update_count = {}
+        for row in update_rows:
+            count = employee_update_count.get(row.employee_id, 0)
+            if count < limit:
+                employee_update_count[row.employee_id] = count + 1
+                yield row
+
+    def get_active_embedding_keys(self) -> List[Tuple[int, str]]:
+        """Same selection as get_active_embedding_records, but ids and employee ids only (no blobs)."""
+        session = None
+        try:
+            session = self.Session()
+            enroll_rows = session.query(FaceEmbedding.id, FaceEmbedding.employee_id).filter(
+                and_(FaceEmbedding.is_active == True, FaceEmbedding.embedding_type == 'enroll')
+            ).all()
+            update_rows = session.query(FaceEmbedding.id, FaceEmbedding.employee_id).filter(
+                and_(FaceEmbedding.is_active == True, FaceEmbedding.embedding_type == 'update')
+            ).order_by(desc(FaceEmbedding.created_at)).all()
+            keys = [(row.id, row.employee_id) for row in enroll_rows]
+            keys.extend((row.id, row.employee_id) for row in self._latest_updates_per_employee(update_rows))
+            return keys
+        except Exception as e:
+            self.logger.error(f"Error getting active embedding keys: {e}")
+            return []
+        finally:
+            if session:
+                session.close()
+
+    def get_embeddings_by_ids(self, embedding_ids: List[int]) -> Tuple[List[int], List[np.ndarray], List[str]]:
+        session = None
+        try:
+            session = self.Session()
+            records = session.query(FaceEmbedding).filter(FaceEmbedding.id.in_(list(embedding_ids))).all()
+            return ([record.id for record in records],
+                    [pickle.loads(record.embedding_data) for record in records],
+                    [record.employee_id for record in records])
+        except Exception as e:
+            self.logger.error(f"Error getting embeddings by id: {e}")
+            return [], [], []
         finally:
             if session:
                 session.close()
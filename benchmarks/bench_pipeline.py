@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark of the face tracking pipeline.
+Replays one synthetic video on 1, 4 and 16 cameras through
+FaceTrackingSystem.replay() with the fake models, in-memory database and
+local Zoho server from benchmarks/stubs.py, and reports frames/s, faces/s,
+p50/p99 per-frame latency and peak RSS for each camera count. Each camera
+count is run once per inference mode: "batched" sends recognition through the
+per-device InferenceScheduler, "per-camera" embeds on each camera's own thread
+as app.get() used to. Every run uses a fresh interpreter so peak RSS is
+measured per configuration. Needs the pipeline's Python dependencies but no
+GPU, network, database or model files.
+
+    python benchmarks/bench_pipeline.py [--cameras 1 4 16] [--modes batched per-camera] [--frames 300] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+API_DRAIN_TIMEOUT = 10.0
+INFERENCE_MODES = ("batched", "per-camera")
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def camera_configs(fts_system, count, video, resolution, fps):
+    return [
+        fts_system.CameraConfig(
+            camera_id=camera_id,
+            gpu_id=0,
+            camera_type="entry" if camera_id % 2 == 0 else "exit",
+            tripwires=[fts_system.TripwireConfig(position=0.5, spacing=0.01, direction="horizontal", name="BenchLine")],
+            resolution=resolution,
+            fps=fps,
+            source=video)
+        for camera_id in range(count)]
+
+def run_configuration(args):
+    """Benchmark one camera count in this process; returns the result row."""
+    from benchmarks.stubs import FakeFaceAnalysis, StubDatabaseManager, ZohoStub
+
+    # Register the in-memory manager before fts_system imports the PostgreSQL-backed one.
+    db_manager = types.ModuleType("backend.db.db_manager")
+    db_manager.DatabaseManager = StubDatabaseManager
+    sys.modules["backend.db.db_manager"] = db_manager
+    from backend.core import fts_system
+
+    FakeFaceAnalysis.identities = StubDatabaseManager.identities = args.identities
+    fts_system.FaceAnalysis = FakeFaceAnalysis
+    fts_system.create_tables = lambda: None
+    zoho = ZohoStub().start()
+    fts_system.API_CONFIG.update(zoho.api_config(fts_system.API_CONFIG))
+    fts_system.ENHANCED_CONFIG.update(
+        gallery_snapshot_dir=None,
+        inference_batching=args.mode == "batched",
+        replay_summary_path=os.path.join(args.workdir, f"replay_{args.worker}_cameras_{args.mode}.json"))
+    fts_system.CAMERAS[:] = camera_configs(fts_system, args.worker, args.video, tuple(args.resolution), args.fps)
+
+    system = fts_system.FaceTrackingSystem()
+    summary = system.replay(rate=args.rate)
+    deadline = time.time() + API_DRAIN_TIMEOUT
+    while system.api_logger.api_queue.unfinished_tasks and time.time() < deadline:
+        time.sleep(0.05)
+    system.shutdown()
+    zoho.stop()
+    return {
+        'cameras': args.worker,
+        'mode': args.mode,
+        'frames': summary.get('frames', 0),
+        'fps': summary.get('fps', 0.0),
+        'faces_per_s': summary.get('faces_per_s', 0.0),
+        'p50_ms': summary.get('frame_latency_ms', {}).get('p50', 0.0),
+        'p99_ms': summary.get('frame_latency_ms', {}).get('p99', 0.0),
+        'peak_rss_mb': peak_rss_mb(),
+        'events': sum(summary.get('events', {}).values()),
+        'zoho_calls': zoho.attendance_calls,
+        'summary': summary}
+
+def print_table(rows):
+    header = f"{'cameras':>7} {'mode':>10} {'frames/s':>9} {'faces/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'peak RSS MB':>12} {'events':>7} {'zoho':>5}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        rss = f"{row['peak_rss_mb']:.0f}" if row['peak_rss_mb'] is not None else "n/a"
+        print(f"{row['cameras']:>7} {row['mode']:>10} {row['fps']:>9.1f} {row['faces_per_s']:>9.1f} {row['p50_ms']:>8.2f} "
+              f"{row['p99_ms']:>8.2f} {rss:>12} {row['events']:>7} {row['zoho_calls']:>5}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Face tracking pipeline throughput benchmark")
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1, 4, 16], help="camera counts to benchmark")
+    parser.add_argument("--modes", nargs="+", choices=INFERENCE_MODES, default=list(INFERENCE_MODES),
+                        help="inference paths to compare at every camera count")
+    parser.add_argument("--frames", type=int, default=300, help="frames in the synthetic video")
+    parser.add_argument("--resolution", type=int, nargs=2, default=[1280, 720], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--fps", type=int, default=15, help="frame rate recorded in the synthetic video")
+    parser.add_argument("--faces", type=int, default=3, help="faces walking through each frame")
+    parser.add_argument("--identities", type=int, default=8, help="enrolled synthetic identities")
+    parser.add_argument("--rate", type=float, default=None, help="frames/s per camera; default as fast as possible")
+    parser.add_argument("--output", help="write the results, including full replay summaries, as JSON")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=INFERENCE_MODES, default="batched", help=argparse.SUPPRESS)
+    parser.add_argument("--video", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        os.chdir(args.workdir)  # attendance CSV and fallback logs land in the scratch directory
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(run_configuration(args), f)
+        return 0
+
+    from benchmarks.stubs import write_synthetic_video
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="fts-bench-") as workdir:
+        video = write_synthetic_video(os.path.join(workdir, "synthetic.avi"), tuple(args.resolution), args.fps,
+                                      args.frames, args.identities, args.faces)
+        for cameras in args.cameras:
+            for mode in args.modes:
+                result_path = os.path.join(workdir, f"result_{cameras}_{mode}.json")
+                command = [sys.executable, os.path.abspath(__file__), "--worker", str(cameras), "--mode", mode,
+                           "--video", video, "--workdir", workdir, "--result", result_path, "--fps", str(args.fps),
+                           "--identities", str(args.identities), "--resolution", *map(str, args.resolution)]
+                if args.rate:
+                    command += ["--rate", str(args.rate)]
+                print(f"Benchmarking {cameras} camera(s), {mode}...", flush=True)
+                completed = subprocess.run(command)
+                if completed.returncode != 0 or not os.path.exists(result_path):
+                    print(f"Benchmark with {cameras} camera(s), {mode} failed (exit code {completed.returncode})")
+                    return 1
+                with open(result_path, encoding="utf-8") as f:
+                    rows.append(json.load(f))
+    print()
+    print_table(rows)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
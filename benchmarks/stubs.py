@@ -0,0 +1,256 @@
+"""
+Stand-ins for the external pieces of the face tracking pipeline, so it can be
+benchmarked on a CPU-only machine with no network, database or model files:
+a fake FaceAnalysis that detects the synthetic faces drawn by
+write_synthetic_video and returns a fixed embedding per identity, an
+in-memory DatabaseManager seeded with those identities, and a local HTTP
+server answering the Zoho token and attendance calls made by APILogger.
+"""
+
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+EMBEDDING_DIM = 512
+BACKGROUND_LEVEL = 20
+FACE_SIZE = 110
+PALETTE_LEVELS = (90, 160, 230)
+TEXTURE_AMPLITUDE = 30
+MIN_COMPONENT_SIZE = 16
+_KPS_TEMPLATE = np.array([[0.3, 0.35], [0.7, 0.35], [0.5, 0.55], [0.35, 0.75], [0.65, 0.75]], dtype=np.float32)
+
+def identity_color(index: int) -> Tuple[int, int, int]:
+    levels = len(PALETTE_LEVELS)
+    return (PALETTE_LEVELS[index % levels], PALETTE_LEVELS[(index // levels) % levels],
+            PALETTE_LEVELS[(index // levels ** 2) % levels])
+
+def identity_index(color: np.ndarray) -> int:
+    """Inverse of identity_color for a (possibly compression-shifted) mean BGR color."""
+    palette = np.array(PALETTE_LEVELS, dtype=np.float32)
+    digits = [int(np.argmin(np.abs(palette - channel))) for channel in color]
+    levels = len(PALETTE_LEVELS)
+    return digits[0] + levels * digits[1] + levels ** 2 * digits[2]
+
+def identity_embeddings(count: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+def employee_id(index: int) -> str:
+    return f"BENCH{index:03d}"
+
+def face_patch(index: int, size: int = FACE_SIZE) -> np.ndarray:
+    """Textured square in the identity's color; the checker texture keeps it sharp for the quality gate."""
+    patch = np.empty((size, size, 3), dtype=np.int16)
+    patch[:] = identity_color(index)
+    yy, xx = np.mgrid[0:size, 0:size]
+    checker = np.where(((yy // 6) + (xx // 6)) % 2 == 0, TEXTURE_AMPLITUDE, -TEXTURE_AMPLITUDE)
+    patch += checker[..., None].astype(np.int16)
+    return np.clip(patch, 0, 255).astype(np.uint8)
+
+def write_synthetic_video(path: str, resolution: Tuple[int, int], fps: int, frames: int,
+                          identities: int, faces_per_frame: int) -> str:
+    """Faces of different identities walking top to bottom through the frame, staggered in time and x."""
+    width, height = resolution
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    patches = [face_patch(i) for i in range(identities)]
+    travel = height + FACE_SIZE
+    speed = max(1, travel // max(1, frames // 2))
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    for n in range(frames):
+        frame[:] = BACKGROUND_LEVEL
+        for slot in range(faces_per_frame):
+            offset = n * speed + slot * travel // faces_per_frame
+            walker = offset // travel
+            y = offset % travel - FACE_SIZE
+            x = (slot + 1) * width // (faces_per_frame + 1) - FACE_SIZE // 2
+            patch = patches[(walker * faces_per_frame + slot) % identities]
+            y0, y1 = max(0, y), min(height, y + FACE_SIZE)
+            if y1 > y0:
+                frame[y0:y1, x:x + FACE_SIZE] = patch[y0 - y:y1 - y]
+        writer.write(frame)
+    writer.release()
+    return path
+
+class FakeDetector:
+    """Connected components of everything brighter than the synthetic background."""
+
+    def __init__(self):
+        self.det_thresh = 0.5
+        self.input_size = None
+
+    def detect(self, img, input_size=None, max_num=0, metric='default'):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        mask = (gray > BACKGROUND_LEVEL + 25).astype(np.uint8)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        boxes = [stats[i] for i in range(1, count)
+                 if stats[i, cv2.CC_STAT_WIDTH] >= MIN_COMPONENT_SIZE and stats[i, cv2.CC_STAT_HEIGHT] >= MIN_COMPONENT_SIZE]
+        bboxes = np.zeros((len(boxes), 5), dtype=np.float32)
+        kpss = np.zeros((len(boxes), 5, 2), dtype=np.float32)
+        for i, (x, y, w, h, _) in enumerate(boxes):
+            bboxes[i] = (x, y, x + w, y + h, 0.9)
+            kpss[i] = _KPS_TEMPLATE * (w, h) + (x, y)
+        return bboxes, kpss
+
+class FakeRecognizer:
+    """Maps an aligned crop's mean color back to its identity's fixed embedding."""
+
+    def __init__(self, identities: int):
+        self.input_size = (112, 112)
+        self.embeddings = identity_embeddings(identities)
+
+    def get_feat(self, imgs):
+        if isinstance(imgs, np.ndarray) and imgs.ndim == 3:
+            imgs = [imgs]
+        feats = np.zeros((len(imgs), EMBEDDING_DIM), dtype=np.float32)
+        for i, img in enumerate(imgs):
+            center = img[32:80, 32:80].reshape(-1, 3).mean(axis=0)
+            feats[i] = self.embeddings[identity_index(center) % len(self.embeddings)]
+        return feats
+
+class FakeFaceAnalysis:
+    """Drop-in for insightface.app.FaceAnalysis as used by FaceTrackingSystem and InferenceScheduler."""
+
+    identities = 8
+
+    def __init__(self, name=None, providers=None, allowed_modules=None, **kwargs):
+        self.det_model = FakeDetector()
+        self.models = {'detection': self.det_model}
+        if allowed_modules is None or 'recognition' in allowed_modules:
+            self.models['recognition'] = FakeRecognizer(self.identities)
+
+    def prepare(self, ctx_id=0, det_thresh=0.5, det_size=(640, 640)):
+        self.det_model.det_thresh = det_thresh
+        self.det_model.input_size = det_size
+
+class StubDatabaseManager:
+    """In-memory DatabaseManager with one active embedding per synthetic identity."""
+
+    identities = 8
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.embeddings = {i + 1: (employee_id(i), embedding)
+                           for i, embedding in enumerate(identity_embeddings(self.identities))}
+        self.employees = {
+            employee_id(i): SimpleNamespace(
+                id=employee_id(i), employee_name=f"Bench Employee {i}", department="Benchmark",
+                designation="Tester", email=None, phone=None)
+            for i in range(self.identities)}
+        self.attendance = []
+
+    def get_active_embedding_records(self) -> Tuple[List[int], List[np.ndarray], List[str]]:
+        with self.lock:
+            ids = sorted(self.embeddings)
+            return ids, [self.embeddings[i][1] for i in ids], [self.embeddings[i][0] for i in ids]
+
+    def get_active_embedding_keys(self) -> List[Tuple[int, str]]:
+        with self.lock:
+            return [(i, emp_id) for i, (emp_id, _) in sorted(self.embeddings.items())]
+
+    def get_embeddings_by_ids(self, embedding_ids: List[int]) -> Tuple[List[int], List[np.ndarray], List[str]]:
+        with self.lock:
+            ids = [i for i in embedding_ids if i in self.embeddings]
+            return ids, [self.embeddings[i][1] for i in ids], [self.embeddings[i][0] for i in ids]
+
+    def store_face_embedding(self, employee_id, embedding, embedding_type, quality_score, source_image_path):
+        with self.lock:
+            embedding_id = max(self.embeddings, default=0) + 1
+            self.embeddings[embedding_id] = (employee_id, np.asarray(embedding, dtype=np.float32))
+            return embedding_id
+
+    def cleanup_old_embeddings(self, employee_id: str, max_embeddings: int = 25):
+        with self.lock:
+            ids = sorted(i for i, (emp_id, _) in self.embeddings.items() if emp_id == employee_id)
+            for i in ids[:-max_embeddings]:
+                del self.embeddings[i]
+
+    def get_all_employees(self):
+        return list(self.employees.values())
+
+    def get_employee(self, employee_id: str):
+        return self.employees.get(employee_id)
+
+    def create_employee(self, **kwargs) -> bool:
+        return True
+
+    def create_attendance_record(self, **kwargs) -> bool:
+        with self.lock:
+            self.attendance.append(SimpleNamespace(timestamp=datetime.now(), **kwargs))
+        return True
+
+    def get_attendance_records(self, **kwargs):
+        with self.lock:
+            return list(self.attendance)
+
+    def get_latest_attendance_by_employee(self, employee_id: str, hours_back: int = 10):
+        # Everyone counts as checked in, so exits are logged as well as entries.
+        return SimpleNamespace(event_type='check_in', timestamp=datetime.now())
+
+    def cleanup_old_attendance_records(self, cutoff_date) -> int:
+        return 0
+
+    def get_employee_count(self) -> int:
+        return len(self.employees)
+
+    def get_embedding_count(self) -> int:
+        return len(self.embeddings)
+
+    def get_attendance_count(self) -> int:
+        return len(self.attendance)
+
+    def close(self):
+        pass
+
+class _ZohoHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path.startswith('/oauth/v2/token'):
+            body = {'access_token': 'benchmark-token', 'expires_in': 3600}
+        else:
+            self.server.attendance_calls += 1
+            body = {'response': 'success'}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+class ZohoStub:
+    """Local HTTP server answering the Zoho People token refresh and attendance calls."""
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _ZohoHandler)
+        self.server.attendance_calls = 0
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def attendance_calls(self) -> int:
+        return self.server.attendance_calls
+
+    def api_config(self, config: dict) -> dict:
+        """config with its Zoho URLs pointed at this server."""
+        return dict(config, base_url=f"{self.url}/people/api", token_url=f"{self.url}/oauth/v2/token")
+
+    def start(self) -> "ZohoStub":
+        self.thread = threading.Thread(target=self.server.serve_forever, name="zoho-stub", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
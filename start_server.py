@@ -77,6 +77,9 @@ def start_server(host="0.0.0.0", port=8000, reload=False, workers=1):
     """Start the FastAPI server"""
     try:
         backend_path = Path(__file__).parent / "backend"
+        # app.main imports the pipeline as backend.core, so the repository root must be importable too.
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(backend_path.resolve().parent), env.get("PYTHONPATH")]))
         os.chdir(backend_path)
         
         # Build uvicorn command
@@ -98,7 +101,7 @@ def start_server(host="0.0.0.0", port=8000, reload=False, workers=1):
         print("Press Ctrl+C to stop the server")
         
         # Start server
-        subprocess.run(cmd)
+        subprocess.run(cmd, env=env)
         
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
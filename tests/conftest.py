@@ -0,0 +1,33 @@
+"""
+Shared fixtures for the backend tests.
+Tests that need FaceTrackingSystem use the in-memory database and fake
+FaceAnalysis models from benchmarks/stubs.py, so they run without a GPU,
+PostgreSQL or model files; they are skipped when the pipeline's own
+dependencies (torch, bytetracker) are not installed.
+"""
+
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+@pytest.fixture(scope="session")
+def fts_system():
+    pytest.importorskip("torch")
+    pytest.importorskip("bytetracker")
+    from benchmarks.stubs import FakeFaceAnalysis, StubDatabaseManager
+
+    if "backend.core.fts_system" not in sys.modules:
+        # Register the in-memory manager before fts_system imports the PostgreSQL-backed one.
+        db_manager = types.ModuleType("backend.db.db_manager")
+        db_manager.DatabaseManager = StubDatabaseManager
+        sys.modules["backend.db.db_manager"] = db_manager
+    from backend.core import fts_system as module
+
+    module.FaceAnalysis = FakeFaceAnalysis
+    module.create_tables = lambda: None
+    return module
@@ -0,0 +1,36 @@
+import types
+from collections import deque
+
+import pytest
+
+def adaptive_threshold(fts_system, scores):
+    track = fts_system.GlobalTrack(employee_id="E1", last_seen_time=0.0, last_camera_id=0,
+                                   embedding_history=deque(maxlen=fts_system.EMBEDDING_HISTORY_SIZE))
+    for score in scores:
+        track.record_score(score)
+    system = types.SimpleNamespace(global_tracks={"E1": track})
+    return fts_system.FaceTrackingSystem._adaptive_threshold(system, "E1", scores[-1] if scores else 0.0)
+
+@pytest.mark.parametrize("scores, factor", [
+    ([], 1.0),
+    ([0.95] * 4, 1.0),
+    ([0.85] * 5, 0.9),
+    ([0.8] * 5, 1.0),
+    ([0.7] * 5, 1.0),
+    ([0.6] * 5, 1.0),
+    ([0.55] * 5, 1.1),
+    ([0.9, 0.9, 0.9, 0.7, 0.7], 0.9),
+    ([0.5, 0.5, 0.5, 0.7, 0.7], 1.1),
+], ids=["no-history", "short-history", "high", "at-upper-band", "mid", "at-lower-band", "low",
+        "mean-above-band", "mean-below-band"])
+def test_threshold_bands(fts_system, scores, factor):
+    assert adaptive_threshold(fts_system, scores) == pytest.approx(fts_system.THRESHOLD * factor)
+
+def test_threshold_follows_the_last_history_window(fts_system):
+    size = fts_system.EMBEDDING_HISTORY_SIZE
+    assert adaptive_threshold(fts_system, [0.9] * size + [0.5] * size) == pytest.approx(fts_system.THRESHOLD * 1.1)
+    assert adaptive_threshold(fts_system, [0.5] * size + [0.9] * size) == pytest.approx(fts_system.THRESHOLD * 0.9)
+
+def test_unknown_identity_uses_base_threshold(fts_system):
+    system = types.SimpleNamespace(global_tracks={})
+    assert fts_system.FaceTrackingSystem._adaptive_threshold(system, "E1", 0.9) == fts_system.THRESHOLD
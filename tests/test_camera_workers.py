@@ -0,0 +1,64 @@
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+RESULT_TIMEOUT = 15.0
+
+@pytest.fixture
+def worker(fts_system, tmp_path):
+    from backend.core.camera_workers import CameraWorker, SharedFrameRing
+    from benchmarks.stubs import write_synthetic_video
+
+    video = write_synthetic_video(str(tmp_path / "walk.avi"), (640, 480), 15, 150, identities=4, faces_per_frame=1)
+    camera = fts_system.CameraConfig(
+        camera_id=0, gpu_id=0, camera_type="entry",
+        tripwires=[fts_system.TripwireConfig(position=0.5, spacing=0.01, direction="horizontal", name="Line")],
+        resolution=(640, 480), fps=15, source=video)
+    ring = SharedFrameRing(shape=(480, 640, 3))
+    results, control, stop = queue.Queue(), queue.Queue(), threading.Event()
+    worker = CameraWorker([camera], {0: ring}, results, stop, control, log=lambda msg: None)
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    yield worker, results, control
+    stop.set()
+    thread.join(timeout=5)
+    ring.close()
+    ring.unlink()
+
+def next_result(results, predicate):
+    deadline = time.monotonic() + RESULT_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            kind, result = results.get(timeout=deadline - time.monotonic())
+        except queue.Empty:
+            break
+        if kind == 'faces' and predicate(result):
+            return result
+    pytest.fail("no matching camera result")
+
+def test_worker_detects_and_embeds_with_stub_models(worker):
+    camera_worker, results, _ = worker
+    result = next_result(results, lambda r: r.valid.any())
+    assert camera_worker.shared_frames[0].latest_seq > 0
+    row = int(np.argmax(result.valid))
+    assert result.embedded[row]
+    assert np.linalg.norm(result.embeddings[row]) > 0
+    assert result.track_ids[row] is not None
+
+def test_confirmed_track_skips_recognition_in_worker(fts_system, worker):
+    _, results, control = worker
+    result = next_result(results, lambda r: r.embedded.any() and r.track_ids[int(np.argmax(r.embedded))] is not None)
+    row = int(np.argmax(result.embedded))
+    track_id = result.track_ids[row]
+    x1, y1, x2, y2 = result.bboxes[row]
+    state = fts_system.TrackIdentity(identity="BENCH000", score=0.9, anchor_embedding=result.embeddings[row],
+                                     last_seen_time=time.time(), anchor_area=float((x2 - x1) * (y2 - y1)))
+    control.put(('confirm', 0, track_id, state))
+    skipped = next_result(results, lambda r: any(t == track_id and v and not e
+                                                 for t, v, e in zip(r.track_ids, r.valid, r.embedded)))
+    assert not skipped.embeddings[list(skipped.track_ids).index(track_id)].any()
+    control.put(('drop', 0, track_id, None))
+    next_result(results, lambda r: any(t == track_id and e for t, e in zip(r.track_ids, r.embedded)))
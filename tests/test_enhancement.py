@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from backend.core.enhancement import FrameEnhancer
+
+def flat_frame(level, spread=5, seed=0):
+    noise = np.random.default_rng(seed).integers(-spread, spread + 1, size=(120, 160, 3))
+    return np.clip(level + noise, 0, 255).astype(np.uint8)
+
+def test_lut_brightens_dark_frames():
+    enhancer = FrameEnhancer('lut')
+    frame = flat_frame(40)
+    enhanced, applied = enhancer.enhance(frame)
+    assert applied
+    assert enhanced.mean() > frame.mean() + 30
+    assert enhancer.stats()['applied'] == 1
+
+def test_lut_skips_bright_low_contrast_frames():
+    enhancer = FrameEnhancer('lut')
+    frame = flat_frame(180)
+    luminance, contrast = enhancer.measure(frame)
+    assert enhancer.needs_enhancement(luminance, contrast)
+    enhanced, applied = enhancer.enhance(frame)
+    assert not applied
+    assert enhanced is frame
+    assert enhancer.stats()['applied'] == 0 and enhancer.stats()['skipped'] == 1
+    assert not enhancer.luts
+
+@pytest.mark.parametrize("mode", ['clahe_y', 'clahe'])
+def test_clahe_modes_still_enhance_bright_low_contrast_frames(mode):
+    enhancer = FrameEnhancer(mode)
+    _, applied = enhancer.enhance(flat_frame(180))
+    assert applied
+
+def test_well_exposed_frames_are_skipped():
+    enhancer = FrameEnhancer('lut')
+    frame = np.random.default_rng(0).integers(0, 256, size=(120, 160, 3), dtype=np.uint8)
+    enhanced, applied = enhancer.enhance(frame)
+    assert enhanced is frame and not applied
+    assert enhancer.stats()['applied_ratio'] == 0.0
@@ -0,0 +1,94 @@
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+from backend.core.face_quality import QUALITY_WEIGHTS, score_faces
+
+OLD_THRESHOLD = 0.65
+NEW_THRESHOLD = 0.75
+FRAME_SHAPE = (720, 1280, 3)
+
+def old_quality(face, frame_width, frame_height):
+    """The per-face scorer score_faces replaced, as it ran on antelopev2 detections."""
+    bbox = face.bbox.astype(int)
+    face_width, face_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    size_score = min(1.0, face_width * face_height / (100 * 100))
+    if face_width < 50 or face_height < 50 or face_width > frame_width * 0.8 or face_height > frame_height * 0.8:
+        size_score = 0.0
+    center_x, center_y = (bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2
+    position_score = 1.0 - np.hypot(center_x - frame_width / 2, center_y - frame_height / 2) / np.hypot(
+        frame_width / 2, frame_height / 2)
+    brightness_score = min(1.0, max(0.0, 1.0 - abs(np.mean(face.landmark_2d_106) / 255.0 - 0.5) * 2))
+    sharpness_score = min(1.0, np.var(face.embedding) / 0.1)
+    yaw, pitch, roll = face.pose
+    angle_score = max(0.0, 1.0 - (abs(yaw) + abs(pitch) + abs(roll)) / 90.0)
+    return (0.3 * size_score + 0.2 * position_score + 0.2 * face.det_score + 0.1 * brightness_score
+            + 0.1 * sharpness_score + 0.1 * angle_score)
+
+def textured_frame(seed=0):
+    """A mid-grey frame with fine detail everywhere, standing in for an in-focus, well-exposed scene."""
+    noise = np.random.default_rng(seed).integers(64, 192, size=FRAME_SHAPE[:2], dtype=np.uint8)
+    return cv2.cvtColor(noise, cv2.COLOR_GRAY2BGR)
+
+def make_face(bbox, det_score, pose):
+    bbox = np.array(bbox, dtype=np.float32)
+    landmarks = np.column_stack([np.linspace(bbox[0], bbox[2], 106), np.linspace(bbox[1], bbox[3], 106)])
+    embedding = np.random.default_rng(1).normal(0.0, 1.5, 512).astype(np.float32)
+    return types.SimpleNamespace(bbox=bbox, det_score=det_score, pose=np.array(pose, dtype=np.float32),
+                                 landmark_2d_106=landmarks, embedding=embedding)
+
+FACES = [
+    make_face((600, 300, 720, 450), 0.9, (5, 3, 1)),
+    make_face((300, 200, 400, 330), 0.75, (20, 10, 5)),
+    make_face((1000, 450, 1080, 560), 0.6, (10, 5, 0)),
+    make_face((900, 100, 940, 150), 0.95, (0, 0, 0)),
+    make_face((150, 500, 260, 640), 0.5, (30, 15, 10)),
+    make_face((560, 280, 700, 440), 0.8, (40, 20, 10)),
+]
+
+def new_scores(frame, faces=FACES):
+    return score_faces(frame, np.stack([face.bbox for face in faces]),
+                       np.array([face.det_score for face in faces]), np.stack([face.pose for face in faces]))
+
+def test_clean_faces_keep_old_decisions():
+    frame = textured_frame()
+    scores = new_scores(frame)
+    old = np.array([old_quality(face, FRAME_SHAPE[1], FRAME_SHAPE[0]) for face in FACES])
+    np.testing.assert_allclose(scores['brightness'], 1.0)
+    np.testing.assert_allclose(scores['sharpness'], 1.0)
+    np.testing.assert_allclose(scores['overall'], old + 0.1, atol=1e-5)
+    assert (old >= OLD_THRESHOLD).any() and (old < OLD_THRESHOLD).any()
+    np.testing.assert_array_equal(scores['overall'] >= NEW_THRESHOLD, old >= OLD_THRESHOLD)
+
+def test_geometric_components_match_old_formulas():
+    scores = new_scores(textured_frame())
+    for i, face in enumerate(FACES):
+        bbox = face.bbox
+        area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+        expected_size = 0.0 if min(bbox[2] - bbox[0], bbox[3] - bbox[1]) < 50 else min(1.0, area / 1e4)
+        assert scores['size'][i] == pytest.approx(expected_size)
+        assert scores['angle'][i] == pytest.approx(max(0.0, 1.0 - np.abs(face.pose).sum() / 90.0))
+        assert scores['det'][i] == pytest.approx(face.det_score)
+
+@pytest.mark.parametrize("degrade", [
+    lambda frame: cv2.GaussianBlur(frame, (0, 0), 4),
+    lambda frame: (frame * 0.2).astype(np.uint8),
+    lambda frame: np.clip(frame.astype(np.float32) * 2.5, 0, 255).astype(np.uint8),
+], ids=["blurred", "dark", "washed-out"])
+def test_degraded_faces_score_lower(degrade):
+    frame = textured_frame()
+    clean, degraded = new_scores(frame), new_scores(degrade(frame))
+    image_weight = QUALITY_WEIGHTS['brightness'] + QUALITY_WEIGHTS['sharpness']
+    assert (degraded['overall'] < clean['overall'] - 0.05).all()
+    assert (clean['overall'] - degraded['overall'] <= image_weight + 1e-5).all()
+    assert (degraded['overall'] >= NEW_THRESHOLD).sum() < (clean['overall'] >= NEW_THRESHOLD).sum()
+
+def test_faces_without_pose_use_default_angle():
+    frame = textured_frame()
+    bboxes = np.stack([face.bbox for face in FACES[:2]])
+    poses = np.array([[10, 0, 0], [np.nan, np.nan, np.nan]], dtype=np.float32)
+    scores = score_faces(frame, bboxes, np.array([0.9, 0.9]), poses)
+    assert scores['angle'][0] == pytest.approx(1.0 - 10 / 90.0)
+    assert scores['angle'][1] == pytest.approx(0.8)
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from backend.core.frame_buffer import FrameRing, FrameSlot
+
+JOIN_TIMEOUT = 5.0
+
+def publish_frame(ring, slot, value, shape=(4, 4)):
+    ref, buffer = ring.acquire()
+    if buffer is None:
+        buffer = np.empty(shape, dtype=np.uint8)
+        ring.adopt(ref, buffer)
+    buffer[:] = value
+    seq = slot.publish(ref)
+    ref.release()
+    return seq
+
+def wait_for_waiters(slot, count):
+    deadline = time.monotonic() + JOIN_TIMEOUT
+    while len(slot.condition._waiters) < count:
+        assert time.monotonic() < deadline, "readers never blocked"
+        time.sleep(0.001)
+
+def test_reader_sees_increasing_sequence_and_matching_frames():
+    ring, slot = FrameRing(size=3), FrameSlot()
+    frames = 200
+    seen = []
+    consumed = threading.Semaphore(0)
+
+    def reader():
+        seq = 0
+        while seq < frames:
+            seq, ref = slot.wait_for_newer(seq, timeout=JOIN_TIMEOUT)
+            assert ref is not None
+            with ref:
+                seen.append((seq, int(ref.array[0, 0])))
+            consumed.release()
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for value in range(1, frames + 1):
+        assert publish_frame(ring, slot, value % 256) == value
+        if value % 10 == 0:
+            # Let the reader catch up now and then so both the skip and the no-skip paths are exercised.
+            assert consumed.acquire(timeout=JOIN_TIMEOUT)
+    thread.join(JOIN_TIMEOUT)
+    assert not thread.is_alive()
+    seqs = [seq for seq, _ in seen]
+    assert seqs == sorted(set(seqs)) and seqs[-1] == frames
+    assert all(value == seq % 256 for seq, value in seen)
+    slot.close()
+    assert ring.in_use() == 0
+
+def test_wait_for_newer_times_out_without_a_new_frame():
+    ring, slot = FrameRing(), FrameSlot()
+    assert slot.wait_for_newer(0, timeout=0.01) == (0, None)
+    seq = publish_frame(ring, slot, 7)
+    assert slot.wait_for_newer(seq, timeout=0.01) == (seq, None)
+    newer_seq, ref = slot.wait_for_newer(seq - 1, timeout=0)
+    assert newer_seq == seq and ref.array[0, 0] == 7
+    ref.release()
+
+def test_wait_for_newer_wakes_on_publish():
+    ring, slot = FrameRing(), FrameSlot()
+    result = []
+    thread = threading.Thread(target=lambda: result.append(slot.wait_for_newer(0, timeout=JOIN_TIMEOUT)))
+    thread.start()
+    wait_for_waiters(slot, 1)
+    publish_frame(ring, slot, 3)
+    thread.join(JOIN_TIMEOUT)
+    seq, ref = result[0]
+    assert seq == 1 and ref.array[0, 0] == 3
+    ref.release()
+
+def test_close_releases_blocked_readers_and_published_frame():
+    ring, slot = FrameRing(), FrameSlot()
+    seq = publish_frame(ring, slot, 1)
+    results = []
+    readers = [threading.Thread(target=lambda: results.append(slot.wait_for_newer(seq))) for _ in range(3)]
+    for thread in readers:
+        thread.start()
+    wait_for_waiters(slot, len(readers))
+    assert ring.in_use() == 1
+    slot.close()
+    for thread in readers:
+        thread.join(JOIN_TIMEOUT)
+        assert not thread.is_alive()
+    assert results == [(seq, None)] * len(readers)
+    assert ring.in_use() == 0
+    assert slot.wait_for_newer(seq) == (seq, None)
+
+def test_buffers_are_recycled_once_unreferenced():
+    ring, slot = FrameRing(size=2), FrameSlot()
+    publish_frame(ring, slot, 1)
+    _, held = slot.latest()
+    first_buffer = ring.buffers[held.index]
+    publish_frame(ring, slot, 2)
+    assert ring.in_use() == 2
+    # The reader's reference keeps frame 1 intact while frame 2 is published.
+    assert held.array[0, 0] == 1
+    with pytest.raises(ValueError):
+        held.array[0, 0] = 9
+    held.release()
+    assert ring.in_use() == 1
+    ref, buffer = ring.acquire()
+    assert ref.index == held.index and buffer is first_buffer
+    ref.release()
+
+def test_ring_grows_when_every_buffer_is_referenced():
+    ring = FrameRing(size=2)
+    held = [ring.acquire()[0] for _ in range(2)]
+    ref, buffer = ring.acquire()
+    assert buffer is None
+    assert ref.index == 2 and len(ring.buffers) == 3
+    assert ring.in_use() == 3
+    for frame_ref in held + [ref]:
+        frame_ref.release()
+    assert ring.in_use() == 0
+    assert ring.acquire()[0].index < 3 and len(ring.buffers) == 3
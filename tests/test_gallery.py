@@ -0,0 +1,197 @@
+import faiss
+import numpy as np
+import pytest
+
+from backend.core import gallery as gallery_module
+from backend.core.gallery import (GalleryIndex, GallerySnapshot, MatchCache, load_gallery_snapshot,
+                                  normalize_embeddings, save_gallery_snapshot)
+
+DIM = 16
+
+def make_embeddings(count, seed=0):
+    return normalize_embeddings(np.random.default_rng(seed).standard_normal((count, DIM)))
+
+def make_gallery(spec="flat", count=100, seed=0):
+    ids = np.arange(1000, 1000 + count)
+    labels = [f"E{i % 10:03d}" for i in range(count)]
+    embeddings = make_embeddings(count, seed)
+    return GalleryIndex.build(ids, embeddings, labels, spec), ids, embeddings, labels
+
+def top_ids(gallery, queries, k=1):
+    return gallery.search(queries, k)[1]
+
+@pytest.mark.parametrize("spec", ["flat", "hnsw8", "ivf2"])
+def test_add_remove_and_remove_label(spec):
+    gallery, ids, embeddings, labels = make_gallery(spec)
+    assert len(gallery) == gallery.ntotal == 100
+    assert gallery.employee_count == 10
+    np.testing.assert_array_equal(top_ids(gallery, embeddings[:5])[:, 0], ids[:5])
+
+    assert gallery.remove([1000, 1001, 99999]) == 2
+    assert gallery.ntotal == 98 and 1000 not in gallery.labels_by_id
+    assert 1000 not in gallery.ids_by_label["E000"]
+    assert not np.isin(top_ids(gallery, embeddings[:2], k=5), [1000, 1001]).any()
+
+    assert gallery.remove_label("E002") == 10
+    assert "E002" not in gallery.ids_by_label
+    assert gallery.employee_count == 9 and gallery.ntotal == 88
+    found = gallery.labels_for(top_ids(gallery, embeddings[2:3], k=10))
+    assert "E002" not in found.ravel().tolist()
+
+    replacement = make_embeddings(1, seed=7)
+    assert gallery.add([1003], replacement, ["E999"]) == 1
+    assert gallery.ntotal == 88 and gallery.labels_by_id[1003] == "E999"
+    assert 1003 not in gallery.ids_by_label["E003"]
+    assert top_ids(gallery, replacement)[0, 0] == 1003
+
+def test_hnsw_remove_rebuilds_from_survivors():
+    gallery, ids, embeddings, _ = make_gallery("hnsw8")
+    before = gallery.index
+    gallery.remove(ids[::2])
+    assert gallery.index is not before
+    assert isinstance(gallery.index, faiss.IndexIDMap2)
+    assert isinstance(faiss.downcast_index(gallery.index.index), faiss.IndexHNSW)
+    assert gallery.ntotal == 50
+    np.testing.assert_array_equal(top_ids(gallery, embeddings[1::2])[:, 0], ids[1::2])
+
+def test_ivf_keeps_ids_in_its_own_lists():
+    gallery, ids, embeddings, _ = make_gallery("ivf2")
+    assert isinstance(gallery.index, faiss.IndexIVF)
+    assert gallery.index.direct_map.type == faiss.DirectMap.Hashtable
+    np.testing.assert_allclose(gallery.index.reconstruct(int(ids[3])), embeddings[3], atol=1e-6)
+    gallery.remove([int(ids[3])])
+    assert gallery.ntotal == 99
+    with pytest.raises(RuntimeError):
+        gallery.index.reconstruct(int(ids[3]))
+
+def test_snapshot_overlay_matches_modified_gallery():
+    gallery, ids, embeddings, labels = make_gallery()
+    snapshot = GallerySnapshot.from_gallery(gallery)
+    added = make_embeddings(3, seed=1)
+    replaced = make_embeddings(1, seed=2)
+    snapshot = snapshot.with_added([5000, 5001, 5002], added, ["N1", "N1", "N2"])
+    snapshot = snapshot.with_removed([1000, 1001, 5001])
+    snapshot = snapshot.with_added([1002], replaced, ["R1"])
+    assert snapshot.version == 3
+    assert gallery.ntotal == 100
+    assert len(snapshot) == 100 - 3 + 3
+    assert snapshot.pending_changes == 6
+    assert snapshot.label_ids("N1") == [5000]
+    assert 1002 not in snapshot.label_ids("E002")
+    assert snapshot.embedding_ids() == (set(ids.tolist()) - {1000, 1001}) | {5000, 5002}
+    assert snapshot.employee_count == 13
+
+    _, found = snapshot.search(np.vstack([added[[0, 2]], replaced]), 1)
+    assert found[:, 0].tolist() == ["N1", "N2", "R1"]
+    _, nearest = snapshot.search(embeddings[:2], len(snapshot))
+    assert (nearest == "R1").sum(axis=1).tolist() == [1, 1]
+    assert (nearest == "N1").sum(axis=1).tolist() == [1, 1]
+
+@pytest.mark.parametrize("spec", ["flat", "hnsw8", "ivf2", "fp16"])
+def test_snapshot_search_skips_removed_base_ids(spec):
+    gallery, ids, embeddings, labels = make_gallery(spec)
+    snapshot = GallerySnapshot.from_gallery(gallery).with_removed(ids[:50])
+    scores, found = snapshot.search(embeddings[:50], 5)
+    assert found.shape == (50, 5)
+    exact = embeddings[:50] @ embeddings[50:].T
+    np.testing.assert_allclose(scores[:, 0], exact.max(axis=1), atol=1e-2)
+    assert scores.shape == (50, 5) and np.isfinite(scores).all()
+
+def test_compact_and_rebase_preserve_search_results():
+    gallery, ids, embeddings, _ = make_gallery()
+    queries = make_embeddings(20, seed=3)
+    captured = (GallerySnapshot.from_gallery(gallery)
+                .with_added([5000, 5001], make_embeddings(2, seed=4), ["N1", "N2"])
+                .with_removed([1000, 1001]))
+    compacted = captured.compact()
+    assert compacted.ntotal == 100 and compacted.labels_by_id[5000] == "N1"
+    assert gallery.ntotal == 100 and 1000 in gallery.labels_by_id
+
+    # Changes published while the compaction was running stay in the overlay.
+    live = (captured.with_removed([1002, 5000])
+            .with_added([5001, 5003], make_embeddings(2, seed=5), ["N2b", "N3"]))
+    rebased = live.rebased(compacted, captured)
+    assert rebased.base is compacted and rebased.version == live.version
+    assert rebased.removed_ids == {1002, 5000, 5001}
+    assert sorted(rebased.delta_ids.tolist()) == [5001, 5003]
+    assert rebased.embedding_ids() == live.embedding_ids()
+    live_scores, live_labels = live.search(queries, 5)
+    rebased_scores, rebased_labels = rebased.search(queries, 5)
+    np.testing.assert_allclose(rebased_scores, live_scores, atol=1e-5)
+    np.testing.assert_array_equal(rebased_labels, live_labels)
+
+@pytest.mark.parametrize("spec, count", [
+    ("flat", 100), ("hnsw8", 100), ("ivf2", 100), ("fp16", 100), ("sq8", 1000), ("pq4", 10000)])
+@pytest.mark.parametrize("mmap", [True, False])
+def test_snapshot_round_trip(tmp_path, spec, count, mmap):
+    gallery, ids, embeddings, labels = make_gallery(spec, count)
+    save_gallery_snapshot(str(tmp_path), gallery, version=7)
+    loaded, manifest = load_gallery_snapshot(str(tmp_path), mmap=mmap)
+    assert manifest['gallery_version'] == 7
+    assert loaded.labels_by_id == gallery.labels_by_id
+    assert loaded.ids_by_label == gallery.ids_by_label
+    assert loaded.ntotal == count
+    queries = embeddings[:10]
+    np.testing.assert_allclose(loaded.search(queries, 3)[0], gallery.search(queries, 3)[0], atol=1e-5)
+    np.testing.assert_array_equal(loaded.search(queries, 3)[1], gallery.search(queries, 3)[1])
+    if loaded.mmapped:
+        with pytest.raises(RuntimeError):
+            loaded.remove([int(ids[0])])
+    writable = loaded.copy()
+    assert not writable.mmapped
+    writable.remove([int(ids[0])])
+    assert writable.ntotal == count - 1 and loaded.ntotal == count
+
+def test_snapshot_keeps_recent_versions(tmp_path, monkeypatch):
+    gallery, *_ = make_gallery()
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(gallery_module.time, "time", lambda: next(clock))
+    paths = [save_gallery_snapshot(str(tmp_path), gallery, version) for version in range(4)]
+    kept = sorted(p.name for p in tmp_path.iterdir() if p.name.startswith("v"))
+    assert len(kept) == gallery_module.SNAPSHOT_KEEP_VERSIONS
+    assert (tmp_path / "CURRENT").read_text() == paths[-1].rsplit("/", 1)[1]
+
+def test_load_without_snapshot_returns_none(tmp_path):
+    assert load_gallery_snapshot(str(tmp_path)) is None
+
+def test_match_cache_hits_and_version_invalidation():
+    cache = MatchCache(max_entries=8)
+    embeddings = make_embeddings(2, seed=6)
+    keys, results = cache.lookup(embeddings, version=1)
+    assert results == [None, None]
+    cache.store(keys, embeddings, ["A", "B"], [0.9, 0.7], version=1)
+    _, results = cache.lookup(embeddings, version=1)
+    assert results == [("A", pytest.approx(0.9)), ("B", pytest.approx(0.7))]
+    _, results = cache.lookup(embeddings[:1], version=2)
+    assert results == [None]
+    assert len(cache) == 1
+    stats = cache.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 3
+
+def test_match_cache_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(gallery_module.time, "monotonic", lambda: now[0])
+    cache = MatchCache(ttl=5.0)
+    embeddings = make_embeddings(1, seed=8)
+    keys, _ = cache.lookup(embeddings, version=0)
+    cache.store(keys, embeddings, ["A"], [0.8], version=0)
+    now[0] = 104.0
+    assert cache.lookup(embeddings, version=0)[1] == [("A", pytest.approx(0.8))]
+    now[0] = 106.0
+    assert cache.lookup(embeddings, version=0)[1] == [None]
+    assert len(cache) == 0
+
+def test_match_cache_requires_close_embedding_and_evicts_oldest():
+    cache = MatchCache(max_entries=2, num_bits=1, min_similarity=0.99)
+    embeddings = make_embeddings(50, seed=9)
+    keys, _ = cache.lookup(embeddings[:1], version=0)
+    cache.store(keys, embeddings[:1], ["A"], [0.9], version=0)
+    same_bucket = [row for row, key in zip(embeddings[1:], cache._keys(embeddings[1:])) if key == keys[0]]
+    assert cache.lookup(np.array(same_bucket[:1]), version=0)[1] == [None]
+    distinct = MatchCache(max_entries=2)
+    keys = distinct._keys(embeddings)
+    rows = [row for row, key in enumerate(keys) if keys.index(key) == row][:3]
+    for row in rows:
+        distinct.store([keys[row]], embeddings[row:row + 1], [str(row)], [0.9], version=0)
+    assert len(distinct) == 2 and distinct.stats()['evictions'] == 1
+    assert distinct.lookup(embeddings[rows[0]:rows[0] + 1], version=0)[1] == [None]